@@ -15,19 +15,20 @@ def __(mo):
 
 
 @app.cell
-def __(create_df_from_cli_args, generatePlots):
-    results_df = create_df_from_cli_args()
+def __(generatePlots, load_report_data):
+    results_df, summary = load_report_data()
     plotting = generatePlots(results_df)
-    return plotting, results_df
+    return plotting, results_df, summary
 
 
 @app.cell
-def __(plotting, mo):
+def __(plotting, mo, summary):
     if plotting is not None:
-        median_run_time = round(plotting.results_df.run_time.median(), 2)
-        mean_run_time = round(plotting.results_df.run_time.mean(), 2)
-        max_run_time = round(plotting.results_df.run_time.max(), 2)
-        min_run_time = round(plotting.results_df.run_time.min(), 2)
+        run_time_summary = summary["columns"]["run_time"]
+        median_run_time = round(run_time_summary["median"], 2)
+        mean_run_time = round(run_time_summary["mean"], 2)
+        max_run_time = round(run_time_summary["max"], 2)
+        min_run_time = round(run_time_summary["min"], 2)
         _fig = mo.md(
             f"""
                      First, we visualize the distribution of run times. 
@@ -66,10 +67,10 @@ def __(plotting):
 
 
 @app.cell
-def __(plotting, mo):
+def __(plotting, mo, summary):
     if plotting is not None:
-        az_mae = round(plotting.results_df["absolute_error_azimuth"].mean(), 2)
-        tilt_mae = round(plotting.results_df["absolute_error_tilt"].mean(), 2)
+        az_mae = round(summary["columns"]["absolute_error_azimuth"]["mean"], 2)
+        tilt_mae = round(summary["columns"]["absolute_error_tilt"]["mean"], 2)
         _fig = mo.md(
             f"""
                      Next, we visualize the mean absolute error distribution.
@@ -246,18 +247,37 @@ def __():
 
 @app.cell
 def __(json, mo, pd):
-
-    def create_df_from_cli_args():
+    from typing import TypedDict
+
+    class ColumnSummary(TypedDict):
+        count: int
+        mean: float | None
+        median: float | None
+        min: float | None
+        max: float | None
+
+    class ReportSummary(TypedDict):
+        number_of_rows: int
+        columns: dict[str, ColumnSummary]
+
+    def load_report_data() -> tuple[pd.DataFrame, ReportSummary]:
+        """
+        Load the results and summary statistics the worker passes as the
+        results_file and summary_file arguments.
+        """
         args = mo.cli_args().to_dict()
-        data = args.get("results_df")
-        rows = []
-        for row in data:
-            rows.append(json.loads(row))
+        results_file: str = args["results_file"]
+        if results_file.endswith(".parquet"):
+            results_df = pd.read_parquet(results_file)
+        else:
+            results_df = pd.read_json(results_file, orient="records")
+
+        with open(args["summary_file"]) as f:
+            summary: ReportSummary = json.load(f)
 
-        df = pd.DataFrame.from_records(rows)
-        return df
+        return results_df, summary
 
-    return (create_df_from_cli_args,)
+    return (load_report_data,)
 
 
 if __name__ == "__main__":
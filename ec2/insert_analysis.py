@@ -10,12 +10,15 @@ from mypy_boto3_s3 import S3Client
 import pandas as pd
 import os
 import shutil
+import tempfile
 import argparse
 
 from utility import (
     are_hashes_the_same,
     get_s3_file_hash,
     combine_hashes,
+    convert_time_series_to_columnar,
+    get_columnar_file_name,
     get_data_from_api_to_df,
     get_file_hash,
     get_hash_for_list_of_files,
@@ -616,6 +619,37 @@ class InsertAnalysis:
                 self.aws_profile_name,
             )
 
+            self.uploadColumnarCopy(local_path, "data_files/files")
+
+    def uploadColumnarCopy(self, local_path: str, upload_folder: str):
+        """
+        Convert a time series CSV to Parquet and upload it next to the CSV.
+
+        Parameters
+        ----------
+        local_path: String. Local path to the time series CSV.
+        upload_folder: String. S3 folder the CSV was uploaded to.
+        """
+
+        columnar_file_name = get_columnar_file_name(
+            os.path.basename(local_path)
+        )
+
+        # Converted files are kept out of the task folders so they are not
+        # included in the analysis hash
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            columnar_path = convert_time_series_to_columnar(
+                local_path, os.path.join(tmp_dir, columnar_file_name)
+            )
+            upload_to_s3_bucket(
+                self.s3_url,
+                self.s3_bucket_name,
+                columnar_path,
+                f"{upload_folder}/{columnar_file_name}",
+                self.is_local,
+                self.aws_profile_name,
+            )
+
     def uploadValidationData(self):
 
         file_metadata_names: pd.Series[str] = self.new_file_metadata_df[
@@ -639,6 +673,10 @@ class InsertAnalysis:
                 self.aws_profile_name,
             )
 
+            self.uploadColumnarCopy(
+                local_path, f"data_files/references/{str(self.analysis_id)}"
+            )
+
     def createEvaluationScripts(self):
         """
         Upload the evaluation scripts to the S3 bucket.
@@ -21,6 +21,8 @@ P = ParamSpec("P")
 
 logger = logging.getLogger(__name__)
 
+COLUMNAR_FILE_EXTENSION = ".parquet"
+
 
 def is_local():
     """
@@ -279,6 +281,26 @@ def hasAllColumns(df: pd.DataFrame, cols: list[str]):
     return all(col in df.columns for col in cols)
 
 
+def get_columnar_file_name(file_name: str) -> str:
+    return f"{os.path.splitext(file_name)[0]}{COLUMNAR_FILE_EXTENSION}"
+
+
+def convert_time_series_to_columnar(csv_path: str, columnar_path: str):
+    """
+    Write a Parquet copy of a time series CSV so that workers do not have
+    to re-parse the datetime index on every read.
+
+    Parameters
+    ----------
+    csv_path: String. Local path to the time series CSV.
+    columnar_path: String. Local path to write the Parquet file to.
+    """
+
+    time_series_df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    time_series_df.to_parquet(columnar_path, engine="pyarrow")
+    return columnar_path
+
+
 def upload_to_s3_bucket(
     s3_url: str,
     bucket_name: str,
@@ -1,6 +1,7 @@
 from flask import Flask, request, jsonify, send_file, send_from_directory
 
 from flask_cors import CORS
+import hashlib
 import os
 import logging
 import sys
@@ -14,6 +15,15 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def get_file_etag(file_path):
+    # Matches the S3 ETag of a single part upload
+    hasher = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return f'"{hasher.hexdigest()}"'
+
+
 # Define a simple S3-like API
 @app.route("/put_object/<bucket_name>/<path:object_name>", methods=["PUT"])
 def put_object(bucket_name, object_name):
@@ -99,7 +109,13 @@ def get_bucket(bucket_name, prefix):
         for file_name in file_names:
             full_file_name = os.path.join(dir_path, file_name)
             key = "/".join(full_file_name.split("/")[2:])
-            ret["Contents"].append({"Key": key})
+            ret["Contents"].append(
+                {
+                    "Key": key,
+                    "ETag": get_file_etag(full_file_name),
+                    "Size": os.path.getsize(full_file_name),
+                }
+            )
     print(f"ret: {ret}", file=sys.stderr)
     return ret, 200
 
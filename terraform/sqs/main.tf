@@ -26,7 +26,8 @@ data "aws_iam_policy_document" "submission_queue_policy_document" {
     ]
 
     resources = [
-      aws_sqs_queue.submission_queue.arn
+      aws_sqs_queue.submission_queue.arn,
+      aws_sqs_queue.report_queue.arn
     ]
   }
 
@@ -51,6 +52,13 @@ resource "aws_sqs_queue_policy" "submission_queue_policy" {
 
 }
 
+resource "aws_sqs_queue_policy" "report_queue_policy" {
+  queue_url = aws_sqs_queue.report_queue.id
+
+  policy = data.aws_iam_policy_document.submission_queue_policy_document.json
+
+}
+
 resource "aws_sqs_queue" "submission_queue" {
   name                        = "valhub_submission_queue.fifo"
   content_based_deduplication = false
@@ -67,3 +75,37 @@ resource "aws_sqs_queue" "submission_queue" {
     Name = "valhub_submission_queue"
   }
 }
+
+# Private reports are rendered from their own queue so that workers are
+# free for the next submission as soon as the results are published
+resource "aws_sqs_queue" "report_queue_deadletter" {
+  name                      = "valhub_report_queue_deadletter.fifo"
+  fifo_queue                = true
+  message_retention_seconds = 1209600
+  kms_master_key_id         = aws_kms_key.valhub_kms_key.arn
+
+  tags = {
+    Name = "valhub_report_queue_deadletter"
+  }
+}
+
+resource "aws_sqs_queue" "report_queue" {
+  name                        = "valhub_report_queue.fifo"
+  content_based_deduplication = false
+  delay_seconds               = 0
+  fifo_queue                  = true
+  max_message_size            = 262144
+  message_retention_seconds   = 345600
+  receive_wait_time_seconds   = 0
+  visibility_timeout_seconds  = 1800
+  kms_master_key_id           = aws_kms_key.valhub_kms_key.arn
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.report_queue_deadletter.arn
+    maxReceiveCount     = 3
+  })
+
+  tags = {
+    Name = "valhub_report_queue"
+  }
+}
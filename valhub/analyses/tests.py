@@ -1,3 +1,109 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.models import Account
+from error_report.models import ErrorReport
+from submissions.models import LeaderboardEntry, Submission
+from .models import Analysis
+
+
+class LeaderboardTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = Account.objects.create_user(
+            username="user", email="user@test.com", password="user"
+        )
+        self.analysis = Analysis.objects.create(
+            analysis_name="Analysis 1", total_files=10
+        )
+        self.url = reverse(
+            "leaderboard", kwargs={"analysis_id": self.analysis.analysis_id}
+        )
+
+    def create_submission(self, error_rate, mrt, **kwargs):
+        fields = {
+            "analysis": self.analysis,
+            "created_by": self.user,
+            "algorithm_s3_path": "https://bucket/submission/archive.zip",
+            "status": Submission.FINISHED,
+            "result": {"mean_absolute_error": 1.0},
+            "mrt": mrt,
+            **kwargs,
+        }
+        submission = Submission.objects.create(**fields)
+        ErrorReport.objects.create(
+            submission=submission,
+            error_rate=error_rate,
+            file_errors={"errors": []},
+        )
+        return submission
+
+    def get_submission_ids(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["submission_id"] for row in response.json()["submissions"]]
+
+    def test_ranks_finished_submissions(self):
+        slow = self.create_submission(0.1, 20.0)
+        fast = self.create_submission(0.1, 5.0)
+        best = self.create_submission(0.0, 30.0)
+        self.create_submission(0.0, 1.0, status=Submission.RUNNING)
+
+        self.assertEqual(
+            self.get_submission_ids(),
+            [best.submission_id, fast.submission_id, slow.submission_id],
+        )
+
+        row = self.client.get(self.url).json()["submissions"][1]
+        self.assertEqual(row["error_rate"], 0.1)
+        self.assertEqual(row["created_by"]["username"], "user")
+
+    def test_reads_in_constant_queries(self):
+        self.create_submission(0.1, 1.0)
+        self.get_submission_ids()
+
+        with CaptureQueriesContext(connection) as few:
+            self.get_submission_ids()
+
+        for i in range(10):
+            self.create_submission(0.1, float(i))
+        call_command(
+            "rebuild_leaderboard", self.analysis.analysis_id, stdout=StringIO()
+        )
+
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(self.get_submission_ids()), 11)
+
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_non_breaking_errors_refresh_the_entry(self):
+        submission = self.create_submission(0.0, 1.0)
+        self.get_submission_ids()
+
+        worker = APIClient()
+        worker.force_authenticate(user=self.user)
+        response = worker.post(
+            reverse(
+                "update_non_breaking",
+                kwargs={"submission_id": submission.submission_id},
+            ),
+            {
+                "error_code": "op_500",
+                "error_type": "Operation",
+                "error_message": "Failed to run",
+                "file_name": "1.csv",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-# Create your tests here.
+        entry = LeaderboardEntry.objects.get(submission=submission)
+        self.assertAlmostEqual(entry.error_rate, 0.1)
+        self.assertAlmostEqual(entry.payload["error_rate"], 0.1)
@@ -10,8 +10,7 @@ from django.http import JsonResponse
 
 
 from .models import Analysis
-from submissions.models import Submission
-from submissions.serializers import SubmissionDetailSerializer
+from submissions.leaderboard import get_leaderboard
 from .serializers import AnalysisSerializer
 import logging
 
@@ -68,12 +67,7 @@ def analysis_detail(request: Request, analysis_id: str):
 def leaderboard(request: Request, analysis_id: str):
     analysis = Analysis.objects.get(analysis_id=analysis_id)
 
-    submission_list = Submission.objects.filter(
-        analysis=analysis, result__isnull=False, status=Submission.FINISHED
-    )
-    serializer = SubmissionDetailSerializer(submission_list, many=True)
-
-    response_data = {"submissions": serializer.data}
+    response_data = {"submissions": get_leaderboard(analysis.analysis_id)}
 
     return JsonResponse(response_data, status=status.HTTP_200_OK)
 
@@ -1,8 +1,11 @@
 from logging import Logger
+from typing import Any
 import logging
+from django.conf import settings
 from django.utils.deconstruct import deconstructible
 
 import os
+import json
 import uuid
 import boto3
 import requests
@@ -83,6 +86,61 @@ def upload_to_s3_bucket(bucket_name, local_path, upload_path):
         return object_url
 
 
+SUBMISSION_QUEUE_NAME = "valhub_submission_queue.fifo"
+
+
+def get_submission_message_group_id(user_uuid: Any, submission_id: Any) -> str:
+    """
+    FIFO message group of a submission. SQS hands out one message per group
+    at a time, so grouping by user lets a user occupy at most
+    `SUBMISSION_QUEUE_USER_LANES` workers, while the submissions of other
+    users are evaluated in parallel.
+
+    Submissions are only evaluated in order within a lane. With a single
+    lane, the default, a user's submissions run in the order they were
+    made. With more lanes they run side by side and may start or finish
+    out of order.
+    """
+    lanes = max(1, int(settings.SUBMISSION_QUEUE_USER_LANES))
+    return f"user_{user_uuid}_lane_{int(submission_id) % lanes}"
+
+
+def get_submission_queue():
+    """Return the SQS submission queue, raising `ClientError` if missing."""
+    if is_emulation:
+        sqs = boto3.resource(
+            "sqs",
+            endpoint_url="http://sqs:9324",
+            region_name="elasticmq",
+            aws_secret_access_key="x",
+            aws_access_key_id="x",
+            use_ssl=False,
+        )
+    else:
+        sqs = boto3.resource(
+            "sqs",
+            region_name=os.environ.get("AWS_DEFAULT_REGION", "us-west-2"),
+        )
+    return sqs.get_queue_by_name(QueueName=SUBMISSION_QUEUE_NAME)
+
+
+def send_submission_message(
+    queue: Any,
+    message: dict[str, Any],
+    user_uuid: Any,
+    submission_id: Any,
+    deduplication_id: str | None = None,
+):
+    """Send a submission to the submission queue in its user's group."""
+    return queue.send_message(
+        MessageBody=json.dumps(message),
+        MessageGroupId=get_submission_message_group_id(
+            user_uuid, submission_id
+        ),
+        MessageDeduplicationId=deduplication_id or str(submission_id),
+    )
+
+
 # Create signed session cookie for S3 directory object
 
 
@@ -19,6 +19,7 @@ from django.http import JsonResponse, HttpResponse
 
 from .models import ErrorReport as ErrorReportModel
 from .serializers import ErrorReportSerializer, ErrorReportPrivateSerializer
+from submissions.leaderboard import refresh_leaderboard_entry
 import random
 import json
 from rest_framework.request import Request
@@ -304,6 +305,7 @@ def update_non_breaking(request: Request, submission_id: int):
 
     error_report.error_rate = error_rate
     error_report.save()
+    refresh_leaderboard_entry(error_report.submission_id)
 
     return JsonResponse(
         {"message": "Non-breaking error added"},
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from system_metadata.serializers import SystemMetadataSerializer
 from .models import FileMetadata
 
 
@@ -6,3 +7,13 @@ class FileMetadataSerializer(serializers.ModelSerializer):
     class Meta:
         model = FileMetadata
         fields = "__all__"
+
+
+class FileMetadataWithSystemSerializer(FileMetadataSerializer):
+    system_metadata = SystemMetadataSerializer(
+        source="system_id", read_only=True
+    )
+
+    class Meta:
+        model = FileMetadata
+        fields = "__all__"
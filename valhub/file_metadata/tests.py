@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
+from accounts.models import Account
 from system_metadata.models import SystemMetadata
 from .models import FileMetadata
 
@@ -39,3 +40,58 @@ class FileMetadataTestCase(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["file_name"], "File 1")
+
+
+class FileMetadataBulkTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = Account.objects.create_user(
+            username="worker", email="worker@test.com", password="worker"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.systemmetadata = SystemMetadata.objects.create(
+            name="System 1",
+            azimuth=180.0,
+            tilt=30.0,
+            elevation=20.0,
+            latitude=37.7749,
+            longitude=-122.4194,
+            tracking=True,
+            dc_capacity=100.0,
+        )
+        self.files = [
+            FileMetadata.objects.create(
+                system_id=self.systemmetadata,
+                file_name=f"{i}.csv",
+                timezone="UTC",
+                data_sampling_frequency=5,
+                issue="Issue 1",
+                subissue="Subissue 1",
+                file_hash=f"hash{i}",
+            )
+            for i in range(3)
+        ]
+
+    def test_filemetadata_bulk(self):
+        file_ids = [self.files[0].file_id, self.files[2].file_id]
+        response = self.client.post(
+            "/file_metadata/filemetadata/bulk/",
+            {"file_ids": file_ids},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [row["file_id"] for row in response.data["results"]], file_ids
+        )
+        self.assertEqual(
+            response.data["results"][0]["system_metadata"]["azimuth"], 180.0
+        )
+
+    def test_filemetadata_bulk_invalid_ids(self):
+        response = self.client.post(
+            "/file_metadata/filemetadata/bulk/",
+            {"file_ids": "1,2"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
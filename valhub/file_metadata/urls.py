@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import FileMetadataList, FileMetadataDetail
+from .views import FileMetadataList, FileMetadataDetail, FileMetadataBulk
 
 urlpatterns = [
     path("filemetadata/", FileMetadataList.as_view()),
+    path("filemetadata/bulk/", FileMetadataBulk.as_view()),
     path("filemetadata/<int:pk>/", FileMetadataDetail.as_view()),
 ]
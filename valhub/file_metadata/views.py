@@ -1,6 +1,12 @@
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
 from .models import FileMetadata
-from .serializers import FileMetadataSerializer
+from .serializers import (
+    FileMetadataSerializer,
+    FileMetadataWithSystemSerializer,
+)
 from rest_framework.decorators import (
     authentication_classes,
     permission_classes,
@@ -24,3 +30,42 @@ class FileMetadataList(generics.ListCreateAPIView):
 class FileMetadataDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = FileMetadata.objects.all()
     serializer_class = FileMetadataSerializer
+
+
+class FileMetadataBulkPagination(PageNumberPagination):
+    page_size = 1000
+    page_size_query_param = "page_size"
+    max_page_size = 10000
+
+
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+class FileMetadataBulk(generics.GenericAPIView):
+    """
+    Return the file metadata for a list of file ids with the system
+    metadata of each file joined in, one page per request.
+
+    Expects a body of `{"file_ids": [...]}` and `?page=` to page through.
+    """
+
+    queryset = FileMetadata.objects.select_related("system_id").order_by(
+        "file_id"
+    )
+    serializer_class = FileMetadataWithSystemSerializer
+    pagination_class = FileMetadataBulkPagination
+
+    def post(self, request: Request):
+        file_ids = request.data.get("file_ids")
+
+        if not isinstance(file_ids, list) or not all(
+            isinstance(file_id, int) for file_id in file_ids
+        ):
+            return Response(
+                {"error": "file_ids must be a list of integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.get_queryset().filter(file_id__in=file_ids)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,113 @@
+"""
+Materialized analysis leaderboards.
+
+Each finished submission with a result has a `LeaderboardEntry` holding its
+`SubmissionDetailSerializer` output, so reading a leaderboard is one query
+however many submissions an analysis has. Views that change a submission or
+its error report call `refresh_leaderboard_entry`, and `rebuild_leaderboard`
+recreates the entries of an analysis from scratch.
+"""
+
+from typing import Any
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+
+from .models import LeaderboardEntry, Submission
+from .serializers import SubmissionDetailSerializer, annotate_error_rate
+
+LEADERBOARD_BATCH_SIZE = 1000
+
+
+def get_leaderboard_submissions() -> QuerySet[Submission]:
+    """
+    Submissions that belong on a leaderboard, with everything
+    SubmissionDetailSerializer needs loaded in the same query.
+    """
+    return annotate_error_rate(
+        Submission.objects.filter(
+            result__isnull=False, status=Submission.FINISHED
+        ).select_related("created_by")
+    )
+
+
+def build_leaderboard_entry(submission: Submission) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        submission_id=submission.submission_id,
+        analysis_id=submission.analysis_id,
+        error_rate=submission.annotated_error_rate,  # type: ignore
+        mrt=submission.mrt,
+        payload=SubmissionDetailSerializer(submission).data,
+    )
+
+
+def refresh_leaderboard_entry(submission_id: int | str) -> None:
+    """
+    Update the leaderboard entry of a submission, or remove it when the
+    submission no longer belongs on the leaderboard.
+    """
+    submission = (
+        get_leaderboard_submissions()
+        .filter(submission_id=submission_id)
+        .first()
+    )
+    if submission is None:
+        LeaderboardEntry.objects.filter(submission_id=submission_id).delete()
+        return
+
+    entry = build_leaderboard_entry(submission)
+    LeaderboardEntry.objects.update_or_create(
+        submission_id=entry.submission_id,
+        defaults={
+            "analysis_id": entry.analysis_id,
+            "error_rate": entry.error_rate,
+            "mrt": entry.mrt,
+            "payload": entry.payload,
+        },
+    )
+
+
+def rebuild_leaderboard(analysis_id: int | str) -> int:
+    """
+    Recreate every leaderboard entry of an analysis and return how many
+    there are.
+    """
+    submissions = get_leaderboard_submissions().filter(analysis_id=analysis_id)
+    entries = [
+        build_leaderboard_entry(submission)
+        for submission in submissions.iterator(
+            chunk_size=LEADERBOARD_BATCH_SIZE
+        )
+    ]
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(analysis_id=analysis_id).delete()
+        LeaderboardEntry.objects.bulk_create(
+            entries, batch_size=LEADERBOARD_BATCH_SIZE
+        )
+    return len(entries)
+
+
+def get_leaderboard(analysis_id: int | str) -> list[dict[str, Any]]:
+    """
+    Leaderboard rows of an analysis, lowest error rate first and then
+    fastest mean run time.
+
+    An analysis without entries is rebuilt first, so leaderboards that
+    predate the entries table fill themselves on their first read.
+    """
+
+    def read() -> list[dict[str, Any]]:
+        return list(
+            LeaderboardEntry.objects.filter(analysis_id=analysis_id)
+            .order_by(
+                "error_rate",
+                F("mrt").asc(nulls_last=True),
+                "submission_id",
+            )
+            .values_list("payload", flat=True)
+        )
+
+    rows = read()
+    if not rows and rebuild_leaderboard(analysis_id):
+        rows = read()
+    return rows
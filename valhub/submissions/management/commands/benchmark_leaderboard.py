@@ -0,0 +1,108 @@
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.core.management.base import BaseCommand
+
+from accounts.models import Account
+from analyses.models import Analysis
+from error_report.models import ErrorReport
+from submissions.leaderboard import get_leaderboard, rebuild_leaderboard
+from submissions.models import Submission
+from submissions.serializers import SubmissionDetailSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serializing the leaderboard per submission with reading "
+        "the materialized leaderboard. The generated analysis, users and "
+        "submissions are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--submissions",
+            type=int,
+            default=10000,
+            help="Number of finished submissions to generate",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Number of users the submissions are spread over",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            analysis = self.generate(options["submissions"], options["users"])
+
+            def serialize_per_submission():
+                submission_list = Submission.objects.filter(
+                    analysis=analysis,
+                    result__isnull=False,
+                    status=Submission.FINISHED,
+                )
+                return SubmissionDetailSerializer(
+                    submission_list, many=True
+                ).data
+
+            for name, func in [
+                ("serialize per submission", serialize_per_submission),
+                (
+                    "rebuild leaderboard",
+                    lambda: rebuild_leaderboard(analysis.analysis_id),
+                ),
+                (
+                    "read leaderboard",
+                    lambda: get_leaderboard(analysis.analysis_id),
+                ),
+            ]:
+                with CaptureQueriesContext(connection) as queries:
+                    start_time = time.perf_counter()
+                    func()
+                    elapsed = time.perf_counter() - start_time
+                self.stdout.write(
+                    f"{name:>25}: {elapsed:.3f}s, "
+                    f"{len(queries.captured_queries)} queries"
+                )
+
+            transaction.set_rollback(True)
+
+    def generate(self, number_of_submissions: int, number_of_users: int):
+        analysis = Analysis.objects.create(
+            analysis_name="Leaderboard benchmark", total_files=100
+        )
+        users = Account.objects.bulk_create(
+            Account(
+                username=f"leaderboard_benchmark_{i}",
+                email=f"leaderboard_benchmark_{i}@test.com",
+            )
+            for i in range(number_of_users)
+        )
+        submissions = Submission.objects.bulk_create(
+            (
+                Submission(
+                    analysis=analysis,
+                    created_by=users[i % len(users)],
+                    algorithm_s3_path=f"https://bucket/submission_{i}/archive.zip",
+                    status=Submission.FINISHED,
+                    result={"mean_absolute_error": i % 97},
+                    mrt=float(i % 53),
+                )
+                for i in range(number_of_submissions)
+            ),
+            batch_size=1000,
+        )
+        ErrorReport.objects.bulk_create(
+            (
+                ErrorReport(
+                    submission=submission,
+                    error_rate=(i % 10) / 100,
+                    file_errors={"errors": []},
+                )
+                for i, submission in enumerate(submissions)
+            ),
+            batch_size=1000,
+        )
+        return analysis
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyses.models import Analysis
+from submissions.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the materialized leaderboard entries of the given "
+        "analyses, or of every analysis when none are given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("analysis_ids", nargs="*", type=int)
+
+    def handle(self, *args, **options):
+        analysis_ids: list[int] = options["analysis_ids"]
+
+        if analysis_ids:
+            missing = set(analysis_ids) - set(
+                Analysis.objects.filter(pk__in=analysis_ids).values_list(
+                    "analysis_id", flat=True
+                )
+            )
+            if missing:
+                raise CommandError(f"Analyses {sorted(missing)} do not exist")
+        else:
+            analysis_ids = list(
+                Analysis.objects.values_list("analysis_id", flat=True)
+            )
+
+        for analysis_id in analysis_ids:
+            count = rebuild_leaderboard(analysis_id)
+            self.stdout.write(
+                f"Rebuilt leaderboard of analysis {analysis_id} with "
+                f"{count} entries"
+            )
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyses.models import Analysis
+from base.utils import get_submission_queue, send_submission_message
+from submissions.models import Submission
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue the finished submissions of an analysis for re-evaluation. "
+        "Workers only run the files that are new or have changed since a "
+        "submission was last evaluated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("analysis_id", type=int)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the submissions without queueing them",
+        )
+
+    def handle(self, *args, **options):
+        analysis_id: int = options["analysis_id"]
+
+        try:
+            analysis = Analysis.objects.get(pk=analysis_id)
+        except Analysis.DoesNotExist:
+            raise CommandError(f"Analysis {analysis_id} does not exist")
+
+        submissions = (
+            Submission.objects.filter(
+                analysis=analysis,
+                status=Submission.FINISHED,
+                archived=False,
+            )
+            .select_related("created_by")
+            .order_by("submission_id")
+        )
+
+        queue = None if options["dry_run"] else get_submission_queue()
+
+        count = 0
+        for submission in submissions:
+            count += 1
+            if queue is None:
+                self.stdout.write(f"Would queue {submission.submission_id}")
+                continue
+
+            message = {
+                "analysis_pk": analysis.analysis_id,
+                "submission_pk": submission.submission_id,
+                "user_pk": submission.created_by.uuid,
+                "submission_filename": submission.algorithm_s3_path.split("/")[
+                    -1
+                ],
+                "python_version": str(submission.python_version),
+                "reevaluate": True,
+            }
+            send_submission_message(
+                queue,
+                message,
+                submission.created_by.uuid,
+                submission.submission_id,
+                deduplication_id=(
+                    f"{submission.submission_id}_reevaluate_{analysis.hash}"
+                ),
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'Found' if queue is None else 'Queued'} {count} "
+                f"submissions of analysis {analysis_id} for re-evaluation"
+            )
+        )
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:00
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "file_metadata",
+            "0004_rename_is_real_filemetadata_include_on_leaderboard",
+        ),
+        ("submissions", "0014_alter_submission_analysis_version_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionFileResult",
+            fields=[
+                (
+                    "result_id",
+                    models.BigAutoField(primary_key=True, serialize=False),
+                ),
+                ("file_name", models.CharField(max_length=256)),
+                ("runtime", models.FloatField(blank=True, null=True)),
+                ("metrics", models.JSONField(blank=True, default=dict)),
+                (
+                    "file",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="submission_results",
+                        to="file_metadata.filemetadata",
+                    ),
+                ),
+                (
+                    "submission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="file_results",
+                        to="submissions.submission",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["metrics"], name="file_result_metrics_gin"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("submission", "file_name"),
+                        name="unique_submission_file_result",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:00
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyses", "0007_analysis_hash_alter_analysis_version"),
+        ("submissions", "0015_submissionfileresult"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "submission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="leaderboard_entry",
+                        serialize=False,
+                        to="submissions.submission",
+                    ),
+                ),
+                ("error_rate", models.FloatField(default=0.0)),
+                ("mrt", models.FloatField(blank=True, null=True)),
+                (
+                    "payload",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "analysis",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entries",
+                        to="analyses.analysis",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["analysis", "error_rate", "mrt"],
+                        name="leaderboard_rank_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 
 from analyses.models import Analysis
+from file_metadata.models import FileMetadata
 from base.utils import RandomFileName
 from accounts.models import Account
 from decimal import Decimal
@@ -69,3 +72,70 @@ class Submission(models.Model):
 
     worker_version = models.CharField(max_length=100, default="1.0")
     analysis_version = models.CharField(max_length=100, default="1.0")
+
+
+class SubmissionFileResult(models.Model):
+    """
+    Runtime and metrics of one analysis file in a submission's evaluation,
+    stored by the worker in one bulk insert once the evaluation finishes.
+    """
+
+    result_id = models.BigAutoField(primary_key=True)
+    submission = models.ForeignKey(
+        Submission, related_name="file_results", on_delete=models.CASCADE
+    )
+    file = models.ForeignKey(
+        FileMetadata,
+        related_name="submission_results",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    file_name = models.CharField(max_length=256)
+    runtime = models.FloatField(null=True, blank=True)  # in seconds
+    # json object of metric/value pairs {"absolute_error_azimuth": 2.5}
+    metrics = models.JSONField(blank=True, default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["submission", "file_name"],
+                name="unique_submission_file_result",
+            )
+        ]
+        indexes = [
+            # Lets metric filters use the index, e.g. metrics__has_key
+            GinIndex(fields=["metrics"], name="file_result_metrics_gin"),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A finished submission's row on its analysis leaderboard, stored as the
+    payload the leaderboard returns so the leaderboard is read from one
+    table. Kept up to date by `submissions.leaderboard`.
+    """
+
+    submission = models.OneToOneField(
+        Submission,
+        primary_key=True,
+        related_name="leaderboard_entry",
+        on_delete=models.CASCADE,
+    )
+    analysis = models.ForeignKey(
+        Analysis, related_name="leaderboard_entries", on_delete=models.CASCADE
+    )
+    # Ranking keys, copied from the submission and its error report
+    error_rate = models.FloatField(default=0.0)
+    mrt = models.FloatField(null=True, blank=True)
+    # SubmissionDetailSerializer output of the submission
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["analysis", "error_rate", "mrt"],
+                name="leaderboard_rank_idx",
+            ),
+        ]
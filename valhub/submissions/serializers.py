@@ -1,10 +1,12 @@
+from django.db.models import OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from .models import Submission
 from analyses.models import Analysis
 from accounts.models import Account
 from error_report.models import ErrorReport
 from error_report.serializers import ErrorReportLeaderboardSerializer
-from versions.models import Versions
+from versions.models import get_current_versions
 import json
 import logging
 
@@ -12,6 +14,35 @@ logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
+def annotate_error_rate(
+    submissions: QuerySet[Submission],
+) -> QuerySet[Submission]:
+    """
+    Annotate each submission with the error rate the serializers report, so
+    serializing a list of submissions does not query every error report.
+    """
+    # Same report as ErrorReport.objects.filter(submission=...).first()
+    error_rate = (
+        ErrorReport.objects.filter(submission=OuterRef("pk"))
+        .order_by("error_id")
+        .values("error_rate")[:1]
+    )
+    return submissions.annotate(
+        annotated_error_rate=Coalesce(Subquery(error_rate), Value(0.0))
+    )
+
+
+def get_error_rate(submission: Submission) -> float:
+    if hasattr(submission, "annotated_error_rate"):
+        return submission.annotated_error_rate  # type: ignore
+    error_report = ErrorReport.objects.filter(submission=submission).first()
+    return (
+        error_report.error_rate
+        if error_report and error_report.error_rate is not None
+        else 0
+    )
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = Account
@@ -48,19 +79,16 @@ class SubmissionSerializer(serializers.ModelSerializer):
         )
 
     def get_error_rate(self, obj):
-        error_report = ErrorReport.objects.filter(submission=obj).first()
-        return (
-            error_report.error_rate
-            if error_report and error_report.error_rate is not None
-            else 0
-        )
+        return get_error_rate(obj)
 
     def get_worker_version(self, obj):
-        try:
-            version = Versions.objects.get(pk=1)
-            return version.cur_worker_version
-        except Versions.DoesNotExist:
-            return None
+        # A list shares one child serializer, so this runs once per list
+        if not hasattr(self, "_cur_worker_version"):
+            version = get_current_versions()
+            self._cur_worker_version = (
+                version.cur_worker_version if version is not None else None
+            )
+        return self._cur_worker_version
 
     def to_representation(self, instance):
         data = super(SubmissionSerializer, self).to_representation(instance)
@@ -86,11 +114,7 @@ class SubmissionSerializer(serializers.ModelSerializer):
         data["current_file_count"] = instance.current_file_count
 
         # Update worker_version to use the value from Versions model with PK 1
-        try:
-            version = Versions.objects.get(pk=1)
-            data["worker_version"] = version.cur_worker_version
-        except Versions.DoesNotExist:
-            data["worker_version"] = None
+        data["worker_version"] = self.get_worker_version(instance)
 
         return data
 
@@ -124,12 +148,7 @@ class SubmissionDetailSerializer(serializers.ModelSerializer):
         )
 
     def get_error_rate(self, obj):
-        error_report = ErrorReport.objects.filter(submission=obj).first()
-        return (
-            error_report.error_rate
-            if error_report and error_report.error_rate is not None
-            else 0
-        )
+        return get_error_rate(obj)
 
     def to_representation(self, instance):
         data = super(SubmissionDetailSerializer, self).to_representation(
@@ -1,3 +1,323 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.models import Account
+from analyses.models import Analysis
+from base.utils import get_submission_message_group_id
+from error_report.models import ErrorReport
+from file_metadata.models import FileMetadata
+from system_metadata.models import SystemMetadata
+from versions.models import Versions
+from .models import Submission, SubmissionFileResult
+
+
+class SubmissionMessageGroupTestCase(SimpleTestCase):
+    def test_submissions_of_a_user_share_a_group(self):
+        self.assertEqual(
+            get_submission_message_group_id(1001, 1),
+            get_submission_message_group_id(1001, 2),
+        )
+
+    def test_users_get_separate_groups(self):
+        self.assertNotEqual(
+            get_submission_message_group_id(1001, 1),
+            get_submission_message_group_id(1002, 1),
+        )
+
+    @override_settings(SUBMISSION_QUEUE_USER_LANES=2)
+    def test_lanes_split_a_user_across_groups(self):
+        group_ids = {
+            get_submission_message_group_id(1001, submission_id)
+            for submission_id in range(10)
+        }
+        self.assertEqual(len(group_ids), 2)
+
+
+class ReevaluateAnalysisCommandTestCase(TestCase):
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            username="user", email="user@test.com", password="user"
+        )
+        self.analysis = Analysis.objects.create(
+            analysis_name="Analysis 1", hash="abc123"
+        )
+        self.finished = Submission.objects.create(
+            analysis=self.analysis,
+            created_by=self.user,
+            algorithm_s3_path="https://bucket/submission_1/archive.zip",
+            status=Submission.FINISHED,
+        )
+        Submission.objects.create(
+            analysis=self.analysis,
+            created_by=self.user,
+            algorithm_s3_path="https://bucket/submission_2/archive.zip",
+            status=Submission.FAILED,
+        )
+
+    @mock.patch(
+        "submissions.management.commands.reevaluate_analysis.get_submission_queue"
+    )
+    def test_queues_finished_submissions(self, get_submission_queue):
+        queue = get_submission_queue.return_value
+
+        call_command(
+            "reevaluate_analysis", self.analysis.analysis_id, stdout=StringIO()
+        )
+
+        queue.send_message.assert_called_once()
+        message = json.loads(
+            queue.send_message.call_args.kwargs["MessageBody"]
+        )
+        self.assertEqual(message["submission_pk"], self.finished.submission_id)
+        self.assertEqual(message["submission_filename"], "archive.zip")
+        self.assertTrue(message["reevaluate"])
+
+
+class BulkSubmissionProgressTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = Account.objects.create_user(
+            username="worker", email="worker@test.com", password="worker"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.analysis = Analysis.objects.create(
+            analysis_name="Analysis 1", total_files=10
+        )
+        self.submission = Submission.objects.create(
+            analysis=self.analysis,
+            created_by=self.user,
+            algorithm_s3_path="https://bucket/submission_1/archive.zip",
+            avg_file_exec_time=2.0,
+            current_file_count=2,
+        )
+        self.error_report = ErrorReport.objects.create(
+            submission=self.submission, file_errors={"errors": []}
+        )
+
+    def test_applies_batch_in_one_request(self):
+        error = {
+            "error_code": "op_500",
+            "error_type": "Operation",
+            "error_message": "Failed to run",
+            "file_name": "3.csv",
+        }
+        response = self.client.post(
+            reverse(
+                "bulk_submission_progress",
+                kwargs={"submission_id": self.submission.submission_id},
+            ),
+            {"file_count": 2, "total_exec_time": 8.0, "errors": [error]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.current_file_count, 4)
+        self.assertAlmostEqual(self.submission.avg_file_exec_time, 3.0)
+        self.assertAlmostEqual(self.submission.progress, 18.0)
+
+        self.error_report.refresh_from_db()
+        self.assertEqual(self.error_report.file_errors["errors"], [error])
+        self.assertAlmostEqual(self.error_report.error_rate, 0.1)
+
+    def test_rejects_incomplete_errors(self):
+        response = self.client.post(
+            reverse(
+                "bulk_submission_progress",
+                kwargs={"submission_id": self.submission.submission_id},
+            ),
+            {"file_count": 1, "errors": [{"file_name": "3.csv"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.current_file_count, 2)
+
+    def test_rejects_errors_that_are_not_a_list_of_objects(self):
+        url = reverse(
+            "bulk_submission_progress",
+            kwargs={"submission_id": self.submission.submission_id},
+        )
+        for errors in ["3.csv failed", {"file_name": "3.csv"}, ["3.csv"]]:
+            response = self.client.post(
+                url, {"file_count": 1, "errors": errors}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.current_file_count, 2)
+
+
+class SubmissionFileResultsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = Account.objects.create_user(
+            username="worker", email="worker@test.com", password="worker"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.analysis = Analysis.objects.create(analysis_name="Analysis 1")
+        self.submission = Submission.objects.create(
+            analysis=self.analysis,
+            created_by=self.user,
+            algorithm_s3_path="https://bucket/submission_1/archive.zip",
+        )
+        system = SystemMetadata.objects.create(
+            name="System 1",
+            azimuth=180.0,
+            tilt=30.0,
+            elevation=20.0,
+            latitude=37.7749,
+            longitude=-122.4194,
+            tracking=True,
+            dc_capacity=100.0,
+        )
+        self.files = [
+            FileMetadata.objects.create(
+                system_id=system,
+                file_name=f"{i}.csv",
+                timezone="UTC",
+                data_sampling_frequency=5,
+                issue=issue,
+                subissue="Subissue 1",
+                file_hash=f"hash{i}",
+            )
+            for i, issue in enumerate(["DST", "Clipping"])
+        ]
+        self.url = reverse(
+            "submission_file_results",
+            kwargs={"submission_id": self.submission.submission_id},
+        )
+
+    def post_results(self, runtime: float):
+        return self.client.post(
+            self.url,
+            {
+                "results": [
+                    {
+                        "file_id": file.file_id,
+                        "file_name": file.file_name,
+                        "runtime": runtime,
+                        "metrics": {"absolute_error_azimuth": 2.5},
+                    }
+                    for file in self.files
+                ]
+            },
+            format="json",
+        )
+
+    def test_results_are_replaced_and_streamed(self):
+        self.assertEqual(
+            self.post_results(1.0).status_code, status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            self.post_results(2.0).status_code, status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            SubmissionFileResult.objects.filter(
+                submission=self.submission
+            ).count(),
+            2,
+        )
+
+        response = self.client.get(self.url, {"issue": "DST"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            rows,
+            [
+                {
+                    "file_id": self.files[0].file_id,
+                    "file_name": "0.csv",
+                    "runtime": 2.0,
+                    "metrics": {"absolute_error_azimuth": 2.5},
+                    "issue": "DST",
+                }
+            ],
+        )
+
+    def test_results_are_private_to_the_owner_and_staff(self):
+        self.post_results(1.0)
+
+        other_user = Account.objects.create_user(
+            username="other", email="other@test.com", password="other"
+        )
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        staff = Account.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="admin",
+            is_staff=True,
+        )
+        self.client.force_authenticate(user=staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            len(b"".join(response.streaming_content).splitlines()), 2
+        )
+
+
+class UserSubmissionsListingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = Account.objects.create_user(
+            username="user", email="user@test.com", password="user"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.analysis = Analysis.objects.create(analysis_name="Analysis 1")
+        Versions.objects.create(pk=1, cur_worker_version=2.0)
+        self.url = reverse(
+            "get_user_submissions",
+            kwargs={"user_id": self.user.uuid, "analysis_id": 0},
+        )
+
+    def create_submissions(self, count):
+        for _ in range(count):
+            submission = Submission.objects.create(
+                analysis=self.analysis,
+                created_by=self.user,
+                algorithm_s3_path="https://bucket/submission/archive.zip",
+            )
+            ErrorReport.objects.create(
+                submission=submission,
+                error_rate=0.5,
+                file_errors={"errors": []},
+            )
+
+    def get_submissions(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_lists_in_constant_queries(self):
+        self.create_submissions(1)
+        # The first listing caches the Versions row
+        self.get_submissions()
+        with CaptureQueriesContext(connection) as few:
+            self.get_submissions()
+
+        self.create_submissions(10)
+        with CaptureQueriesContext(connection) as many:
+            submissions = self.get_submissions()
+
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertEqual(len(submissions), 11)
+        self.assertEqual(submissions[0]["error_rate"], 0.5)
+        self.assertEqual(submissions[0]["worker_version"], 2.0)
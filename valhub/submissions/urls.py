@@ -18,6 +18,16 @@ urlpatterns = [
         views.increment_submission_progress,
         name="increment_submission_progress",
     ),
+    path(
+        "submission/<int:submission_id>/progress_bulk",
+        views.bulk_submission_progress,
+        name="bulk_submission_progress",
+    ),
+    path(
+        "submission/<int:submission_id>/file_results",
+        views.submission_file_results,
+        name="submission_file_results",
+    ),
     path(
         "change_submission_status/<int:submission_id>",
         views.change_submission_status,
@@ -1,8 +1,10 @@
 from typing import Any, cast
 from venv import logger
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, QuerySet
 
 from rest_framework.response import Response
 from rest_framework.request import Request
@@ -20,23 +22,33 @@ from rest_framework.authentication import (
 )
 from rest_framework.permissions import IsAuthenticated
 
+import json
 import requests
 import os
-import json
 import boto3
 import botocore.exceptions
 import logging
 
 from analyses.models import Analysis
-from base.utils import upload_to_s3_bucket, is_emulation, create_cloudfront_url
+from base.utils import (
+    get_submission_queue,
+    upload_to_s3_bucket,
+    is_emulation,
+    create_cloudfront_url,
+    send_submission_message,
+)
 from accounts.models import Account
-from .models import Submission
+from error_report.models import ErrorReport
+from file_metadata.models import FileMetadata
+from .models import Submission, SubmissionFileResult
+from .leaderboard import refresh_leaderboard_entry
 from urllib.parse import urljoin
 
 from .serializers import (
     SubmissionSerializer,
     SubmissionDetailSerializer,
     SubmissionPrivateReportSerializer,
+    annotate_error_rate,
 )
 from .models import Submission
 
@@ -47,6 +59,7 @@ logger = logging.getLogger(__name__)
 
 # Create your views here.
 S3_BUCKET_NAME = "valhub-bucket"
+FILE_RESULTS_BATCH_SIZE = 1000
 
 
 def is_local():
@@ -66,6 +79,18 @@ def is_local():
 is_s3_emulation = is_local()
 
 
+def list_submissions(**filters: Any) -> QuerySet[Submission]:
+    """
+    Submissions matching `filters`, with everything SubmissionSerializer
+    needs loaded in the same query.
+    """
+    return annotate_error_rate(
+        Submission.objects.filter(**filters).select_related(
+            "analysis", "created_by"
+        )
+    )
+
+
 @api_view(["POST"])
 @authentication_classes([TokenAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
@@ -97,22 +122,7 @@ def analysis_submission(request: Request, analysis_id: str):
 
     # check if the analysis queue exists or not
     try:
-        if is_s3_emulation:
-            sqs = boto3.resource(
-                "sqs",
-                endpoint_url="http://sqs:9324",
-                region_name="elasticmq",
-                aws_secret_access_key="x",
-                aws_access_key_id="x",
-                use_ssl=False,
-            )
-        else:
-            sqs = boto3.resource(
-                "sqs",
-                region_name=os.environ.get("AWS_DEFAULT_REGION", "us-west-2"),
-            )
-        queue_name = "valhub_submission_queue.fifo"
-        queue = sqs.get_queue_by_name(QueueName=queue_name)
+        queue = get_submission_queue()
     except botocore.exceptions.ClientError as ex:
         logging.info(f"botocore.exceptions.ClientError = {ex}")
         response_data = {"error": "Queue does not exist"}
@@ -164,20 +174,16 @@ def analysis_submission(request: Request, analysis_id: str):
         # serializer.save(algorithm=object_url)
 
         # send a message to SQS queue
-        message = json.dumps(
-            {
-                "analysis_pk": int(analysis_id),
-                "submission_pk": int(submission_id),
-                "user_pk": int(user.uuid),
-                "submission_filename": object_url.split("/")[-1],
-                "python_version": str(submission_instance.python_version),
-            }
-        )
+        message = {
+            "analysis_pk": int(analysis_id),
+            "submission_pk": int(submission_id),
+            "user_pk": int(user.uuid),
+            "submission_filename": object_url.split("/")[-1],
+            "python_version": str(submission_instance.python_version),
+        }
 
-        response = queue.send_message(
-            MessageBody=message,
-            MessageGroupId="1",
-            MessageDeduplicationId=str(submission_id),
+        response = send_submission_message(
+            queue, message, user.uuid, submission_id
         )
 
         # serializers.serialize('json', [serializer.instance])
@@ -245,12 +251,41 @@ def change_submission_status(request: Request, submission_id: str):
     except ValidationError as e:
         response_data = {"error": "invalid submission status"}
         return Response(response_data, status=status.HTTP_406_NOT_ACCEPTABLE)
+    refresh_leaderboard_entry(submission.submission_id)
     response_data = {
         "success": f"submission {submission_id} status changed to {new_status}"
     }
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+def apply_progress_increment(
+    submission_id: int,
+    total_files: int,
+    file_count: int,
+    total_exec_time: float,
+):
+    """
+    Fold `file_count` finished files taking `total_exec_time` seconds in
+    total into a submission's progress. The running average is computed in
+    a single UPDATE, so concurrent increments cannot overwrite each other.
+    """
+    new_file_count = F("current_file_count") + file_count
+    new_avg_file_exec_time = ExpressionWrapper(
+        (F("avg_file_exec_time") * F("current_file_count") + total_exec_time)
+        / new_file_count,
+        output_field=FloatField(),
+    )
+
+    Submission.objects.filter(submission_id=submission_id).update(
+        current_file_count=new_file_count,
+        avg_file_exec_time=new_avg_file_exec_time,
+        progress=ExpressionWrapper(
+            (total_files - new_file_count) * new_avg_file_exec_time,
+            output_field=FloatField(),
+        ),
+    )
+
+
 @api_view(["POST"])
 @csrf_exempt
 @authentication_classes([TokenAuthentication, SessionAuthentication])
@@ -282,34 +317,201 @@ def increment_submission_progress(request: Request, submission_id: str):
             return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
     file_exec_time: str = request_data.get("file_exec_time", "0")
-    current_file_count = submission.current_file_count
-    avg_file_exec_time = submission.avg_file_exec_time
-
-    logger.info(f"current_file_count = {current_file_count}")
-    logger.info(f"avg_file_exec_time = {avg_file_exec_time}")
 
-    new_current_file_count = current_file_count + 1
-    # Itterative average calculation
-    new_avg_file_exec_time = (
-        avg_file_exec_time
-        + (float(file_exec_time) - avg_file_exec_time) / new_current_file_count
+    apply_progress_increment(
+        submission.submission_id, total_files, 1, float(file_exec_time)
     )
 
-    logger.info(f"new_current_file_count = {new_current_file_count}")
-    logger.info(f"new_avg_file_exec_time = {new_avg_file_exec_time}")
-
-    submission.current_file_count = new_current_file_count
-    submission.avg_file_exec_time = new_avg_file_exec_time
-    submission.progress = (
-        total_files - new_current_file_count
-    ) * new_avg_file_exec_time
-    submission.save()
     response_data = {
         "success": f"submission {submission_id} progress incremented"
     }
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+@api_view(["POST"])
+@csrf_exempt
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def bulk_submission_progress(request: Request, submission_id: str):
+    """
+    Apply a batch of finished files and their non-breaking errors, as
+    buffered by the worker, in one transaction.
+    """
+    try:
+        submission = Submission.objects.select_related("analysis").get(
+            submission_id=submission_id
+        )
+    except Submission.DoesNotExist:
+        response_data = {"error": "submission does not exist"}
+        return Response(response_data, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    total_files = submission.analysis.total_files
+    if total_files == 0:
+        response_data = {"error": "total_files is 0"}
+        return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
+    request_data = cast(dict[str, Any] | None, request.data)
+
+    if request_data is None:
+        response_data = {"error": "No data provided"}
+        return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        file_count = int(request_data.get("file_count", 0))
+        total_exec_time = float(request_data.get("total_exec_time", 0.0))
+    except (TypeError, ValueError):
+        response_data = {
+            "error": "file_count and total_exec_time must be numbers"
+        }
+        return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
+    errors: list[dict[str, Any]] = request_data.get("errors", [])
+    if not isinstance(errors, list) or not all(
+        isinstance(error, dict) for error in errors
+    ):
+        response_data = {"error": "errors must be a list of objects"}
+        return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
+    required_fields = [
+        "error_code",
+        "error_type",
+        "error_message",
+        "file_name",
+    ]
+    for error in errors:
+        for field in required_fields:
+            if field not in error:
+                response_data = {"error": f"{field} is required"}
+                return Response(
+                    response_data, status=status.HTTP_400_BAD_REQUEST
+                )
+
+    with transaction.atomic():
+        if file_count > 0:
+            apply_progress_increment(
+                submission.submission_id,
+                total_files,
+                file_count,
+                total_exec_time,
+            )
+
+        if errors:
+            error_report = (
+                ErrorReport.objects.select_for_update()
+                .filter(submission=submission)
+                .first()
+            )
+            if error_report is None:
+                transaction.set_rollback(True)
+                response_data = {"error": "Error report not found"}
+                return Response(
+                    response_data, status=status.HTTP_404_NOT_FOUND
+                )
+
+            file_errors: list[dict[str, Any]] = (
+                error_report.file_errors or {}
+            ).get("errors", [])
+            file_errors.extend(errors)
+            error_report.file_errors = {"errors": file_errors}
+            error_report.error_rate = len(file_errors) / total_files
+            error_report.save(update_fields=["file_errors", "error_rate"])
+            refresh_leaderboard_entry(submission.submission_id)
+
+    response_data = {
+        "success": f"submission {submission_id} progress updated with {file_count} files and {len(errors)} errors"
+    }
+    return Response(response_data, status=status.HTTP_200_OK)
+
+
+@api_view(["GET", "POST"])
+@csrf_exempt
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def submission_file_results(request: Request, submission_id: str):
+    """
+    POST replaces the per-file results of a submission in one bulk insert.
+    GET streams them as JSON lines, optionally filtered by `issue`, to the
+    submission's owner and to staff accounts such as the worker's.
+    """
+    try:
+        submission = Submission.objects.get(submission_id=submission_id)
+    except Submission.DoesNotExist:
+        response_data = {"error": "submission does not exist"}
+        return Response(response_data, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    if request.method == "GET":
+        user = request.user
+        if not user.is_staff and submission.created_by_id != user.pk:
+            response_data = {"error": "submission does not exist"}
+            return Response(response_data, status=status.HTTP_404_NOT_FOUND)
+
+        file_results = submission.file_results.order_by("file_name")
+        issue = request.query_params.get("issue")
+        if issue is not None:
+            file_results = file_results.filter(file__issue=issue)
+
+        rows = file_results.values(
+            "file_id",
+            "file_name",
+            "runtime",
+            "metrics",
+            issue=F("file__issue"),
+        ).iterator(chunk_size=FILE_RESULTS_BATCH_SIZE)
+        return StreamingHttpResponse(
+            (json.dumps(row) + "\n" for row in rows),
+            content_type="application/x-ndjson",
+        )
+
+    request_data = cast(dict[str, Any] | None, request.data)
+
+    if request_data is None or "results" not in request_data:
+        response_data = {"error": "results is required"}
+        return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
+    results: list[dict[str, Any]] = request_data["results"]
+
+    file_ids = {
+        result["file_id"]
+        for result in results
+        if result.get("file_id") is not None
+    }
+    # Files deleted since the evaluation are stored without a file
+    existing_file_ids = set(
+        FileMetadata.objects.filter(file_id__in=file_ids).values_list(
+            "file_id", flat=True
+        )
+    )
+
+    file_results: list[SubmissionFileResult] = []
+    for result in results:
+        if "file_name" not in result:
+            response_data = {"error": "file_name is required"}
+            return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
+        file_id = result.get("file_id")
+        file_results.append(
+            SubmissionFileResult(
+                submission=submission,
+                file_id=file_id if file_id in existing_file_ids else None,
+                file_name=result["file_name"],
+                runtime=result.get("runtime"),
+                metrics=result.get("metrics") or {},
+            )
+        )
+
+    # A re-evaluation replaces the results of the previous one
+    with transaction.atomic():
+        submission.file_results.all().delete()
+        SubmissionFileResult.objects.bulk_create(
+            file_results, batch_size=FILE_RESULTS_BATCH_SIZE
+        )
+
+    response_data = {
+        "success": f"{len(file_results)} file results stored for submission {submission_id}"
+    }
+    return Response(response_data, status=status.HTTP_201_CREATED)
+
+
 @api_view(["PUT"])
 @csrf_exempt
 @authentication_classes([TokenAuthentication, SessionAuthentication])
@@ -352,6 +554,7 @@ def update_submission_result(request: Request, submission_id: str):
     except ValidationError as e:
         response_data = {"error": "invalid submission result"}
         return Response(response_data, status=status.HTTP_406_NOT_ACCEPTABLE)
+    refresh_leaderboard_entry(submission.submission_id)
     response_data = {
         "success": f"submission {submission_id} result changed to {request.data}"
     }
@@ -371,7 +574,7 @@ def user_submission(request: Request, user_id: str):
         response_data = {"error": "User account does not exist"}
         return Response(response_data, status=status.HTTP_406_NOT_ACCEPTABLE)
 
-    submissions = Submission.objects.filter(created_by=user)
+    submissions = list_submissions(created_by=user)
     serializer = SubmissionSerializer(submissions, many=True)
 
     return Response(serializer.data)
@@ -394,7 +597,7 @@ def analysis_user_submission(request, analysis_id):
         return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
     user = request.user
-    submissions = Submission.objects.filter(analysis=analysis, created_by=user)
+    submissions = list_submissions(analysis=analysis, created_by=user)
     response_data = SubmissionSerializer(submissions, many=True).data
     return Response(response_data, status=status.HTTP_200_OK)
 
@@ -451,6 +654,7 @@ def leaderboard_update(request: Request):
             submission.data_requirements = data_requirements
 
         submission.save()
+        refresh_leaderboard_entry(submission.submission_id)
 
         response_data = SubmissionSerializer(submission).data
         return Response(response_data, status=status.HTTP_200_OK)
@@ -496,6 +700,7 @@ def preload_submissions(request: Request):
             ),
         )
         submission.save()
+        refresh_leaderboard_entry(submission.submission_id)
 
     return JsonResponse(
         {"message": "Submissions preloaded successfully."},
@@ -644,9 +849,7 @@ def get_user_submissions(request: Request, user_id: str, analysis_id: str):
                 response_data, status=status.HTTP_406_NOT_ACCEPTABLE
             )
 
-        user_submissions = Submission.objects.filter(
-            created_by=user, archived=False
-        )
+        user_submissions = list_submissions(created_by=user, archived=False)
         response_data = SubmissionSerializer(user_submissions, many=True).data
         return Response(response_data, status=status.HTTP_200_OK)
     elif analysis_id == -1:
@@ -658,9 +861,7 @@ def get_user_submissions(request: Request, user_id: str, analysis_id: str):
                 response_data, status=status.HTTP_406_NOT_ACCEPTABLE
             )
 
-        user_submissions = Submission.objects.filter(
-            created_by=user, archived=True
-        )
+        user_submissions = list_submissions(created_by=user, archived=True)
         response_data = SubmissionSerializer(user_submissions, many=True).data
         return Response(response_data, status=status.HTTP_200_OK)
     else:
@@ -678,7 +879,7 @@ def get_user_submissions(request: Request, user_id: str, analysis_id: str):
             response_data = {"error": "Analysis does not exist"}
             return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
-        user_submissions = Submission.objects.filter(
+        user_submissions = list_submissions(
             created_by=user, analysis=analysis, archived=False
         ).order_by("submitted_at")
         response_data = SubmissionSerializer(user_submissions, many=True).data
@@ -696,9 +897,7 @@ def get_archived_user_submissions(request: Request, user_id: str):
         response_data = {"error": "User account does not exist"}
         return Response(response_data, status=status.HTTP_406_NOT_ACCEPTABLE)
 
-    user_submissions = Submission.objects.filter(
-        created_by=user, archived=True
-    )
+    user_submissions = list_submissions(created_by=user, archived=True)
     response_data = SubmissionSerializer(user_submissions, many=True).data
     return Response(response_data, status=status.HTTP_200_OK)
 
@@ -730,6 +929,7 @@ def set_submission_name(request: Request, user_id: str, submission_id: str):
 
     submission.alt_name = alt_name
     submission.save()
+    refresh_leaderboard_entry(submission.submission_id)
 
     response_data = SubmissionSerializer(submission).data
     return JsonResponse(response_data, status=status.HTTP_200_OK)
@@ -761,6 +961,7 @@ def archive_submission(request: Request, user_id: str, submission_id: str):
 
     submission.archived = archived
     submission.save()
+    refresh_leaderboard_entry(submission.submission_id)
 
     response_data = SubmissionSerializer(submission).data
     return JsonResponse(response_data, status=status.HTTP_200_OK)
@@ -360,3 +360,12 @@ STATIC_URL = "/staticfiles/"
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Number of submissions of a single user that may be evaluated at once.
+# Above 1 a user's submissions are no longer evaluated in order
+SUBMISSION_QUEUE_USER_LANES = int(
+    os.environ.get("SUBMISSION_QUEUE_USER_LANES", "1")
+)
+
+# Seconds the current Versions row is cached for by each process
+VERSIONS_CACHE_TIMEOUT = int(os.environ.get("VERSIONS_CACHE_TIMEOUT", "300"))
@@ -1,4 +1,9 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+
+# Cache key of the Versions row that holds the current versions
+VERSIONS_CACHE_KEY = "versions_current"
 
 
 def default_python_versions():
@@ -12,3 +17,37 @@ class Versions(models.Model):
     old_python_versions = models.JSONField(null=True, blank=True, default=dict)
     cur_worker_version = models.FloatField(null=True, blank=True, default=1.0)
     old_worker_versions = models.JSONField(null=True, blank=True, default=dict)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        transaction.on_commit(invalidate_current_versions)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(invalidate_current_versions)
+        return result
+
+
+def get_current_versions() -> Versions | None:
+    """
+    The Versions row with pk 1, which holds the current versions.
+
+    The row is cached for `VERSIONS_CACHE_TIMEOUT` seconds and dropped from
+    the cache whenever a Versions row is saved or deleted. With the default
+    per-process cache, other processes see a change once their copy times
+    out.
+    """
+    versions: Versions | None = cache.get(VERSIONS_CACHE_KEY)
+    if versions is None:
+        versions = Versions.objects.filter(pk=1).first()
+        if versions is not None:
+            cache.set(
+                VERSIONS_CACHE_KEY,
+                versions,
+                timeout=settings.VERSIONS_CACHE_TIMEOUT,
+            )
+    return versions
+
+
+def invalidate_current_versions():
+    cache.delete(VERSIONS_CACHE_KEY)
@@ -1,5 +1,10 @@
+from django.core.cache import cache
 from django.test import TestCase
-from .models import Versions
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .models import Versions, get_current_versions
 
 
 class VersionsModelTest(TestCase):
@@ -14,3 +19,29 @@ class VersionsModelTest(TestCase):
     def test_versions_creation(self):
         self.assertTrue(isinstance(self.versions, Versions))
         self.assertEqual(self.versions.cur_worker_version, 1.0)
+
+
+class CurrentVersionsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.versions = Versions.objects.create(pk=1, cur_worker_version=1.0)
+
+    def test_caches_the_current_versions(self):
+        get_current_versions()
+
+        with self.assertNumQueries(0):
+            versions = get_current_versions()
+        self.assertEqual(versions.cur_worker_version, 1.0)
+
+    def test_update_through_detail_view_invalidates_the_cache(self):
+        get_current_versions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().patch(
+                reverse("versions-detail", kwargs={"pk": 1}),
+                {"cur_worker_version": 2.0},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(get_current_versions().cur_worker_version, 2.0)
@@ -25,7 +25,7 @@ import os
 import json
 import logging
 
-from .models import Versions
+from .models import Versions, get_current_versions
 from .serializers import VersionsSerializer
 
 
@@ -67,11 +67,10 @@ class VersionsDetailView(generics.RetrieveUpdateDestroyAPIView):
 @csrf_exempt
 @api_view(["GET"])
 def GetPythonVersions(request):
-    try:
-        version = Versions.objects.get(pk=1)
-        python_versions = list(version.python_versions)
-        return JsonResponse(python_versions, safe=False)
-    except Versions.DoesNotExist:
+    version = get_current_versions()
+    if version is None:
         return JsonResponse(
             {"error": "No versions found with ID 1"}, status=404
         )
+    python_versions = list(version.python_versions)
+    return JsonResponse(python_versions, safe=False)
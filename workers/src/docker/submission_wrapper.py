@@ -1,8 +1,11 @@
 from importlib import import_module
 import inspect
+import multiprocessing
+import os
 import pathlib
 import sys
 import json
+import traceback
 import pandas as pd
 import numpy as np
 from time import perf_counter
@@ -19,6 +22,16 @@ T = TypeVar("T")
 
 P = ParamSpec("P")
 
+POOL_MESSAGE_MARKER = "__valhub_pool__"
+
+COLUMNAR_FILE_EXTENSION = ".parquet"
+
+# OOM kill counters of the container's memory cgroup, v2 first
+OOM_KILL_COUNTER_FILES = [
+    "/sys/fs/cgroup/memory.events",
+    "/sys/fs/cgroup/memory/memory.oom_control",
+]
+
 
 def logger_if_able(
     message: object, logger: Optional[Logger] = None, level: str = "INFO"
@@ -71,6 +84,30 @@ def is_float(value: str) -> bool:
         return False
 
 
+def read_time_series_file(file_path: str) -> pd.DataFrame:
+    """
+    Read a time series, preferring the memory-mapped Parquet copy written
+    at ingestion and falling back to the CSV.
+    """
+    columnar_file_path = (
+        f"{os.path.splitext(file_path)[0]}{COLUMNAR_FILE_EXTENSION}"
+    )
+
+    if os.path.exists(columnar_file_path):
+        try:
+            return pd.read_parquet(
+                columnar_file_path, engine="pyarrow", memory_map=True
+            )
+        except ImportError:
+            print("pyarrow not installed, falling back to CSV")
+
+    return pd.read_csv(
+        file_path,
+        index_col=0,
+        parse_dates=True,
+    )
+
+
 def format_args_for_submission(
     data_dir: str, function_params: list[str], args: list[str]
 ):
@@ -78,11 +115,7 @@ def format_args_for_submission(
 
     file_path = f"{data_dir}/file_data/{filename}"
 
-    df = pd.read_csv(
-        file_path,
-        index_col=0,
-        parse_dates=True,
-    )
+    df = read_time_series_file(file_path)
 
     series: pd.Series = df.squeeze()
 
@@ -134,40 +167,18 @@ def import_submission_function(submission_file_name: str, function_name: str):
     return submission_function, function_parameters
 
 
-def main():
-    args = sys.argv[1:]
-
-    if len(args) < 1:
-        print("Function name not provided")
-        sys.exit(1)
-
-    submission_file_name = args[0]
-    function_name = args[1]
-    data_file_name = args[2]
-
-    print(args)
-
-    print("Getting submission function...")
-
-    try:
-        submission_function, function_parameters = import_submission_function(
-            submission_file_name, function_name
-        )
-    except AttributeError as e:
-        error_code = 500
-        exit(error_code)
-    print("Got submission function")
-
-    print(f"Submission file name: {submission_file_name}")
-    print(f"Function name: {function_name}")
-    print(f"Function: {submission_function}")
-    print(f"Function parameters: {function_parameters}")
-
-    data_dir = "/app/data"
-    results_dir = "/app/results"
+def run_submission_for_file(
+    submission_function: Callable,
+    function_name: str,
+    function_parameters: list[str],
+    args: list[str],
+    data_dir: str = "/app/data",
+    results_dir: str = "/app/results",
+):
+    data_file_name = args[0]
 
     submission_args = format_args_for_submission(
-        data_dir, function_parameters, args[2:]
+        data_dir, function_parameters, args
     )
 
     print(f"Submission args: {submission_args}")
@@ -215,5 +226,154 @@ def main():
     execution_df.to_csv(execution_file, mode="a", header=False, index=False)
 
 
+def read_oom_kill_count() -> Optional[int]:
+    """Number of processes the kernel OOM killer has killed in this
+    container, or None if the cgroup does not report it."""
+
+    for counter_file in OOM_KILL_COUNTER_FILES:
+        try:
+            with open(counter_file) as f:
+                for line in f:
+                    name, _, value = line.partition(" ")
+                    if name == "oom_kill":
+                        return int(value)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def emit_pool_message(message: dict[str, Any]):
+    # Leading newline keeps the marker on its own line even if the
+    # submission left a partial line on stdout
+    print(f"\n{POOL_MESSAGE_MARKER}{json.dumps(message)}", flush=True)
+
+
+def run_job_in_child_process(
+    submission_function: Callable,
+    function_name: str,
+    function_parameters: list[str],
+    args: list[str],
+):
+    try:
+        run_submission_for_file(
+            submission_function, function_name, function_parameters, args
+        )
+    except Exception:
+        traceback.print_exc()
+        sys.stdout.flush()
+        sys.exit(1)
+
+
+def serve(submission_file_name: str, function_name: str):
+    """
+    Resident loop used by the worker's container pool.
+
+    Reads one JSON job per line from stdin, runs each file in a forked
+    child so files stay isolated from each other while the imports done
+    here are shared, and reports the exit code of every job on stdout.
+    """
+
+    try:
+        submission_function, function_parameters = import_submission_function(
+            submission_file_name, function_name
+        )
+    except (AttributeError, ModuleNotFoundError):
+        error_code = 500
+        exit(error_code)
+
+    context = multiprocessing.get_context("fork")
+
+    emit_pool_message({"status": "ready"})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        job: dict[str, Any] = json.loads(line)
+        args: list[str] = job["args"]
+        job_timeout: float | None = job.get("timeout")
+
+        print(f"Running file job: {args}", flush=True)
+
+        process = context.Process(
+            target=run_job_in_child_process,
+            args=(
+                submission_function,
+                function_name,
+                function_parameters,
+                args,
+            ),
+        )
+        oom_kill_count = read_oom_kill_count()
+        process.start()
+        process.join(job_timeout)
+
+        timed_out = False
+        if process.is_alive():
+            timed_out = True
+            process.kill()
+            process.join()
+
+        exit_code = process.exitcode or 0
+        if exit_code < 0:
+            # Match the exit code docker reports for a signalled process
+            exit_code = 128 - exit_code
+
+        # Docker only flags OOM kills of the container's main process
+        oom_killed = (
+            exit_code != 0
+            and oom_kill_count is not None
+            and (read_oom_kill_count() or 0) > oom_kill_count
+        )
+
+        emit_pool_message(
+            {
+                "status": "done",
+                "job_id": job["job_id"],
+                "exit_code": exit_code,
+                "timed_out": timed_out,
+                "oom_killed": oom_killed,
+            }
+        )
+
+
+def main():
+    args = sys.argv[1:]
+
+    if len(args) < 1:
+        print("Function name not provided")
+        sys.exit(1)
+
+    if args[0] == "--serve":
+        serve(args[1], args[2])
+        return
+
+    submission_file_name = args[0]
+    function_name = args[1]
+
+    print(args)
+
+    print("Getting submission function...")
+
+    try:
+        submission_function, function_parameters = import_submission_function(
+            submission_file_name, function_name
+        )
+    except AttributeError as e:
+        error_code = 500
+        exit(error_code)
+    print("Got submission function")
+
+    print(f"Submission file name: {submission_file_name}")
+    print(f"Function name: {function_name}")
+    print(f"Function: {submission_function}")
+    print(f"Function parameters: {function_parameters}")
+
+    run_submission_for_file(
+        submission_function, function_name, function_parameters, args[2:]
+    )
+
+
 if __name__ == "__main__":
     main()
@@ -1,6 +1,7 @@
 import logging
 import logging.config
 import os
+import threading
 import json
 from typing import Any
 import datetime as dt
@@ -80,7 +81,21 @@ class NonErrorFilter(logging.Filter):
         return record.levelno <= logging.INFO
 
 
-def setup_logging(name: str):
+class ThreadNameFilter(logging.Filter):
+    """Only pass records from the named thread and from the threads it names
+    after itself, e.g. executors using it as their `thread_name_prefix`."""
+
+    def __init__(self, thread_name: str):
+        super().__init__()
+        self.thread_name = thread_name
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.threadName == self.thread_name or (
+            record.threadName or ""
+        ).startswith(f"{self.thread_name}_")
+
+
+def load_logging_config() -> dict[str, Any]:
     config_file_path = os.path.join(
         os.path.dirname(os.path.abspath(__file__)), "logging_config.json"
     )
@@ -93,6 +108,64 @@ def setup_logging(name: str):
     with open(config_file_path, "r") as f:
         config: dict[str, Any] = json.load(f)
 
+    return config
+
+
+class ThreadLogCapture:
+    """
+    Write the log records of the current thread to their own copies of the
+    submission log files in `log_dir`, so that submissions processed in
+    parallel each get their own logs.
+    """
+
+    def __init__(self, log_dir: str):
+        self.log_dir = log_dir
+
+        config = load_logging_config()
+        formatters = config["formatters"]
+        detailed_formatter = logging.Formatter(
+            formatters["detailed"]["format"],
+            datefmt=formatters["detailed"]["datefmt"],
+        )
+        json_formatter = JSONFormatter(fmt_keys=formatters["json"]["fmt_keys"])
+
+        os.makedirs(log_dir, exist_ok=True)
+
+        thread_filter = ThreadNameFilter(threading.current_thread().name)
+        self.handlers: list[logging.Handler] = []
+        for file_name, level, formatter in [
+            ("submission.log", logging.INFO, detailed_formatter),
+            ("submission.log.jsonl", logging.INFO, json_formatter),
+            ("submission.error.log", logging.ERROR, detailed_formatter),
+        ]:
+            handler = logging.FileHandler(os.path.join(log_dir, file_name))
+            handler.setLevel(level)
+            handler.setFormatter(formatter)
+            handler.addFilter(thread_filter)
+            self.handlers.append(handler)
+
+    def attach(self):
+        # `setup_logging` replaces the root handlers, so this is also called
+        # again after modules that configure logging have been imported
+        root_logger = logging.getLogger()
+        for handler in self.handlers:
+            if handler not in root_logger.handlers:
+                root_logger.addHandler(handler)
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *_: Any):
+        root_logger = logging.getLogger()
+        for handler in self.handlers:
+            root_logger.removeHandler(handler)
+            handler.close()
+
+
+def setup_logging(name: str):
+    config = load_logging_config()
+
     logging.config.dictConfig(config)
 
     logger = logging.getLogger(name)
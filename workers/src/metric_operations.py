@@ -50,3 +50,39 @@ performance_metrics_map = {
     "mean_absolute_error": p_mean_absolute_error,
     "error": p_error,
 }
+
+# ----------------------------
+# Vectorized Performance Metrics
+# ----------------------------
+# These take long-format series holding the outputs and references of many
+# files at once, indexed by file name, and return one value per file.
+# Metrics missing for a comparison type fall back to the per-file functions.
+
+
+def v_absolute_error(outputs: pd.Series, references: pd.Series):
+    absolute_difference = np.abs(outputs.to_numpy() - references.to_numpy())
+    return pd.Series(absolute_difference, index=outputs.index)
+
+
+def v_mean_absolute_error(outputs: pd.Series, references: pd.Series):
+    absolute_difference = v_absolute_error(outputs, references)
+    mean_absolute_error = absolute_difference.groupby(
+        level=0, sort=False
+    ).mean()
+    return mean_absolute_error
+
+
+def v_error(outputs: pd.Series, references: pd.Series):
+    difference = outputs.to_numpy() - references.to_numpy()
+    return pd.Series(difference, index=outputs.index)
+
+
+vectorized_performance_metrics_map = {
+    "scalar": {
+        "absolute_error": v_absolute_error,
+        "error": v_error,
+    },
+    "time_series": {
+        "mean_absolute_error": v_mean_absolute_error,
+    },
+}
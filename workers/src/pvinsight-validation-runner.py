@@ -25,38 +25,74 @@ from typing import (
     cast,
     ParamSpec,
 )
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
+import math
 import os
+import queue
+import threading
+import uuid
 from importlib import import_module
-from collections import ChainMap
+from collections import ChainMap, defaultdict
+from statistics import NormalDist
 import seaborn as sns
 import matplotlib.pyplot as plt
+import csv
 import json
 import tarfile
 import shutil
-import sys
 import zipfile
 import subprocess
 import boto3
-from metric_operations import performance_metrics_map, metric_operations_map
+from metric_operations import (
+    performance_metrics_map,
+    metric_operations_map,
+    vectorized_performance_metrics_map,
+)
 from logger import setup_logging
 from utility import (
+    EVALUATED_FILES_MANIFEST,
+    EVALUATION_SUMMARY_FILE,
+    PRIVATE_REPORT_FILE,
+    PRIVATE_REPORT_INPUT_DIR,
     RUNNER_ERROR_PREFIX,
+    SUBMISSION_CONTAINER_LABEL,
+    SUBMISSION_ERROR_PREFIX,
+    SUBMISSION_FILE_RESULTS_FILE,
     RunnerException,
+    SubmissionContainerPool,
     SubmissionException,
+    SubmissionFileResultRow,
+    SubmissionProgressReporter,
+    SubmissionTaskResult,
     create_blank_error_report,
     create_docker_image_for_submission,
     dask_multiprocess,
+    estimate_submission_memory_limit,
     generate_private_report_for_submission,
     get_error_by_code,
     get_error_codes_dict,
+    get_columnar_file_name,
+    get_submission_image_tag,
+    get_submission_pool_size,
+    list_s3_bucket,
     move_file_to_directory,
+    bulk_pull_from_s3,
     pull_from_s3,
+    read_time_series_file,
     request_to_API_w_credentials,
+    retry_oom_killed_submission_task,
+    retry_with_backoff,
     submission_task,
+    template_loads_report_files,
     timeout,
     timing,
     is_local,
+    kill_submission_containers,
+    upload_file_to_s3,
+    upload_submission_file_results,
+    write_private_report_request,
 )
 
 P = ParamSpec("P")
@@ -84,9 +120,28 @@ FILE_DIR = os.path.dirname(os.path.abspath(__file__))
 runner_error_codes = get_error_codes_dict(
     FILE_DIR, RUNNER_ERROR_PREFIX, logger
 )
+submission_error_codes = get_error_codes_dict(
+    FILE_DIR, SUBMISSION_ERROR_PREFIX, logger
+)
 
 SUBMISSION_TIMEOUT = 30 * 60  # seconds
 
+# Number of files whose outputs are stacked together to compute metrics
+METRICS_BATCH_SIZE = 64
+
+# Files run first, before the rest, to catch submissions that fail on
+# every file early
+NUM_FILES_TO_TEST = 3
+
+# Runtimes of the files of each analysis, averaged over its most recent
+# submissions, used to dispatch the most expensive files first
+RUNTIME_HISTORY_PREFIX = "runtime_history"
+RUNTIME_HISTORY_WINDOW = 20
+
+USE_SUBMISSION_CONTAINER_POOL = (
+    os.environ.get("USE_SUBMISSION_CONTAINER_POOL", "false").lower() == "true"
+)
+
 
 class SubmissionFunctionInfo(TypedDict):
     data_file_name: str
@@ -298,6 +353,11 @@ def run(  # noqa: C901
     python_version: str,
     current_evaluation_dir: str | None = None,
     tmp_dir: str | None = None,
+    volume_host_evaluation_dir: str | None = None,
+    reevaluate: bool = False,
+    checkpoint_s3_dir: str | None = None,
+    analysis_id: int | None = None,
+    defer_private_report: bool = False,
 ) -> dict[str, Any]:
 
     # Create an Error Report
@@ -325,10 +385,6 @@ def run(  # noqa: C901
             if not current_evaluation_dir.endswith("/")
             else current_evaluation_dir + "docker"
         )
-
-        sys.path.append(
-            current_evaluation_dir
-        )  # append current_evaluation_dir to sys.path
     else:
         results_dir = "./results"
         data_dir = "./data"
@@ -365,10 +421,13 @@ def run(  # noqa: C901
 
     # raise RunnerException(*get_error_by_code(500, runner_error_codes, logger))
 
-    # Create docker image for the submission
-    image_tag = "submission:latest"
+    # Create docker image for the submission, reusing a cached image when
+    # the same archive was already built for this Python version
+    image_tag = get_submission_image_tag(
+        docker_dir, submission_file_name, python_version
+    )
 
-    overwrite = True
+    overwrite = False
 
     logger.info(f"Creating docker image for submission...")
 
@@ -388,8 +447,6 @@ def run(  # noqa: C901
     #     os.path.join(new_dir, submission_file_name),
     # )
 
-    # Generate list for us to store all of our results for the module
-    results_list = list()
     # Load in data set that we're going to analyze.
 
     # Make GET requests to the Django API to get the system metadata
@@ -436,9 +493,18 @@ def run(  # noqa: C901
         )
     )
 
+    # A re-evaluation only runs the files that are new or have changed
+    # since the previous evaluation and reuses the results of the others
+    previous_results: dict[str, dict[str, Any]] = {}
+    evaluation_file_metadata_df = file_metadata_df
+    if reevaluate:
+        previous_results, evaluation_file_metadata_df = (
+            load_previous_evaluation(results_dir, file_metadata_df)
+        )
+
     file_metadata_file_name = "file_metadata.csv"
 
-    file_metadata_df.to_csv(
+    evaluation_file_metadata_df.to_csv(
         os.path.join(
             os.path.join(data_dir, "metadata"), file_metadata_file_name
         )
@@ -491,8 +557,18 @@ def run(  # noqa: C901
     data_dir: str = os.path.abspath(data_dir)
     results_dir: str = os.path.abspath(results_dir)
 
-    volume_host_data_dir = os.environ.get("DOCKER_HOST_VOLUME_DATA_DIR")
-    volume_host_results_dir = os.environ.get("DOCKER_HOST_VOLUME_RESULTS_DIR")
+    # Host paths of the evaluation directory, which the submission containers
+    # mount. Workers running several submissions at once give each its own.
+    if volume_host_evaluation_dir is not None:
+        volume_host_data_dir = os.path.join(volume_host_evaluation_dir, "data")
+        volume_host_results_dir = os.path.join(
+            volume_host_evaluation_dir, "results"
+        )
+    else:
+        volume_host_data_dir = os.environ.get("DOCKER_HOST_VOLUME_DATA_DIR")
+        volume_host_results_dir = os.environ.get(
+            "DOCKER_HOST_VOLUME_RESULTS_DIR"
+        )
 
     if volume_host_data_dir is None:
         logger.error(
@@ -517,42 +593,198 @@ def run(  # noqa: C901
     logger.info(f"volume_host_data_dir:{volume_host_data_dir}")
     logger.info(f"volume_host_results_dir:{volume_host_results_dir}")
 
-    func_arguments_list = prepare_function_args_for_parallel_processing(
-        submission_id=submission_id,
-        image_tag=image_tag,
-        memory_limit=memory_limit,
-        submission_file_name=submission_module_name,
-        submission_function_name=submission_function_name,
-        current_evaluation_dir=current_evaluation_dir,
-        data_dir=data_dir,
-        results_dir=results_dir,
-        volume_data_dir=volume_host_data_dir,
-        volume_results_dir=volume_host_results_dir,
-    )
+    if evaluation_file_metadata_df.empty:
+        logger.info("No new or changed files to evaluate")
+        results_list: list[dict[str, Any]] = []
+        number_of_errors = 0
+    else:
+        # Set when the evaluation is stopped, so that its tasks still
+        # running on the Dask workers start no more containers
+        stop_event_name = f"stop-submission-{submission_id}-{uuid.uuid4()}"
+
+        func_arguments_list = prepare_function_args_for_parallel_processing(
+            submission_id=submission_id,
+            image_tag=image_tag,
+            memory_limit=memory_limit,
+            submission_file_name=submission_module_name,
+            submission_function_name=submission_function_name,
+            current_evaluation_dir=current_evaluation_dir,
+            data_dir=data_dir,
+            results_dir=results_dir,
+            volume_data_dir=volume_host_data_dir,
+            volume_results_dir=volume_host_results_dir,
+            stop_event_name=stop_event_name,
+        )
 
-    # Loop through each file and generate predictions
+        # Read by the metrics collector and the checkpoint writer as files
+        # finish
+        submission_runtimes = SubmissionRuntimeReader(results_dir)
+
+        # Files finished by an earlier, interrupted attempt at this
+        # submission are restored from its checkpoint instead of run again
+        if checkpoint_s3_dir is not None:
+            restored_files = restore_checkpoint(
+                checkpoint_s3_dir,
+                results_dir,
+                evaluation_file_metadata_df,
+                tmp_dir,
+            )
+            func_arguments_list = [
+                function_args
+                for function_args in func_arguments_list
+                if function_args[5][0] not in restored_files
+            ]
 
-    # print(func_arguments_list)
+        runtime_history: dict[str, dict[str, float]] = {}
+        if analysis_id is not None:
+            runtime_history = load_runtime_history(analysis_id, tmp_dir)
+        file_names = [
+            function_args[5][0] for function_args in func_arguments_list
+        ]
+        file_rows = get_data_file_rows(file_names, data_dir)
+        sampling_frequencies = dict(
+            zip(
+                evaluation_file_metadata_df["file_name"],
+                evaluation_file_metadata_df["data_sampling_frequency"],
+            )
+        )
+        func_arguments_list = order_function_args_by_cost(
+            func_arguments_list,
+            estimate_file_costs(
+                file_names, file_rows, sampling_frequencies, runtime_history
+            ),
+            file_rows,
+        )
 
-    # raise Exception("Finished Successfully")
+        # Loop through each file and generate predictions
 
-    number_of_submission_errors = loop_over_files_and_generate_results(
-        func_arguments_list
-    )
-    logger.info(f"number_of_submission_errors: {number_of_submission_errors}")
+        # print(func_arguments_list)
 
-    # raise Exception("Finished Successfully")
+        # raise Exception("Finished Successfully")
 
-    results_list, number_of_metrics_errors = (
-        loop_over_results_and_generate_metrics(
+        # Metrics for each file are computed as soon as its container finishes
+        metrics_collector = StreamingMetricsCollector(
             data_dir=data_dir,
             results_dir=results_dir,
             current_evaluation_dir=current_evaluation_dir,
+            runtimes=submission_runtimes,
         )
-    )
-    logger.info(f"number_of_metrics_errors: {number_of_metrics_errors}")
 
-    number_of_errors = number_of_submission_errors + number_of_metrics_errors
+        # Stops the evaluation once the submission is failing too many files
+        early_termination = EarlyTerminationPolicy.from_config(config_data)
+        submission_deadline = SubmissionDeadline(
+            submission_id,
+            config_data.get("submission_timeout_seconds"),
+            stop_event_name,
+        )
+
+        # Progress and file errors are sent to the API in batches
+        progress_reporter = SubmissionProgressReporter(
+            submission_id, logger=logger
+        )
+
+        def on_file_completed(
+            function_args: tuple[Any, ...], result: SubmissionTaskResult
+        ):
+            progress_reporter.on_file_completed(function_args, result)
+            metrics_collector.on_file_completed(function_args, result)
+            if checkpoint_writer is not None:
+                checkpoint_writer.on_file_completed(function_args, result)
+            if early_termination is not None:
+                early_termination.on_file_completed(function_args, result)
+            submission_deadline.on_file_completed(function_args, result)
+
+        checkpoint_writer: CheckpointWriter | None = None
+        if checkpoint_s3_dir is not None:
+            checkpoint_writer = CheckpointWriter(
+                checkpoint_s3_dir,
+                results_dir,
+                evaluation_file_metadata_df,
+                submission_runtimes,
+            )
+
+        try:
+            if not func_arguments_list:
+                logger.info("All files were restored from the checkpoint")
+                number_of_submission_errors = 0
+            elif USE_SUBMISSION_CONTAINER_POOL:
+                pool_size = get_submission_pool_size(logger)
+                logger.info(
+                    f"Using warm submission container pool of {pool_size}"
+                )
+                file_timeout, file_cpu_time_limit = get_file_time_limits(
+                    config_data
+                )
+
+                container_pool = SubmissionContainerPool(
+                    image_tag=image_tag,
+                    submission_file_name=submission_module_name,
+                    submission_function_name=submission_function_name,
+                    data_dir=volume_host_data_dir,
+                    results_dir=volume_host_results_dir,
+                    memory_limit=memory_limit,
+                    pool_size=pool_size,
+                    file_timeout=file_timeout,
+                    logger=logger,
+                    labels={SUBMISSION_CONTAINER_LABEL: str(submission_id)},
+                    file_cpu_time_limit=file_cpu_time_limit,
+                )
+
+                with submission_deadline, progress_reporter, container_pool:
+                    number_of_submission_errors = (
+                        loop_over_files_and_generate_results(
+                            func_arguments_list,
+                            container_pool,
+                            on_result=on_file_completed,
+                            stop_event_name=stop_event_name,
+                        )
+                    )
+            else:
+                with submission_deadline, progress_reporter:
+                    number_of_submission_errors = (
+                        loop_over_files_and_generate_results(
+                            func_arguments_list,
+                            on_result=on_file_completed,
+                            stop_event_name=stop_event_name,
+                        )
+                    )
+        finally:
+            # Also when the evaluation is stopped, so the writer's thread
+            # ends and the files that did finish are checkpointed
+            if checkpoint_writer is not None:
+                checkpoint_writer.close()
+        logger.info(
+            f"number_of_submission_errors: {number_of_submission_errors}"
+        )
+
+        # raise Exception("Finished Successfully")
+
+        results_list, number_of_metrics_errors = (
+            loop_over_results_and_generate_metrics(
+                data_dir=data_dir,
+                results_dir=results_dir,
+                current_evaluation_dir=current_evaluation_dir,
+                metrics_collector=metrics_collector,
+            )
+        )
+        logger.info(f"number_of_metrics_errors: {number_of_metrics_errors}")
+
+        number_of_errors = (
+            number_of_submission_errors + number_of_metrics_errors
+        )
+
+    if previous_results:
+        new_results = {result["file_name"]: result for result in results_list}
+        results_list = [
+            new_results.get(file_name, previous_results.get(file_name))
+            for file_name in file_metadata_df["file_name"]
+            if file_name in new_results or file_name in previous_results
+        ]
+
+    write_evaluated_files_manifest(results_dir, file_metadata_df, results_list)
+
+    if analysis_id is not None:
+        update_runtime_history(analysis_id, results_dir, tmp_dir)
 
     # raise Exception("Finished Successfully")
 
@@ -580,6 +812,23 @@ def run(  # noqa: C901
 
     results_df = pd.merge(direct_results_df, file_metadata_df, on="file_name")
 
+    # Per-file results are queryable from the database, not only from the
+    # results CSV in S3
+    file_result_rows = get_file_result_rows(
+        results_df,
+        performance_metrics,
+        config_data["references_compare"],
+    )
+    with open(
+        os.path.join(results_dir, SUBMISSION_FILE_RESULTS_FILE), "w"
+    ) as fp:
+        json.dump(file_result_rows, fp)
+    try:
+        upload_submission_file_results(submission_id, file_result_rows, logger)
+    except Exception as e:
+        logger.error("Error uploading per-file results")
+        logger.exception(e)
+
     module_name = "submission"
 
     public_metrics_dict = get_results_dict(
@@ -625,28 +874,59 @@ def run(  # noqa: C901
 
     results_file_name = module_name + "_full_results.csv"
 
-    private_results_file_name = "private_results.html"
+    private_results_file_name = PRIVATE_REPORT_FILE
 
     results_df_private.to_csv(os.path.join(results_dir, results_file_name))
 
-    try:
-        logger.info(f"Generating private report for submission...")
+    template_file_path = os.path.join(current_evaluation_dir, "template.py")
 
-        generate_private_report_for_submission(
-            results_df_private,
-            "export",
-            os.path.join(current_evaluation_dir, "template.py"),
-            os.path.join(results_dir, private_results_file_name),
-            logger,
-        )
+    if defer_private_report and template_loads_report_files(
+        template_file_path
+    ):
+        # The worker queues the rendering once the results are published
+        try:
+            request = write_private_report_request(
+                results_df_private,
+                template_file_path,
+                os.path.join(results_dir, results_file_name),
+                os.path.join(current_evaluation_dir, PRIVATE_REPORT_INPUT_DIR),
+                results_dir,
+                logger,
+            )
+            logger.info(f"Deferred private report {request['report_key']}")
+        except Exception as e:
+            logger.error("Error deferring private report for submission.")
+            logger.exception(e)
+    else:
+        try:
+            logger.info(f"Generating private report for submission...")
+
+            generate_private_report_for_submission(
+                results_df_private,
+                "export",
+                template_file_path,
+                os.path.join(results_dir, private_results_file_name),
+                logger,
+            )
 
-        logger.info("Private report generated successfully.")
-    except Exception as e:
-        logger.error("Error generating private report for submission.")
-        logger.exception(e)
+            logger.info("Private report generated successfully.")
+        except Exception as e:
+            logger.error("Error generating private report for submission.")
+            logger.exception(e)
 
     logger.info(f"number_of_errors: {number_of_errors}")
 
+    # Lets the worker decide whether these results can be reused for an
+    # identical resubmission
+    with open(os.path.join(results_dir, EVALUATION_SUMMARY_FILE), "w") as fp:
+        json.dump(
+            {
+                "number_of_errors": number_of_errors,
+                "total_number_of_files": total_number_of_files,
+            },
+            fp,
+        )
+
     # success_rate = (
     #     (total_number_of_files - number_of_errors) / total_number_of_files
     # ) * 100
@@ -710,6 +990,44 @@ def calculate_metrics(config_data, performance_metrics, results_df):
     return metrics_dict
 
 
+def to_json_number(value: Any) -> float | None:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def get_file_result_rows(
+    results_df: pd.DataFrame,
+    performance_metrics: list[str],
+    references_compare: list[str],
+) -> list[SubmissionFileResultRow]:
+    metric_columns = [
+        f"{metric}_{val}"
+        for metric in performance_metrics
+        if metric != "runtime"
+        for val in references_compare
+        if f"{metric}_{val}" in results_df.columns
+    ]
+
+    rows: list[SubmissionFileResultRow] = []
+    for result in results_df.to_dict(orient="records"):
+        file_id = to_json_number(result.get("file_id"))
+        rows.append(
+            {
+                "file_id": int(file_id) if file_id is not None else None,
+                "file_name": str(result["file_name"]),
+                "runtime": to_json_number(result.get("runtime")),
+                "metrics": {
+                    column: to_json_number(result[column])
+                    for column in metric_columns
+                },
+            }
+        )
+    return rows
+
+
 def get_results_dict(
     is_public: bool,
     results_df: pd.DataFrame,
@@ -880,6 +1198,7 @@ def prepare_function_args_for_parallel_processing(
     results_dir: str,
     volume_data_dir: str,
     volume_results_dir: str,
+    stop_event_name: str | None = None,
 ):
 
     file_metadata_df = pd.read_csv(
@@ -897,6 +1216,7 @@ def prepare_function_args_for_parallel_processing(
     function_args_list = None
 
     allowable_kwargs: list[str] = config_data.get("allowable_kwargs", {})
+    file_timeout, file_cpu_time_limit = get_file_time_limits(config_data)
 
     logger.info(f"allowable_kwargs: {allowable_kwargs}")
 
@@ -934,6 +1254,9 @@ def prepare_function_args_for_parallel_processing(
             volume_data_dir,
             volume_results_dir,
             logger,
+            file_timeout,
+            file_cpu_time_limit,
+            stop_event_name,
         )
 
         function_args_list = append_to_list(function_args, function_args_list)
@@ -984,6 +1307,9 @@ def run_submission(
 
 def loop_over_files_and_generate_results(
     func_arguments_list: list[Tuple],
+    container_pool: SubmissionContainerPool | None = None,
+    on_result: Callable[[Tuple, SubmissionTaskResult], None] | None = None,
+    stop_event_name: str | None = None,
 ) -> int:
 
     # func_arguments_list = prepare_function_args_for_parallel_processing(
@@ -997,8 +1323,6 @@ def loop_over_files_and_generate_results(
     #     performance_metrics,
     # )
 
-    NUM_FILES_TO_TEST = 3
-
     test_func_argument_list, rest_func_argument_list = (
         func_arguments_list[:NUM_FILES_TO_TEST],
         func_arguments_list[NUM_FILES_TO_TEST:],
@@ -1007,18 +1331,38 @@ def loop_over_files_and_generate_results(
     # results: list[dict[str, Any]] = []
     number_of_errors = 0
 
+    memory_limit: str = func_arguments_list[0][2]
+
     # Test the first two files
     logger.info(f"Testing the first {NUM_FILES_TO_TEST} files...")
-    test_errors = dask_multiprocess(
-        submission_task,
-        test_func_argument_list,
-        # n_workers=NUM_FILES_TO_TEST,
-        threads_per_worker=1,
-        # memory_limit="16GiB",
-        logger=logger,
+    if container_pool is not None:
+        test_errors = container_pool.map(test_func_argument_list, on_result)
+    else:
+        test_errors = dask_multiprocess(
+            submission_task,
+            test_func_argument_list,
+            # n_workers=NUM_FILES_TO_TEST,
+            threads_per_worker=1,
+            memory_per_run=float(memory_limit),
+            # memory_limit="16GiB",
+            logger=logger,
+            on_result=on_result,
+            retry=retry_oom_killed_submission_task,
+        )
+
+    # Fit the container memory limit, and with it the number of files
+    # run concurrently, to what the first files actually used
+    memory_limit = estimate_submission_memory_limit(
+        test_errors, memory_limit, logger
     )
+    rest_func_argument_list = [
+        (*args[:2], memory_limit, *args[3:])
+        for args in rest_func_argument_list
+    ]
+    if container_pool is not None:
+        container_pool.set_memory_limit(memory_limit)
 
-    is_errors_list = [error for error, error_code in test_errors]
+    is_errors_list = [result["error"] for result in test_errors]
     number_of_errors += sum(is_errors_list)
 
     if number_of_errors == NUM_FILES_TO_TEST:
@@ -1035,19 +1379,34 @@ def loop_over_files_and_generate_results(
     logger.info(f"Testing the rest of the files...")
     rest_errors = []
     try:
-        rest_errors = dask_multiprocess(
-            submission_task,
-            rest_func_argument_list,
-            # n_workers=4,
-            threads_per_worker=1,
-            # memory_limit="16GiB",
-            logger=logger,
-        )
+        if container_pool is not None:
+            rest_errors = container_pool.map(
+                rest_func_argument_list, on_result
+            )
+        else:
+            rest_errors = dask_multiprocess(
+                submission_task,
+                rest_func_argument_list,
+                # n_workers=4,
+                threads_per_worker=1,
+                memory_per_run=float(memory_limit),
+                # memory_limit="16GiB",
+                logger=logger,
+                on_result=on_result,
+                retry=retry_oom_killed_submission_task,
+            )
     except SubmissionException as e:
         logger.error(f"Submission error: {e}")
+        # Files that were still running when the evaluation was stopped
+        kill_submission_containers(
+            func_arguments_list[0][0], logger, stop_event_name
+        )
         raise e
     except RunnerException as e:
         logger.error(f"Runner error: {e}")
+        kill_submission_containers(
+            func_arguments_list[0][0], logger, stop_event_name
+        )
         raise e
     except Exception as e:
         if e.args:
@@ -1059,7 +1418,7 @@ def loop_over_files_and_generate_results(
         raise RunnerException(
             *get_error_by_code(500, runner_error_codes, logger)
         )
-    is_errors_list = [error for error, error_code in rest_errors]
+    is_errors_list = [result["error"] for result in rest_errors]
 
     number_of_errors += sum(is_errors_list)
 
@@ -1077,95 +1436,755 @@ def loop_over_results_and_generate_metrics(
     data_dir: str,
     results_dir: str,
     current_evaluation_dir: str,
+    metrics_collector: "StreamingMetricsCollector | None" = None,
 ) -> tuple[list[dict[str, Any]], int]:
-    all_results: list[dict[str, Any]] = []
-    number_of_errors = 0
-
     result_files_dir = os.path.join(results_dir, "files")
 
-    file_metadata_df: pd.DataFrame = pd.read_csv(
-        os.path.join(data_dir, "metadata", "file_metadata.csv")
+    config_data: dict[str, Any] = json.load(
+        open(os.path.join(current_evaluation_dir, "config.json"))
     )
 
-    system_metadata_df = pd.read_csv(
-        os.path.join(data_dir, "metadata", "system_metadata.csv")
-    )
+    metrics_inputs_df = load_metrics_inputs(data_dir, results_dir)
 
-    config_data: dict[str, Any] = json.load(
-        open(os.path.join(current_evaluation_dir, "config.json"))
+    computed_results: dict[str, dict[str, Any]] = dict()
+    number_of_errors = 0
+
+    # Files already handled while the submission was running only need
+    # to be folded into the results
+    pending_df = metrics_inputs_df
+    if metrics_collector is not None:
+        computed_results.update(metrics_collector.results)
+        number_of_errors += len(metrics_collector.failed_files)
+
+        handled_files = set(computed_results) | metrics_collector.failed_files
+        pending_df = metrics_inputs_df[
+            ~metrics_inputs_df["file_name"].isin(handled_files)
+        ]
+        logger.info(
+            f"{len(handled_files)} files had metrics computed while running, {len(pending_df)} remaining"
+        )
+
+    for start in range(0, len(pending_df), METRICS_BATCH_SIZE):
+        batch_df = pending_df.iloc[start : start + METRICS_BATCH_SIZE]
+
+        batch_results, batch_errors = generate_performance_metrics_for_files(
+            batch_df,
+            config_data,
+            result_files_dir,
+            data_dir,
+        )
+        computed_results.update(
+            (result["file_name"], result) for result in batch_results
+        )
+        number_of_errors += batch_errors
+
+    all_results = [
+        computed_results[file_name]
+        for file_name in metrics_inputs_df["file_name"]
+        if file_name in computed_results
+    ]
+
+    return all_results, number_of_errors
+
+
+def load_previous_evaluation(
+    results_dir: str, file_metadata_df: pd.DataFrame
+) -> tuple[dict[str, dict[str, Any]], pd.DataFrame]:
+    """Split the analysis files into those whose previous results can be
+    reused and those that have to be evaluated again.
+
+    A previous result is reused when it was computed on a file with the
+    same `file_hash`. Files without a hash are always evaluated.
+    """
+
+    try:
+        with open(os.path.join(results_dir, EVALUATED_FILES_MANIFEST)) as f:
+            evaluated_files: dict[str, dict[str, Any]] = json.load(f)
+    except FileNotFoundError:
+        logger.warning(
+            f"{EVALUATED_FILES_MANIFEST} not found, evaluating all files"
+        )
+        return {}, file_metadata_df
+
+    previous_results: dict[str, dict[str, Any]] = {}
+    for file_name, file_hash in zip(
+        file_metadata_df["file_name"], file_metadata_df["file_hash"]
+    ):
+        evaluated_file = evaluated_files.get(file_name)
+        if evaluated_file is None or not isinstance(file_hash, str):
+            continue
+        if evaluated_file["file_hash"] == file_hash:
+            previous_results[file_name] = evaluated_file["result"]
+
+    pending_df = file_metadata_df[
+        ~file_metadata_df["file_name"].isin(previous_results)
+    ]
+    logger.info(
+        f"reusing results of {len(previous_results)} files, {len(pending_df)} new or changed files to evaluate"
     )
+    return previous_results, pending_df
 
-    submission_execution_times_df = pd.read_csv(
-        os.path.join(results_dir, "execution_time.csv")
+
+def write_evaluated_files_manifest(
+    results_dir: str,
+    file_metadata_df: pd.DataFrame,
+    results_list: list[dict[str, Any]],
+):
+    file_hashes = dict(
+        zip(file_metadata_df["file_name"], file_metadata_df["file_hash"])
     )
 
-    for _, file_metadata_row in file_metadata_df.iterrows():
+    evaluated_files: dict[str, dict[str, Any]] = {}
+    for result in results_list:
+        file_hash = file_hashes.get(result["file_name"])
+        evaluated_files[result["file_name"]] = {
+            "file_hash": file_hash if isinstance(file_hash, str) else None,
+            "result": result,
+        }
+
+    with open(os.path.join(results_dir, EVALUATED_FILES_MANIFEST), "w") as f:
+        json.dump(
+            evaluated_files,
+            f,
+            default=lambda value: (
+                value.item() if isinstance(value, np.generic) else str(value)
+            ),
+        )
+
 
-        file_name = file_metadata_row["file_name"]
+class SubmissionRuntimeReader:
+    """
+    Runtimes the submission wrapper appends to execution_time.csv, kept in
+    memory. Each lookup of a file that is not known yet reads only the rows
+    appended since the previous read, so following an evaluation file by
+    file reads the file once overall.
+    """
 
-        system_metadata_dict: dict[str, Any] = dict(
-            system_metadata_df[
-                system_metadata_df["system_id"]
-                == file_metadata_row["system_id"]
-            ].iloc[0]
+    def __init__(self, results_dir: str):
+        self.execution_file = os.path.join(results_dir, "execution_time.csv")
+        self.offset = 0
+        self.runtimes: dict[str, float] = dict()
+        self.lock = threading.Lock()
+
+    def get(self, file_name: str) -> float | None:
+        with self.lock:
+            if file_name not in self.runtimes:
+                self.read_new_rows()
+            return self.runtimes.get(file_name)
+
+    def read_new_rows(self):
+        try:
+            with open(self.execution_file, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # A container may still be writing the last row
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+
+        for row in csv.reader(data[:end].decode().splitlines()):
+            if len(row) != 2 or row[0] == "file_name":
+                continue
+            file_name, execution_time = row
+            # Same as the drop_duplicates in load_submission_runtimes
+            if file_name in self.runtimes:
+                continue
+            try:
+                self.runtimes[file_name] = float(execution_time)
+            except ValueError:
+                continue
+
+
+class CheckpointWriter:
+    """
+    Persist the output and execution time of every file that finishes to
+    S3 from a background thread, so an evaluation interrupted by a worker
+    crash can resume where it stopped. See `restore_checkpoint`.
+    """
+
+    def __init__(
+        self,
+        checkpoint_s3_dir: str,
+        results_dir: str,
+        file_metadata_df: pd.DataFrame,
+        runtimes: SubmissionRuntimeReader,
+    ):
+        self.checkpoint_s3_dir = checkpoint_s3_dir
+        self.results_dir = results_dir
+        self.runtimes = runtimes
+        self.file_hashes = dict(
+            zip(file_metadata_df["file_name"], file_metadata_df["file_hash"])
         )
+        self.function_info_written = False
 
+        self.queue: queue.Queue[tuple[str, float] | None] = queue.Queue()
+        self.thread = threading.Thread(
+            target=self.run,
+            name=f"{threading.current_thread().name}_checkpoint",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def on_file_completed(
+        self,
+        function_args: tuple[Any, ...],
+        result: SubmissionTaskResult,
+    ):
+        if result["error"]:
+            return
+
+        file_name: str = function_args[5][0]
         try:
-            submission_runtime: float = cast(
-                float,
-                submission_execution_times_df[
-                    submission_execution_times_df["file_name"] == file_name
-                ]["execution_time"].iloc[0],
-            )
-        except IndexError:
-            logger.error(
-                f"submission_runtime not found for file {file_name}. Exiting."
+            execution_time = self.runtimes.get(file_name)
+        except Exception as e:
+            logger.warning(f"Could not checkpoint {file_name}")
+            logger.exception(e)
+            return
+        if execution_time is None:
+            logger.warning(f"Could not checkpoint {file_name}, no runtime")
+            return
+
+        self.queue.put((file_name, execution_time))
+
+    def write(self, file_name: str, execution_time: float):
+        if not self.function_info_written:
+            upload_file_to_s3(
+                os.path.join(
+                    self.results_dir, "submission_function_info.json"
+                ),
+                f"{self.checkpoint_s3_dir}/submission_function_info.json",
             )
-            continue
+            self.function_info_written = True
 
-        function_parameters = ["time_series", *config_data["allowable_kwargs"]]
+        upload_file_to_s3(
+            os.path.join(self.results_dir, "files", file_name),
+            f"{self.checkpoint_s3_dir}/files/{file_name}",
+        )
 
+        file_hash = self.file_hashes.get(file_name)
+        record_path = os.path.join(
+            self.results_dir, f"{file_name}.checkpoint.json"
+        )
+        with open(record_path, "w") as f:
+            json.dump(
+                {
+                    "file_name": file_name,
+                    "file_hash": (
+                        file_hash if isinstance(file_hash, str) else None
+                    ),
+                    "execution_time": execution_time,
+                },
+                f,
+            )
+        # The record goes last, it marks the file's output as complete
         try:
-            result = generate_performance_metrics_for_submission(
-                file_name,
-                config_data,
-                system_metadata_dict,
-                result_files_dir,
-                data_dir,
-                submission_runtime,
-                function_parameters,
+            upload_file_to_s3(
+                record_path,
+                f"{self.checkpoint_s3_dir}/completed/{file_name}.json",
             )
+        finally:
+            os.remove(record_path)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                retry_with_backoff(lambda: self.write(*item), logger=logger)
+            except Exception as e:
+                logger.error(f"Could not checkpoint {item[0]}")
+                logger.exception(e)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+def restore_checkpoint(
+    checkpoint_s3_dir: str,
+    results_dir: str,
+    file_metadata_df: pd.DataFrame,
+    tmp_dir: str,
+) -> set[str]:
+    """
+    Restore the outputs and execution times of the files an earlier attempt
+    at the submission finished, and return their names. Only files whose
+    `file_hash` is unchanged since they were checkpointed are restored.
+    """
 
-            logger.info(f"{file_name}: {result}")
-            all_results.append(result)
-        except Exception as e:
-            number_of_errors += 1
-            # TODO: add error code
-            logger.error(
-                f"Error generating performance metrics for {file_name}"
+    try:
+        record_paths = [
+            path
+            for path in list_s3_bucket(
+                f"{S3_BUCKET_NAME}/{checkpoint_s3_dir}/completed/"
             )
-            logger.exception(e)
+            if path.endswith(".json")
+        ]
+    except Exception as e:
+        logger.warning("Could not list checkpoint, evaluating all files")
+        logger.exception(e)
+        return set()
 
-    return all_results, number_of_errors
+    if not record_paths:
+        return set()
+
+    file_hashes = dict(
+        zip(file_metadata_df["file_name"], file_metadata_df["file_hash"])
+    )
+    records_dir = os.path.join(tmp_dir, "checkpoint")
+    os.makedirs(records_dir, exist_ok=True)
+
+    try:
+        records: list[dict[str, Any]] = []
+        for record_path in bulk_pull_from_s3(
+            [(path, records_dir) for path in record_paths], logger=logger
+        ):
+            with open(record_path) as f:
+                records.append(json.load(f))
+
+        records = [
+            record
+            for record in records
+            if isinstance(file_hashes.get(record["file_name"]), str)
+            and record["file_hash"] == file_hashes[record["file_name"]]
+        ]
+        if not records:
+            return set()
+
+        bulk_pull_from_s3(
+            [
+                (
+                    f"{S3_BUCKET_NAME}/{checkpoint_s3_dir}/files/{record['file_name']}",
+                    os.path.join(results_dir, "files"),
+                )
+                for record in records
+            ]
+            + [
+                (
+                    f"{S3_BUCKET_NAME}/{checkpoint_s3_dir}/submission_function_info.json",
+                    results_dir,
+                )
+            ],
+            logger=logger,
+        )
+    except Exception as e:
+        logger.warning("Could not restore checkpoint, evaluating all files")
+        logger.exception(e)
+        return set()
+
+    execution_times_df = pd.DataFrame(
+        [
+            (record["file_name"], record["execution_time"])
+            for record in records
+        ],
+        columns=["file_name", "execution_time"],
+    )
+    execution_file = os.path.join(results_dir, "execution_time.csv")
+    execution_times_df.to_csv(
+        execution_file,
+        mode="a",
+        header=not os.path.exists(execution_file),
+        index=False,
+    )
+
+    restored_files = {record["file_name"] for record in records}
+    logger.info(f"restored {len(restored_files)} files from checkpoint")
+    return restored_files
+
+
+def load_runtime_history(
+    analysis_id: int, tmp_dir: str
+) -> dict[str, dict[str, float]]:
+    """Per-file `{"runtime": ..., "count": ...}` of earlier submissions."""
+
+    history_dir = os.path.join(tmp_dir, "runtime_history")
+    os.makedirs(history_dir, exist_ok=True)
 
+    try:
+        history_path = pull_from_s3(
+            IS_LOCAL,
+            S3_BUCKET_NAME,
+            f"{S3_BUCKET_NAME}/{RUNTIME_HISTORY_PREFIX}/analysis_{analysis_id}.json",
+            history_dir,
+            logger,
+        )
+        with open(history_path) as f:
+            return json.load(f)
+    except Exception as e:
+        logger.info(f"No runtime history for analysis {analysis_id}: {e}")
+        return {}
+
+
+def update_runtime_history(analysis_id: int, results_dir: str, tmp_dir: str):
+    """Fold the runtimes of this submission into the analysis' history."""
+
+    try:
+        submission_runtimes = load_submission_runtimes(results_dir)
+    except FileNotFoundError:
+        return
+
+    runtime_history = load_runtime_history(analysis_id, tmp_dir)
+    for file_name, runtime in submission_runtimes.dropna().items():
+        entry = runtime_history.get(
+            str(file_name), {"runtime": 0.0, "count": 0}
+        )
+        count = min(entry["count"] + 1, RUNTIME_HISTORY_WINDOW)
+        entry["runtime"] += (float(runtime) - entry["runtime"]) / count
+        entry["count"] = count
+        runtime_history[str(file_name)] = entry
+
+    history_path = os.path.join(tmp_dir, f"analysis_{analysis_id}.json")
+    with open(history_path, "w") as f:
+        json.dump(runtime_history, f)
+
+    try:
+        upload_file_to_s3(
+            history_path,
+            f"{RUNTIME_HISTORY_PREFIX}/analysis_{analysis_id}.json",
+        )
+    except Exception as e:
+        logger.warning(
+            f"Could not update runtime history of analysis {analysis_id}"
+        )
+        logger.exception(e)
+
+
+def count_data_file_rows(file_name: str, data_dir: str) -> int:
+    """Number of rows of a file's data without parsing it, 0 if the file
+    is missing."""
+
+    columnar_file_path = os.path.join(
+        data_dir, "file_data", get_columnar_file_name(file_name)
+    )
+    if os.path.exists(columnar_file_path):
+        return pq.read_metadata(columnar_file_path).num_rows
+
+    file_path = os.path.join(data_dir, "file_data", file_name)
+    if not os.path.exists(file_path):
+        return 0
+
+    lines = 0
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            lines += chunk.count(b"\n")
+    # Without the header
+    return max(lines - 1, 0)
+
+
+def get_data_file_rows(file_names: list[str], data_dir: str) -> dict[str, int]:
+    return {
+        file_name: count_data_file_rows(file_name, data_dir)
+        for file_name in file_names
+    }
+
+
+def estimate_file_costs(
+    file_names: list[str],
+    file_rows: dict[str, int],
+    sampling_frequencies: dict[str, float],
+    runtime_history: dict[str, dict[str, float]],
+) -> dict[str, float]:
+    """Estimate how long each file will take to evaluate.
+
+    Files with a runtime history use it. The others are estimated from
+    their number of rows, scaled by the typical runtime per row of the
+    files with a history and the same `data_sampling_frequency`, or of all
+    files with a history if none shares it. Algorithms often resample or
+    loop over days, so the runtime per row differs between sampling
+    frequencies. Without any history the rows alone give the relative
+    order.
+    """
+
+    seconds_per_row: dict[float | None, list[float]] = defaultdict(list)
+    for file_name in file_names:
+        if file_name in runtime_history and file_rows[file_name] > 0:
+            runtime = runtime_history[file_name]["runtime"]
+            frequency = sampling_frequencies.get(file_name)
+            seconds_per_row[frequency].append(runtime / file_rows[file_name])
+            seconds_per_row[None].append(runtime / file_rows[file_name])
+
+    if not seconds_per_row:
+        return {
+            file_name: float(file_rows[file_name]) for file_name in file_names
+        }
+
+    def typical_seconds_per_row(file_name: str) -> float:
+        frequency = sampling_frequencies.get(file_name)
+        return float(
+            np.median(seconds_per_row.get(frequency) or seconds_per_row[None])
+        )
+
+    return {
+        file_name: (
+            runtime_history[file_name]["runtime"]
+            if file_name in runtime_history
+            else file_rows[file_name] * typical_seconds_per_row(file_name)
+        )
+        for file_name in file_names
+    }
+
+
+def order_function_args_by_cost(
+    func_arguments_list: list[Tuple],
+    file_costs: dict[str, float],
+    file_rows: dict[str, int] | None = None,
+) -> list[Tuple]:
+    """Put the test files first, followed by the others from the most to
+    the least expensive so that no long file is left to stretch the end of
+    the evaluation.
+
+    The test files are the cheapest files, so the test run returns quickly.
+    The container memory limit estimated from them may fall short of the
+    largest file, so it runs first of the rest. Its OOM retries, with the
+    larger limit reserved from the memory budget, then start while most
+    files are still queued rather than at the end.
+    """
+
+    def cost(function_args: Tuple) -> float:
+        return file_costs.get(function_args[5][0], 0.0)
+
+    def rows(function_args: Tuple) -> tuple[float, float]:
+        # Ties, and files without a known number of rows, go by their cost
+        file_name = function_args[5][0]
+        return ((file_rows or {}).get(file_name, 0), cost(function_args))
+
+    ordered = sorted(func_arguments_list, key=cost)
+    test_files = ordered[:NUM_FILES_TO_TEST]
+    rest_files = ordered[NUM_FILES_TO_TEST:][::-1]
+    if rest_files:
+        largest = max(rest_files, key=rows)
+        rest_files.remove(largest)
+        rest_files.insert(0, largest)
+
+    logger.info(
+        f"Test files: {[function_args[5][0] for function_args in test_files]}"
+    )
+    return test_files + rest_files
+
+
+def get_file_time_limits(
+    config_data: dict[str, Any],
+) -> tuple[float, int | None]:
+    """Wall-clock and CPU time limits of a single file, in seconds.
+
+    Set per analysis with `file_timeout_seconds`, defaulting to
+    `SUBMISSION_TIMEOUT`, and `file_cpu_time_seconds`, which is unlimited
+    by default.
+    """
+
+    file_timeout = float(
+        config_data.get("file_timeout_seconds", SUBMISSION_TIMEOUT)
+    )
+    file_cpu_time_limit: int | None = config_data.get("file_cpu_time_seconds")
+    if file_cpu_time_limit is not None:
+        file_cpu_time_limit = int(file_cpu_time_limit)
+    return file_timeout, file_cpu_time_limit
+
+
+class SubmissionDeadline:
+    """
+    Stop an evaluation that is still running `seconds` after it started
+    running files, set per analysis with `submission_timeout_seconds`.
 
-def generate_performance_metrics_for_submission(
+    When the deadline passes the submission's tasks are stopped and its
+    containers killed, and the next file to finish stops the evaluation.
+    """
+
+    def __init__(
+        self,
+        submission_id: int,
+        seconds: float | None,
+        stop_event_name: str | None = None,
+    ):
+        self.submission_id = submission_id
+        self.seconds = float(seconds) if seconds is not None else None
+        self.stop_event_name = stop_event_name
+        self.expired = False
+        self.timer: threading.Timer | None = None
+
+    def expire(self):
+        self.expired = True
+        logger.error(
+            f"Submission exceeded its time limit of {self.seconds} seconds, stopping evaluation"
+        )
+        kill_submission_containers(
+            self.submission_id, logger, self.stop_event_name
+        )
+
+    def on_file_completed(
+        self,
+        function_args: tuple[Any, ...],
+        result: SubmissionTaskResult,
+    ):
+        if not self.expired:
+            return
+
+        error_code = 1
+        raise SubmissionException(
+            *get_error_by_code(error_code, submission_error_codes, logger)
+        )
+
+    def __enter__(self):
+        if self.seconds is not None:
+            self.timer = threading.Timer(self.seconds, self.expire)
+            self.timer.name = f"{threading.current_thread().name}_deadline"
+            self.timer.daemon = True
+            self.timer.start()
+        return self
+
+    def __exit__(self, *args: Any):
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+def wilson_lower_bound(
+    successes: int, trials: int, confidence: float
+) -> float:
+    """One-sided lower confidence bound of a binomial proportion."""
+
+    if trials == 0:
+        return 0.0
+
+    z = NormalDist().inv_cdf(confidence)
+    proportion = successes / trials
+    centre = proportion + z**2 / (2 * trials)
+    margin = z * math.sqrt(
+        proportion * (1 - proportion) / trials + z**2 / (4 * trials**2)
+    )
+    return (centre - margin) / (1 + z**2 / trials)
+
+
+class EarlyTerminationPolicy:
+    """
+    Stop an evaluation as soon as the submission's error rate is, with the
+    given confidence, above `max_error_rate`, rather than running every
+    remaining file of a broken submission. Set per analysis in config.json:
+
+        "early_termination": {
+            "max_error_rate": 0.5,
+            "confidence": 0.95,
+            "min_files": 10
+        }
+
+    The test files always run, so at least `NUM_FILES_TO_TEST + 1` files
+    have to finish before the policy can stop an evaluation.
+    """
+
+    def __init__(
+        self,
+        max_error_rate: float,
+        confidence: float = 0.95,
+        min_files: int = 10,
+    ):
+        self.max_error_rate = max_error_rate
+        self.confidence = confidence
+        self.min_files = max(min_files, NUM_FILES_TO_TEST + 1)
+
+        self.number_of_files = 0
+        self.number_of_errors = 0
+
+    @classmethod
+    def from_config(
+        cls, config_data: dict[str, Any]
+    ) -> "EarlyTerminationPolicy | None":
+        policy: dict[str, Any] | None = config_data.get("early_termination")
+        if not policy:
+            return None
+
+        return cls(
+            max_error_rate=float(policy["max_error_rate"]),
+            confidence=float(policy.get("confidence", 0.95)),
+            min_files=int(policy.get("min_files", 10)),
+        )
+
+    def on_file_completed(
+        self,
+        function_args: tuple[Any, ...],
+        result: SubmissionTaskResult,
+    ):
+        self.number_of_files += 1
+        if result["error"]:
+            self.number_of_errors += 1
+
+        if self.number_of_files < self.min_files:
+            return
+
+        lower_bound = wilson_lower_bound(
+            self.number_of_errors, self.number_of_files, self.confidence
+        )
+        if lower_bound <= self.max_error_rate:
+            return
+
+        error_rate = self.number_of_errors / self.number_of_files
+        logger.error(
+            f"{self.number_of_errors} of {self.number_of_files} files failed, the error rate is at least {lower_bound:.1%} with {self.confidence:.0%} confidence, above the maximum of {self.max_error_rate:.1%}. Exiting."
+        )
+        error_code = 7
+        raise RunnerException(
+            *get_error_by_code(error_code, runner_error_codes, logger),
+            error_rate,
+        )
+
+
+def load_file_and_system_metadata(data_dir: str) -> pd.DataFrame:
+    """Join the file metadata with its system metadata, giving one row per
+    file."""
+
+    file_metadata_df: pd.DataFrame = pd.read_csv(
+        os.path.join(data_dir, "metadata", "file_metadata.csv")
+    )
+
+    system_metadata_df = pd.read_csv(
+        os.path.join(data_dir, "metadata", "system_metadata.csv")
+    )
+
+    system_metadata_df = system_metadata_df.drop_duplicates(
+        "system_id"
+    ).set_index("system_id")
+
+    return file_metadata_df[["file_name", "system_id"]].join(
+        system_metadata_df, on="system_id", rsuffix="_system"
+    )
+
+
+def load_submission_runtimes(results_dir: str) -> pd.Series:
+    submission_execution_times_df = pd.read_csv(
+        os.path.join(results_dir, "execution_time.csv")
+    )
+
+    return submission_execution_times_df.drop_duplicates(
+        "file_name"
+    ).set_index("file_name")["execution_time"]
+
+
+def load_metrics_inputs(data_dir: str, results_dir: str) -> pd.DataFrame:
+    """Join the file metadata with its system metadata and the submission
+    runtimes, giving one row per file."""
+
+    metrics_inputs_df = load_file_and_system_metadata(data_dir)
+    metrics_inputs_df["runtime"] = metrics_inputs_df["file_name"].map(
+        load_submission_runtimes(results_dir)
+    )
+
+    return metrics_inputs_df
+
+
+def load_submission_output_and_references(
     file_name: str,
     config_data: dict[str, Any],
     system_metadata_dict: dict[str, Any],
     results_dir: str,
     data_dir: str,
-    submission_runtime: float,
-    function_parameters: list[str],
-):
-
-    performance_metrics = config_data["performance_metrics"]
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Read the submission output for a file together with the values it is
+    compared against, keyed by the entries of `references_compare`."""
 
-    submission_output_row: pd.Series | None = None
-    submission_output_series: pd.Series | None = None
-
-    # Get the reference scalars that we will compare to
+    output_dictionary: dict[str, Any] = dict()
     references_dict: dict[str, Any] = dict()
+
     if config_data["comparison_type"] == "scalar":
         submission_output_row = cast(
             pd.Series,
@@ -1174,9 +2193,15 @@ def generate_performance_metrics_for_submission(
                 index_col=0,
             ).iloc[0],
         )
-        for val in config_data["references_compare"]:
+        for idx, val in enumerate(config_data["references_compare"]):
+            output_dictionary[val] = submission_output_row.iloc[idx]
             references_dict[val] = system_metadata_dict[val]
-            logger.info(f'references_dict["{val}"]: {references_dict[val]}')
+
+            if not pd.api.types.is_number(output_dictionary[val]):
+                raise TypeError(
+                    f"{file_name} submission output `{val}` is not numeric"
+                )
+
     if config_data["comparison_type"] == "time_series":
         submission_output_series = cast(
             pd.Series,
@@ -1185,12 +2210,9 @@ def generate_performance_metrics_for_submission(
                 index_col=0,
             ).squeeze(),
         )
-        references_series: pd.Series = pd.read_csv(
-            os.path.join(data_dir + "/validation_data/", file_name),
-            index_col=0,
-            parse_dates=True,
+        references_series: pd.Series = read_time_series_file(
+            os.path.join(data_dir + "/validation_data/", file_name)
         ).squeeze()
-        references_dict["time_series"] = references_series
 
         references_file_length = len(references_series)
 
@@ -1205,47 +2227,87 @@ def generate_performance_metrics_for_submission(
                 *get_error_by_code(error_code, runner_error_codes, logger)
             )
 
-    output_dictionary: dict[str, Any] = dict()
-    if config_data["comparison_type"] == "scalar":
-        if submission_output_row is None:
-            logger.error(
-                f"submission_output_row is None for {file_name}. Exiting."
-            )
-            error_code = 9
-            raise RunnerException(
-                *get_error_by_code(error_code, runner_error_codes, logger)
-            )
+        if not pd.api.types.is_numeric_dtype(submission_output_series):
+            raise TypeError(f"{file_name} submission output is not numeric")
 
-        for idx in range(len(config_data["references_compare"])):
+        output_dictionary["time_series"] = submission_output_series
+        references_dict["time_series"] = references_series
 
-            logger.info(f"submission_output_row: {submission_output_row}")
-            logger.info(
-                f"submission_output_row[{idx}]: {submission_output_row.iloc[idx]}"
-            )
-            logger.info(
-                f"config_data['references_compare'][{idx}]: {config_data['references_compare'][idx]}"
+    return output_dictionary, references_dict
+
+
+def to_long_format(
+    file_names: list[str], values: list[Any], comparison_type: str
+) -> pd.Series:
+    """Stack the values of several files into one series indexed by file
+    name, with one row per scalar or per time series entry."""
+
+    if comparison_type == "time_series":
+        lengths = [len(series) for series in values]
+        stacked = np.concatenate([series.to_numpy() for series in values])
+        return pd.Series(stacked, index=np.repeat(file_names, lengths))
+
+    return pd.Series(values, index=file_names)
+
+
+def generate_performance_metrics_for_files(
+    metrics_inputs_df: pd.DataFrame,
+    config_data: dict[str, Any],
+    results_dir: str,
+    data_dir: str,
+) -> tuple[list[dict[str, Any]], int]:
+    """Calculate the performance metrics of several files at once.
+
+    Metrics in `vectorized_performance_metrics_map` are computed in a single
+    pass over the stacked outputs and references of every file, the rest
+    are computed file by file. A file that fails any metric is left out of
+    the results and counted as an error.
+    """
+
+    performance_metrics: list[str] = config_data["performance_metrics"]
+    references_compare: list[str] = config_data["references_compare"]
+    comparison_type: str = config_data["comparison_type"]
+    function_parameters = ["time_series", *config_data["allowable_kwargs"]]
+
+    number_of_errors = 0
+    failed_files: set[str] = set()
+
+    outputs: dict[str, dict[str, Any]] = dict()
+    references: dict[str, dict[str, Any]] = dict()
+    runtimes: dict[str, float] = dict()
+
+    for row in metrics_inputs_df.to_dict("records"):
+        file_name: str = row["file_name"]
+
+        if pd.isna(row["runtime"]):
+            logger.error(
+                f"submission_runtime not found for file {file_name}. Exiting."
             )
+            continue
 
-            output_dictionary[config_data["references_compare"][idx]] = (
-                submission_output_row[idx]
+        try:
+            outputs[file_name], references[file_name] = (
+                load_submission_output_and_references(
+                    file_name, config_data, row, results_dir, data_dir
+                )
             )
-    if config_data["comparison_type"] == "time_series":
-        output_dictionary["time_series"] = submission_output_series
-    # Run routine for all of the performance metrics and append
-    # results to the dictionary
-    results_dictionary: dict[str, Any] = dict()
-    results_dictionary["file_name"] = file_name
+            runtimes[file_name] = row["runtime"]
+        except Exception as e:
+            number_of_errors += 1
+            # TODO: add error code
+            logger.error(
+                f"Error generating performance metrics for {file_name}"
+            )
+            logger.exception(e)
 
-    # Set the data requirements in the dictionary, must be a list for DB array field
-    results_dictionary["data_requirements"] = function_parameters
-    # Loop through the rest of the performance metrics and calculate them
-    # (this predominantly applies to error metrics)
+    file_names = list(outputs)
+    vectorized_metrics_map = vectorized_performance_metrics_map.get(
+        comparison_type, {}
+    )
 
+    metric_values: dict[str, dict[str, Any]] = dict()
     for metric in performance_metrics:
-
         if metric == "runtime":
-            # Set the runtime in the results dictionary
-            results_dictionary["runtime"] = submission_runtime
             continue
 
         if metric not in performance_metrics_map:
@@ -1253,24 +2315,68 @@ def generate_performance_metrics_for_submission(
                 f"performance metric `{metric}` not found in performance_metrics_map, Unhandled metric"
             )
             # TODO: add error code
+            failed_files.update(file_names)
+            continue
 
-            raise RunnerException(
-                *get_error_by_code(500, runner_error_codes, logger)
-            )
-
-        performance_metric_function = performance_metrics_map[metric]
-
-        for val in config_data["references_compare"]:
+        for val in references_compare:
             logger.info(f'"{metric}_{val}" is being calculated')
-            results_dictionary[metric + "_" + val] = (
-                performance_metric_function(
-                    output_dictionary[val], references_dict[val]
+
+            if metric in vectorized_metrics_map:
+                metric_series: pd.Series = vectorized_metrics_map[metric](
+                    to_long_format(
+                        file_names,
+                        [outputs[name][val] for name in file_names],
+                        comparison_type,
+                    ),
+                    to_long_format(
+                        file_names,
+                        [references[name][val] for name in file_names],
+                        comparison_type,
+                    ),
                 )
-            )
+                metric_values[f"{metric}_{val}"] = metric_series.reindex(
+                    file_names
+                ).to_dict()
+                continue
+
+            performance_metric_function = performance_metrics_map[metric]
+            values: dict[str, Any] = dict()
+            for file_name in file_names:
+                try:
+                    values[file_name] = performance_metric_function(
+                        outputs[file_name][val], references[file_name][val]
+                    )
+                except Exception as e:
+                    failed_files.add(file_name)
+                    logger.error(
+                        f"Error generating performance metrics for {file_name}"
+                    )
+                    logger.exception(e)
+            metric_values[f"{metric}_{val}"] = values
+
+    all_results: list[dict[str, Any]] = []
+    for file_name in file_names:
+        if file_name in failed_files:
+            number_of_errors += 1
+            continue
 
-    logger.info(f"results_dictionary: {results_dictionary}")
+        # Set the data requirements in the dictionary, must be a list for DB array field
+        results_dictionary: dict[str, Any] = {
+            "file_name": file_name,
+            "data_requirements": function_parameters,
+        }
+        for metric in performance_metrics:
+            if metric == "runtime":
+                results_dictionary["runtime"] = runtimes[file_name]
+                continue
+            for val in references_compare:
+                key = f"{metric}_{val}"
+                results_dictionary[key] = metric_values[key][file_name]
 
-    return results_dictionary
+        logger.info(f"{file_name}: {results_dictionary}")
+        all_results.append(results_dictionary)
+
+    return all_results, number_of_errors
 
 
 # @timeout(SUBMISSION_TIMEOUT)
@@ -1323,6 +2429,70 @@ def generate_performance_metrics_for_submission(
 #         return None, error
 
 
+class StreamingMetricsCollector:
+    """
+    Compute the performance metrics of each file as soon as its submission
+    container finishes, while the other files are still running. Files it
+    could not handle are left to `loop_over_results_and_generate_metrics`.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        results_dir: str,
+        current_evaluation_dir: str,
+        runtimes: SubmissionRuntimeReader,
+    ):
+        self.data_dir = data_dir
+        self.results_dir = results_dir
+        self.runtimes = runtimes
+        self.result_files_dir = os.path.join(results_dir, "files")
+        self.config_data: dict[str, Any] = json.load(
+            open(os.path.join(current_evaluation_dir, "config.json"))
+        )
+        self.metadata_df = load_file_and_system_metadata(data_dir).set_index(
+            "file_name", drop=False
+        )
+
+        self.results: dict[str, dict[str, Any]] = dict()
+        self.failed_files: set[str] = set()
+
+    def on_file_completed(
+        self,
+        function_args: tuple[Any, ...],
+        result: SubmissionTaskResult,
+    ):
+        if result["error"]:
+            return
+
+        file_name: str = function_args[5][0]
+
+        try:
+            runtime = self.runtimes.get(file_name)
+            if runtime is None:
+                return
+
+            file_df = self.metadata_df.loc[[file_name]].assign(runtime=runtime)
+
+            file_results, file_errors = generate_performance_metrics_for_files(
+                file_df,
+                self.config_data,
+                self.result_files_dir,
+                self.data_dir,
+            )
+        except Exception as e:
+            logger.warning(
+                f"Could not compute metrics for {file_name} while running, deferring"
+            )
+            logger.exception(e)
+            return
+
+        if file_errors:
+            self.failed_files.add(file_name)
+        for file_result in file_results:
+            self.results[file_result["file_name"]] = file_result
+
+
 def prepare_kwargs_for_submission_function(
     config_data: dict[str, Any],
     function_parameters: list[str],
@@ -1344,10 +2514,8 @@ def prepare_kwargs_for_submission_function(
 
 
 def prepare_time_series(data_dir: str, file_name: str, row: pd.Series) -> dict:
-    time_series_df: pd.DataFrame = pd.read_csv(
-        os.path.join(data_dir + "/file_data/", file_name),
-        index_col=0,
-        parse_dates=True,
+    time_series_df: pd.DataFrame = read_time_series_file(
+        os.path.join(data_dir + "/file_data/", file_name)
     )
     time_series_dict = dict()
     if len(time_series_df.columns) == 1:
@@ -1,4 +1,5 @@
-from importlib import import_module
+import importlib.util
+from types import ModuleType
 from typing import Any, Callable, Optional
 from mypy_boto3_sqs import SQSClient, SQSServiceResource
 import requests
@@ -9,33 +10,62 @@ import shutil
 import boto3
 import botocore.exceptions
 import json
-import time
 import urllib.request
 import inspect
+import logging
+import signal
 import threading
 import pandas as pd
-from logger import setup_logging
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from logger import ThreadLogCapture, setup_logging
 from utility import (
+    EVALUATED_FILES_MANIFEST,
+    EVALUATION_SUMMARY_FILE,
     FAILED,
+    PRIVATE_REPORT_FILE,
+    PRIVATE_REPORT_INPUT_DIR,
+    PRIVATE_REPORT_REQUEST_FILE,
+    PRIVATE_REPORT_TEMPLATE_FILE,
     FINISHED,
     RUNNING,
+    SUBMISSION_FILE_RESULTS_FILE,
     WORKER_ERROR_PREFIX,
     RunnerException,
     SubmissionException,
+    LocalFileCache,
+    PrivateReportRequest,
+    SubmissionFileResultRow,
     WorkerException,
+    bulk_pull_from_s3,
+    bulk_push_to_s3,
+    close_dask_client,
     copy_file_to_directory,
+    create_blank_error_report,
+    get_columnar_file_name,
     get_error_by_code,
     get_error_codes_dict,
+    hash_files,
     list_s3_bucket,
+    list_s3_bucket_objects,
+    log_api_latency_stats,
+    prebuild_base_docker_images,
     pull_from_s3,
     push_to_s3,
+    render_private_report_from_files,
     request_to_API_w_credentials,
     timing,
     is_local,
+    kill_submission_containers,
     update_submission_status,
+    upload_file_to_s3,
+    upload_submission_file_results,
 )
 
-
 logger = setup_logging(__name__)
 
 
@@ -48,6 +78,62 @@ LOG_FILE_DIR = os.path.abspath(os.path.join(FILE_DIR, "..", "logs"))
 CURRENT_EVALUATION_DIR = os.path.abspath(
     os.path.join(FILE_DIR, "..", "current_evaluation")
 )
+DOCKER_SRC_DIR = os.path.join(FILE_DIR, "docker")
+# Kept inside the evaluation directory so files can be hard-linked from it
+DATA_CACHE_DIR = os.environ.get(
+    "DATA_CACHE_DIR", os.path.join(CURRENT_EVALUATION_DIR, ".data_cache")
+)
+DATA_CACHE_GB = float(os.environ.get("DATA_CACHE_GB", "20"))
+
+SUBMISSION_QUEUE_NAME = "valhub_submission_queue.fifo"
+# Number of submissions evaluated in parallel; they share the worker's
+# Dask cluster, which bounds the submission containers run at once
+MAX_CONCURRENT_SUBMISSIONS = int(
+    os.environ.get("MAX_CONCURRENT_SUBMISSIONS", "1")
+)
+# Stop after this many submissions, 0 keeps consuming indefinitely
+MAX_SUBMISSIONS_PER_WORKER = int(
+    os.environ.get("MAX_SUBMISSIONS_PER_WORKER", "0")
+)
+SQS_WAIT_TIME_SECONDS = 20
+MESSAGE_VISIBILITY_TIMEOUT = 43200  # seconds
+VISIBILITY_HEARTBEAT_INTERVAL = 60  # seconds
+
+# Resubmissions of an identical archive against an unchanged analysis reuse
+# the stored results instead of being evaluated again
+REUSE_EVALUATION_RESULTS = (
+    os.environ.get("REUSE_EVALUATION_RESULTS", "true").lower() == "true"
+)
+EVALUATION_CACHE_PREFIX = "evaluation_cache"
+
+# Submissions being evaluated, whose containers are killed on shutdown
+IN_FLIGHT_SUBMISSIONS: set[int] = set()
+IN_FLIGHT_SUBMISSIONS_LOCK = threading.Lock()
+
+RUNNER_MODULE_NAME = "pvinsight-validation-runner"
+RUNNER_MODULE: ModuleType | None = None
+RUNNER_MODULE_LOCK = threading.Lock()
+EVALUATION_FINGERPRINT_FILES = [
+    "pvinsight-validation-runner.py",
+    "metric_operations.py",
+    "utility.py",
+    "logger.py",
+    os.path.join("docker", "Dockerfile"),
+    os.path.join("docker", "Dockerfile.base"),
+    os.path.join("docker", "requirements.txt"),
+    os.path.join("docker", "submission_wrapper.py"),
+]
+
+# Private reports are rendered from their own queue, by whichever worker
+# thread is free, instead of at the end of each evaluation
+RENDER_REPORTS_ASYNC = (
+    os.environ.get("RENDER_REPORTS_ASYNC", "true").lower() == "true"
+)
+REPORT_QUEUE_NAME = "valhub_report_queue.fifo"
+REPORT_VISIBILITY_TIMEOUT = 1800  # seconds
+# Rendered reports by the hash of their template and results
+PRIVATE_REPORT_CACHE_PREFIX = "private_report_cache"
+REPORT_QUEUE: Any = None
 
 
 def update_submission_result(submission_id: int, result_json: dict[str, Any]):
@@ -70,6 +156,7 @@ def update_submission_result(submission_id: int, result_json: dict[str, Any]):
 def prepare_docker_files_for_submission(src_dir: str, docker_dir: str):
     files = [
         "Dockerfile",
+        "Dockerfile.base",
         "submission_wrapper.py",
         "requirements.txt",
         "unzip.py",
@@ -79,6 +166,65 @@ def prepare_docker_files_for_submission(src_dir: str, docker_dir: str):
         copy_file_to_directory(file, src_dir, docker_dir)
 
 
+def get_file_metadata_in_bulk(file_ids: list[int]) -> list[dict[str, Any]]:
+    file_metadata_list: list[dict[str, Any]] = []
+
+    page = 1
+    while True:
+        data = request_to_API_w_credentials(
+            "POST",
+            f"file_metadata/filemetadata/bulk/?page={page}",
+            data={"file_ids": file_ids},
+        )
+        for file_metadata in data["results"]:
+            # System metadata is fetched separately by the runner
+            file_metadata.pop("system_metadata", None)
+            file_metadata_list.append(file_metadata)
+
+        if not data["next"]:
+            break
+        page += 1
+
+    return file_metadata_list
+
+
+def pull_analysis_files(
+    analysis_files: list[tuple[str, str, str | None, str | None]],
+):
+    """
+    Pull `(s3_file_path, dest_dir, file_hash, etag)` entries into their
+    destination directories, linking cached files and downloading the
+    rest in parallel.
+    """
+
+    missing_files: list[tuple[str, str, str | None]] = []
+
+    for s3_file_path, dest_dir, file_hash, etag in analysis_files:
+        dest_path = os.path.join(dest_dir, s3_file_path.split("/")[-1])
+
+        cache_key = LocalFileCache.make_key(file_hash, etag)
+        if DATA_CACHE.get(cache_key, dest_path):
+            logger.info(
+                f'linked cached file "{s3_file_path}" to "{dest_path}"'
+            )
+            continue
+
+        missing_files.append((s3_file_path, dest_dir, cache_key))
+
+    dest_paths = bulk_pull_from_s3(
+        [
+            (s3_file_path, dest_dir)
+            for s3_file_path, dest_dir, _ in missing_files
+        ],
+        logger=logger,
+    )
+
+    for (_, _, cache_key), dest_path in zip(missing_files, dest_paths):
+        DATA_CACHE.put(cache_key, dest_path)
+
+    DATA_CACHE.log_metrics()
+
+
 def extract_analysis_data(  # noqa: C901
     analysis_id: int, current_evaluation_dir: str
 ) -> pd.DataFrame:
@@ -102,19 +248,9 @@ def extract_analysis_data(  # noqa: C901
             )
 
     logger.info("pull evaluation scripts from s3")
-    for file in files:
-        logger.info(f"pull file {file} from s3")
-        tmp_path = pull_from_s3(
-            IS_LOCAL, S3_BUCKET_NAME, file, BASE_TEMP_DIR, logger
-        )
-        dest_path = os.path.join(
-            current_evaluation_dir, tmp_path.split("/")[-1]
-        )
-        logger.info(f"move file {tmp_path} to {dest_path}")
-        shutil.move(
-            tmp_path,
-            dest_path,
-        )
+    bulk_pull_from_s3(
+        [(file, current_evaluation_dir) for file in files], logger=logger
+    )
 
     # create data directory and sub directories
     data_dir = os.path.join(current_evaluation_dir, "data")
@@ -147,25 +283,30 @@ def extract_analysis_data(  # noqa: C901
     # information (sampling frequency, specific test, timezone, etc) as well
     # as reference information to test against in the validation_dictionary
     # field
-    # For each unique file id, make a GET request to the Django API to get the corresponding file metadata
-    file_metadata_list: list[dict[str, Any]] = []
-    for file_id in unique_file_ids:
-        fmd_url = f"file_metadata/filemetadata/{file_id}/"
-
-        try:
-
-            data = request_to_API_w_credentials("GET", fmd_url)
-            file_metadata_list.append(data)
+    # Fetch the metadata for all of the unique file ids in bulk
+    try:
+        file_metadata_list = get_file_metadata_in_bulk(
+            [int(file_id) for file_id in unique_file_ids]
+        )
+    except Exception as e:
+        error_code = 7
+        logger.error(f"File metadata not found in Django API")
+        logger.exception(e)
+        raise requests.exceptions.HTTPError(
+            *get_error_by_code(error_code, worker_error_codes, logger),
+        )
 
-        except Exception as e:
-            error_code = 7
-            logger.error(
-                f"File metadata for file id {file_id} not found in Django API"
-            )
-            logger.exception(e)
-            raise requests.exceptions.HTTPError(
-                *get_error_by_code(error_code, worker_error_codes, logger),
-            )
+    missing_file_ids = set(int(file_id) for file_id in unique_file_ids) - {
+        file_metadata["file_id"] for file_metadata in file_metadata_list
+    }
+    if missing_file_ids:
+        error_code = 7
+        logger.error(
+            f"File metadata for file ids {sorted(missing_file_ids)} not found in Django API"
+        )
+        raise requests.exceptions.HTTPError(
+            *get_error_by_code(error_code, worker_error_codes, logger),
+        )
 
     # Convert the list of file metadata to a DataFrame
     file_metadata_df = pd.DataFrame(file_metadata_list)
@@ -181,11 +322,20 @@ def extract_analysis_data(  # noqa: C901
 
     files_for_analysis: list[str] = file_metadata_df["file_name"].tolist()
 
-    files_list = list_s3_bucket(f"valhub-bucket/data_files/files/")
+    files_objects = list_s3_bucket_objects(f"valhub-bucket/data_files/files/")
+    files_list = [file["Key"] for file in files_objects]
     files = [file.split("/")[-1] for file in files_list]
-    references_list = list_s3_bucket(
+    references_objects = list_s3_bucket_objects(
         f"valhub-bucket/data_files/references/{analysis_id}/"
     )
+    references_list = [references["Key"] for references in references_objects]
+    etags = {
+        s3_object["Key"]: s3_object["ETag"]
+        for s3_object in [*files_objects, *references_objects]
+    }
+    file_hashes: dict[str, Any] = dict(
+        zip(file_metadata_df["file_name"], file_metadata_df["file_hash"])
+    )
     references_files = [
         references.split("/")[-1] for references in references_list
     ]
@@ -212,30 +362,44 @@ def extract_analysis_data(  # noqa: C901
                 f"Data file {analysis_file} not found for analysis {analysis_id}",
             )
 
+    analysis_files: list[tuple[str, str, str | None, str | None]] = []
+
     for file in files_for_analysis:
 
-        data_file = files_list[files.index(file)]
+        data_files = [files_list[files.index(file)]]
 
-        tmp_path = pull_from_s3(
-            IS_LOCAL, S3_BUCKET_NAME, data_file, BASE_TEMP_DIR, logger
-        )
-        logger.info(f"move analysis file {tmp_path} to {file_data_dir}")
-        shutil.move(
-            tmp_path, os.path.join(file_data_dir, tmp_path.split("/")[-1])
-        )
+        # Pull the Parquet copy written at ingestion when there is one
+        columnar_file = get_columnar_file_name(file)
+        if columnar_file in files:
+            data_files.append(files_list[files.index(columnar_file)])
 
-        references = references_list[references_files.index(file)]
+        references = [references_list[references_files.index(file)]]
 
-        tmp_path = pull_from_s3(
-            IS_LOCAL, S3_BUCKET_NAME, references, BASE_TEMP_DIR, logger
-        )
-        logger.info(
-            f'move reference file "{tmp_path}" to "{validation_data_dir}"'
-        )
-        shutil.move(
-            tmp_path,
-            os.path.join(validation_data_dir, tmp_path.split("/")[-1]),
-        )
+        if columnar_file in references_files:
+            references.append(
+                references_list[references_files.index(columnar_file)]
+            )
+
+        file_hash = file_hashes.get(file)
+        if not isinstance(file_hash, str):
+            file_hash = None
+
+        for data_file in data_files:
+            analysis_files.append(
+                (data_file, file_data_dir, file_hash, etags.get(data_file))
+            )
+
+        for reference in references:
+            analysis_files.append(
+                (
+                    reference,
+                    validation_data_dir,
+                    file_hash,
+                    etags.get(reference),
+                )
+            )
+
+    pull_analysis_files(analysis_files)
 
     return file_metadata_df
 
@@ -245,13 +409,49 @@ def create_current_evaluation_dir(directory_path: str):
 
     if os.path.exists(current_evaluation_dir):
         logger.info(f"remove directory {current_evaluation_dir}")
-        shutil.rmtree(current_evaluation_dir, ignore_errors=True)
+        for entry in os.scandir(current_evaluation_dir):
+            if os.path.abspath(entry.path) == os.path.abspath(DATA_CACHE_DIR):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
 
     os.makedirs(current_evaluation_dir, exist_ok=True)
     logger.info(f"created evaluation folder {current_evaluation_dir}")
     return current_evaluation_dir
 
 
+def get_runner_module() -> ModuleType:
+    """
+    The validation runner, loaded once from the worker's source directory
+    and shared by every submission. It is loaded from its file path under a
+    lock, so sys.path is never changed while submissions are running.
+    """
+    global RUNNER_MODULE
+
+    with RUNNER_MODULE_LOCK:
+        if RUNNER_MODULE is None:
+            logger.info(f"import runner module {RUNNER_MODULE_NAME}")
+            spec = importlib.util.spec_from_file_location(
+                RUNNER_MODULE_NAME,
+                os.path.join(FILE_DIR, f"{RUNNER_MODULE_NAME}.py"),
+            )
+            if spec is None or spec.loader is None:
+                raise ImportError(
+                    f"Could not load runner module {RUNNER_MODULE_NAME}"
+                )
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[RUNNER_MODULE_NAME] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[RUNNER_MODULE_NAME]
+                raise
+            RUNNER_MODULE = module
+        return RUNNER_MODULE
+
+
 def load_analysis(
     analysis_id: int, submission_id: int, current_evaluation_dir: str
 ) -> tuple[
@@ -268,44 +468,12 @@ def load_analysis(
         analysis_id, current_evaluation_dir
     )
 
-    # Copy the validation runner into the current evaluation directory
-    shutil.copy(
-        os.path.join("/root/worker/src", "pvinsight-validation-runner.py"),
-        os.path.join(current_evaluation_dir, "pvinsight-validation-runner.py"),
-    )
-
-    shutil.copy(
-        os.path.join("/root/worker/src", "metric_operations.py"),
-        os.path.join(current_evaluation_dir, "metric_operations.py"),
-    )
-
-    # Copy the error codes file into the current evaluation directory
-    shutil.copy(
-        os.path.join("/root/worker/src", "errorcodes.json"),
-        os.path.join(current_evaluation_dir, "errorcodes.json"),
-    )
-
-    shutil.copy(
-        os.path.join("/root/worker/src", "utility.py"),
-        os.path.join(current_evaluation_dir, "utility.py"),
-    )
-
-    shutil.copy(
-        os.path.join("/root/worker/src", "logger.py"),
-        os.path.join(current_evaluation_dir, "logger.py"),
-    )
-
     docker_dir = os.path.join(current_evaluation_dir, "docker")
 
-    prepare_docker_files_for_submission("/root/worker/src/docker", docker_dir)
-    # import analysis runner as a module
-    sys.path.insert(0, current_evaluation_dir)
-    runner_module_name = "pvinsight-validation-runner"
-    logger.info(f"import runner module {runner_module_name}")
-
-    analysis_module = import_module(runner_module_name)
+    prepare_docker_files_for_submission(DOCKER_SRC_DIR, docker_dir)
 
-    sys.path.pop(0)
+    runner_module_name = RUNNER_MODULE_NAME
+    analysis_module = get_runner_module()
 
     try:
         analysis_function = getattr(analysis_module, "run")
@@ -325,6 +493,22 @@ def load_analysis(
     return analysis_function, function_parameters, file_metadata_df
 
 
+def get_volume_host_evaluation_dir() -> str | None:
+    """Host path of `CURRENT_EVALUATION_DIR`, as mounted into this worker."""
+
+    volume_host_evaluation_dir = os.environ.get(
+        "DOCKER_HOST_VOLUME_EVALUATION_DIR"
+    )
+    if volume_host_evaluation_dir is None:
+        volume_host_data_dir = os.environ.get("DOCKER_HOST_VOLUME_DATA_DIR")
+        if volume_host_data_dir is None:
+            return None
+        volume_host_evaluation_dir = os.path.dirname(
+            os.path.normpath(volume_host_data_dir)
+        )
+    return volume_host_evaluation_dir
+
+
 @timing(verbose=True, logger=logger)
 def process_submission_message(
     analysis_id: int,
@@ -332,20 +516,104 @@ def process_submission_message(
     user_id: int,
     python_version: str,
     submission_filename: str,
+    log_capture: ThreadLogCapture | None = None,
+    reevaluate: bool = False,
 ):
     """
     Extracts the submission related metadata from the message
     and send the submission object for evaluation
     """
 
+    # Each submission gets its own evaluation and temporary directories so
+    # that several can be evaluated at once
+    evaluation_dir_name = f"submission_{submission_id}"
     current_evaluation_dir = create_current_evaluation_dir(
-        CURRENT_EVALUATION_DIR
+        os.path.join(CURRENT_EVALUATION_DIR, evaluation_dir_name)
     )
+    volume_host_evaluation_dir = get_volume_host_evaluation_dir()
+    if volume_host_evaluation_dir is not None:
+        volume_host_evaluation_dir = os.path.join(
+            volume_host_evaluation_dir, evaluation_dir_name
+        )
+    tmp_dir = tempfile.mkdtemp(dir=BASE_TEMP_DIR)
 
-    analysis_function, function_parameters, file_metadata_df = load_analysis(
-        analysis_id, submission_id, current_evaluation_dir
-    )
-    logger.info(f"function parameters returns {function_parameters}")
+    with IN_FLIGHT_SUBMISSIONS_LOCK:
+        IN_FLIGHT_SUBMISSIONS.add(submission_id)
+    try:
+        if log_capture is not None:
+            log_capture.attach()
+
+        fingerprint = get_evaluation_fingerprint(
+            analysis_id,
+            user_id,
+            submission_id,
+            python_version,
+            submission_filename,
+            tmp_dir,
+        )
+        if fingerprint is not None and reuse_memoized_evaluation(
+            fingerprint, submission_id, user_id, current_evaluation_dir
+        ):
+            return
+
+        analysis_function, function_parameters, file_metadata_df = (
+            load_analysis(analysis_id, submission_id, current_evaluation_dir)
+        )
+        logger.info(f"function parameters returns {function_parameters}")
+
+        if reevaluate:
+            reevaluate = pull_previous_evaluation(
+                submission_id, user_id, current_evaluation_dir
+            )
+
+        result = evaluate_submission(
+            analysis_function,
+            file_metadata_df,
+            analysis_id,
+            submission_id,
+            user_id,
+            python_version,
+            submission_filename,
+            current_evaluation_dir,
+            volume_host_evaluation_dir,
+            tmp_dir,
+            reevaluate,
+            fingerprint=fingerprint,
+        )
+
+        # Only part of the result files of a re-evaluation are local
+        if fingerprint is not None and not reevaluate:
+            memoize_evaluation(
+                fingerprint,
+                submission_id,
+                user_id,
+                result,
+                current_evaluation_dir,
+                tmp_dir,
+            )
+    finally:
+        with IN_FLIGHT_SUBMISSIONS_LOCK:
+            IN_FLIGHT_SUBMISSIONS.discard(submission_id)
+        log_api_latency_stats(logger)
+        logger.info(f"remove directory {current_evaluation_dir}")
+        shutil.rmtree(current_evaluation_dir, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def evaluate_submission(
+    analysis_function: Callable[..., dict[str, Any]],
+    file_metadata_df: pd.DataFrame,
+    analysis_id: int,
+    submission_id: int,
+    user_id: int,
+    python_version: str,
+    submission_filename: str,
+    current_evaluation_dir: str,
+    volume_host_evaluation_dir: str | None,
+    tmp_dir: str,
+    reevaluate: bool = False,
+    fingerprint: str | None = None,
+) -> dict[str, Any]:
 
     # execute the runner script
     # assume ret indicates the directory of result of the runner script
@@ -363,7 +631,15 @@ def process_submission_message(
     logger.debug(f"submission_id: {submission_id}")
     logger.debug(f"python_version: {python_version}")
     logger.debug(f"current_evaluation_dir: {current_evaluation_dir}")
-    logger.debug(f"BASE_TEMP_DIR: {BASE_TEMP_DIR}")
+    logger.debug(f"tmp_dir: {tmp_dir}")
+    logger.debug(f"reevaluate: {reevaluate}")
+
+    # Checkpoints are only valid for the exact runner, submission and data
+    # that produced them, so they are kept under the evaluation fingerprint.
+    # Without one, a stale checkpoint could not be told apart.
+    checkpoint_s3_dir = None
+    if fingerprint is not None:
+        checkpoint_s3_dir = f"submission_files/submission_user_{user_id}/submission_{submission_id}/checkpoint/{fingerprint}"
 
     ret = analysis_function(
         s3_submission_zip_file_path,
@@ -372,10 +648,28 @@ def process_submission_message(
         submission_id,
         python_version,
         current_evaluation_dir,
-        BASE_TEMP_DIR,
+        tmp_dir,
+        volume_host_evaluation_dir=volume_host_evaluation_dir,
+        reevaluate=reevaluate,
+        checkpoint_s3_dir=checkpoint_s3_dir,
+        analysis_id=analysis_id,
+        defer_private_report=REPORT_QUEUE is not None,
     )
     logger.info(f"runner module function returns {ret}")
 
+    publish_evaluation_results(
+        submission_id, user_id, ret, current_evaluation_dir
+    )
+
+    return ret
+
+
+def publish_evaluation_results(
+    submission_id: int,
+    user_id: int,
+    ret: dict[str, Any],
+    current_evaluation_dir: str,
+):
     logger.info(f"update submission status to {FINISHED}")
     update_submission_status(submission_id, FINISHED)
 
@@ -387,27 +681,401 @@ def process_submission_message(
     logger.info(f"upload result files to s3")
 
     res_files_path = os.path.join(
-        CURRENT_EVALUATION_DIR,
+        current_evaluation_dir,
         "results",
     )
+    results_manifest: list[tuple[str, str]] = []
     for dir_path, _, file_names in os.walk(res_files_path):
         for file_name in file_names:
             full_file_name = os.path.join(dir_path, file_name)
             relative_file_name = full_file_name[len(f"{res_files_path}/") :]
 
-            logger.info(f"full file name {full_file_name}")
-            logger.info(f"relative file name {relative_file_name}")
-
             s3_full_path = f"submission_files/submission_user_{user_id}/submission_{submission_id}/results/{relative_file_name}"
 
             logger.info(
                 f'upload result file "{full_file_name}" to s3 path "{s3_full_path}"'
             )
-            push_to_s3(full_file_name, s3_full_path, submission_id)
+            results_manifest.append((full_file_name, s3_full_path))
+
+    bulk_push_to_s3(results_manifest, submission_id, logger=logger)
+
+    # A missing private report does not fail the submission
+    try:
+        schedule_private_report(submission_id, user_id, current_evaluation_dir)
+    except Exception as e:
+        logger.error("Error scheduling private report")
+        logger.exception(e)
+
+
+def schedule_private_report(
+    submission_id: int, user_id: int, current_evaluation_dir: str
+):
+    """
+    Queue the rendering of the private report the runner deferred. Its
+    inputs are stored under the report key, so the report stage can reuse
+    the HTML already rendered for identical inputs.
+    """
+
+    request_path = os.path.join(
+        current_evaluation_dir, "results", PRIVATE_REPORT_REQUEST_FILE
+    )
+    if not os.path.exists(request_path):
+        return
+
+    with open(request_path, "r") as f:
+        request: PrivateReportRequest = json.load(f)
+
+    # Reused results have no local inputs, they were stored when the
+    # report of the original evaluation was scheduled
+    report_input_dir = os.path.join(
+        current_evaluation_dir, PRIVATE_REPORT_INPUT_DIR
+    )
+    if os.path.isdir(report_input_dir):
+        cache_dir = f"{PRIVATE_REPORT_CACHE_PREFIX}/{request['report_key']}"
+        for file_name in os.listdir(report_input_dir):
+            upload_file_to_s3(
+                os.path.join(report_input_dir, file_name),
+                f"{cache_dir}/{file_name}",
+            )
+
+    message = {"submission_id": submission_id, "user_id": user_id, **request}
+
+    if REPORT_QUEUE is None:
+        render_private_report(message)
+        return
+
+    REPORT_QUEUE.send_message(
+        MessageBody=json.dumps(message),
+        MessageGroupId=request["report_key"],
+        MessageDeduplicationId=f"{request['report_key']}_{submission_id}",
+    )
+    logger.info(f"queued private report {request['report_key']}")
+
+
+def render_private_report(message: dict[str, Any]):
+    """
+    Publish the private report of a submission, rendering it only when no
+    report with the same key was rendered before.
+    """
+
+    report_key: str = message["report_key"]
+    cache_dir = f"{PRIVATE_REPORT_CACHE_PREFIX}/{report_key}"
+    results_report_path = f"submission_files/submission_user_{message['user_id']}/submission_{message['submission_id']}/results/{PRIVATE_REPORT_FILE}"
+
+    with tempfile.TemporaryDirectory(dir=BASE_TEMP_DIR) as report_dir:
+        try:
+            report_path = pull_from_s3(
+                IS_LOCAL,
+                S3_BUCKET_NAME,
+                f"{S3_BUCKET_NAME}/{cache_dir}/{PRIVATE_REPORT_FILE}",
+                report_dir,
+                logger,
+            )
+            logger.info(f"reusing private report {report_key}")
+        except requests.HTTPError:
+            request: PrivateReportRequest = {
+                "report_key": report_key,
+                "results_file": message["results_file"],
+                "summary_file": message["summary_file"],
+            }
+            bulk_pull_from_s3(
+                [
+                    (f"{S3_BUCKET_NAME}/{cache_dir}/{file_name}", report_dir)
+                    for file_name in [
+                        PRIVATE_REPORT_TEMPLATE_FILE,
+                        request["results_file"],
+                        request["summary_file"],
+                    ]
+                ],
+                logger=logger,
+            )
+
+            report_path = os.path.join(report_dir, PRIVATE_REPORT_FILE)
+            logger.info(f"rendering private report {report_key}")
+            render_private_report_from_files(
+                report_dir, request, report_path, logger
+            )
+            upload_file_to_s3(
+                report_path, f"{cache_dir}/{PRIVATE_REPORT_FILE}"
+            )
+
+        upload_file_to_s3(report_path, results_report_path)
+
+    logger.info(
+        f"published private report of submission {message['submission_id']}"
+    )
+
+
+class PrivateReportRenderer:
+    """
+    Render the private reports of the report queue from a background
+    thread. A report that fails to render goes back to the queue once its
+    visibility timeout expires.
+    """
+
+    def __init__(self, queue: Any):
+        self.queue = queue
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="report_renderer", daemon=True
+        )
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                messages = self.queue.receive_messages(
+                    MaxNumberOfMessages=1,
+                    VisibilityTimeout=REPORT_VISIBILITY_TIMEOUT,
+                    WaitTimeSeconds=SQS_WAIT_TIME_SECONDS,
+                )
+            except Exception as e:
+                logger.error("Error receiving report messages")
+                logger.exception(e)
+                self.stop_event.wait(SQS_WAIT_TIME_SECONDS)
+                continue
+
+            for message in messages:
+                try:
+                    render_private_report(json.loads(message.body))
+                except Exception as e:
+                    logger.error("Error rendering private report")
+                    logger.exception(e)
+                    continue
+                message.delete()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def pull_previous_evaluation(
+    submission_id: int, user_id: int, current_evaluation_dir: str
+) -> bool:
+    """
+    Pull the files of the submission's previous evaluation that a
+    re-evaluation builds on. Returns False when they are not available, in
+    which case the submission is evaluated in full.
+    """
+
+    results_dir = os.path.join(current_evaluation_dir, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    s3_results_path = f"{S3_BUCKET_NAME}/submission_files/submission_user_{user_id}/submission_{submission_id}/results"
+
+    try:
+        bulk_pull_from_s3(
+            [
+                (f"{s3_results_path}/{file_name}", results_dir)
+                for file_name in [
+                    EVALUATED_FILES_MANIFEST,
+                    "submission_function_info.json",
+                ]
+            ],
+            logger=logger,
+        )
+    except Exception as e:
+        logger.warning(
+            f"Previous evaluation of submission {submission_id} not found, evaluating all files"
+        )
+        logger.exception(e)
+        for file_name in os.listdir(results_dir):
+            os.remove(os.path.join(results_dir, file_name))
+        return False
 
-    # # remove the current evaluation dir
-    # logger.info(f"remove directory {current_evaluation_dir}")
-    # shutil.rmtree(current_evaluation_dir)
+    return True
+
+
+def get_evaluation_fingerprint(
+    analysis_id: int,
+    user_id: int,
+    submission_id: int,
+    python_version: str,
+    submission_filename: str,
+    tmp_dir: str,
+) -> str | None:
+    """
+    Hash of everything that determines an evaluation's results: the
+    submission archive, the Python version, the analysis and its version,
+    and the runner and Docker files used to evaluate it.
+    """
+
+    if not REUSE_EVALUATION_RESULTS:
+        return None
+
+    try:
+        analysis: dict[str, Any] = request_to_API_w_credentials(
+            "GET", f"analysis/{analysis_id}", logger=logger
+        )
+        archive_path = pull_from_s3(
+            IS_LOCAL,
+            S3_BUCKET_NAME,
+            f"{S3_BUCKET_NAME}/submission_files/submission_user_{user_id}/submission_{submission_id}/{submission_filename}",
+            tmp_dir,
+            logger,
+        )
+        runner_hash = hash_files(
+            [
+                os.path.join(FILE_DIR, file)
+                for file in EVALUATION_FINGERPRINT_FILES
+            ]
+        )
+        fingerprint = hash_files(
+            [archive_path],
+            python_version,
+            str(analysis_id),
+            str(analysis["hash"]),
+            str(analysis["version"]),
+            runner_hash,
+        )
+        os.remove(archive_path)
+    except Exception as e:
+        logger.warning("Could not fingerprint submission, evaluating it")
+        logger.exception(e)
+        return None
+
+    logger.info(f"evaluation fingerprint: {fingerprint}")
+    return fingerprint
+
+
+def reuse_memoized_evaluation(
+    fingerprint: str,
+    submission_id: int,
+    user_id: int,
+    current_evaluation_dir: str,
+) -> bool:
+    """
+    Publish the results stored for `fingerprint` as this submission's
+    results. Returns False when there are none to reuse.
+    """
+
+    memo_dir = os.path.join(current_evaluation_dir, "memo")
+    os.makedirs(memo_dir, exist_ok=True)
+
+    try:
+        memo_path = pull_from_s3(
+            IS_LOCAL,
+            S3_BUCKET_NAME,
+            f"{S3_BUCKET_NAME}/{EVALUATION_CACHE_PREFIX}/{fingerprint}.json",
+            memo_dir,
+            logger,
+        )
+    except requests.HTTPError:
+        logger.info(f"no stored evaluation for fingerprint {fingerprint}")
+        return False
+
+    with open(memo_path, "r") as f:
+        memo: dict[str, Any] = json.load(f)
+
+    # Evaluations stored without their per-file results are run again
+    if "file_results" not in memo:
+        logger.info(f"stored evaluation {fingerprint} has no file results")
+        return False
+
+    results_dir = os.path.join(current_evaluation_dir, "results")
+    source_results_path = f"{S3_BUCKET_NAME}/submission_files/submission_user_{memo['user_id']}/submission_{memo['submission_id']}/results"
+
+    manifest: list[tuple[str, str]] = []
+    for relative_file_name in memo["result_files"]:
+        local_dir = os.path.join(
+            results_dir, os.path.dirname(relative_file_name)
+        )
+        os.makedirs(local_dir, exist_ok=True)
+        manifest.append(
+            (f"{source_results_path}/{relative_file_name}", local_dir)
+        )
+
+    try:
+        bulk_pull_from_s3(manifest, logger=logger)
+    except Exception as e:
+        logger.warning(
+            f"Could not pull results of submission {memo['submission_id']}, evaluating submission {submission_id}"
+        )
+        logger.exception(e)
+        shutil.rmtree(results_dir, ignore_errors=True)
+        return False
+
+    logger.info(
+        f"reusing results of submission {memo['submission_id']} for submission {submission_id}"
+    )
+    create_blank_error_report(submission_id, logger=logger)
+    try:
+        upload_submission_file_results(
+            submission_id, memo["file_results"], logger
+        )
+    except Exception as e:
+        logger.error("Error uploading per-file results")
+        logger.exception(e)
+    publish_evaluation_results(
+        submission_id, user_id, memo["result"], current_evaluation_dir
+    )
+    return True
+
+
+def memoize_evaluation(
+    fingerprint: str,
+    submission_id: int,
+    user_id: int,
+    result: dict[str, Any],
+    current_evaluation_dir: str,
+    tmp_dir: str,
+):
+    """
+    Store the results of an evaluation without file errors so identical
+    resubmissions can reuse them. Failures are logged and ignored.
+    """
+
+    results_dir = os.path.join(current_evaluation_dir, "results")
+
+    try:
+        with open(os.path.join(results_dir, EVALUATION_SUMMARY_FILE)) as f:
+            number_of_errors: int = json.load(f)["number_of_errors"]
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        logger.info("no evaluation summary found, results are not stored")
+        return
+
+    if number_of_errors > 0:
+        logger.info(
+            f"{number_of_errors} file errors occurred, results are not stored"
+        )
+        return
+
+    try:
+        with open(
+            os.path.join(results_dir, SUBMISSION_FILE_RESULTS_FILE)
+        ) as f:
+            file_results: list[SubmissionFileResultRow] = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        logger.info("no file results found, results are not stored")
+        return
+
+    result_files: list[str] = []
+    for dir_path, _, file_names in os.walk(results_dir):
+        for file_name in file_names:
+            result_files.append(
+                os.path.relpath(os.path.join(dir_path, file_name), results_dir)
+            )
+
+    memo = {
+        "fingerprint": fingerprint,
+        "submission_id": submission_id,
+        "user_id": user_id,
+        "result": result,
+        "result_files": result_files,
+        "file_results": file_results,
+    }
+    memo_path = os.path.join(tmp_dir, f"{fingerprint}.json")
+    with open(memo_path, "w") as f:
+        json.dump(memo, f)
+
+    try:
+        upload_file_to_s3(
+            memo_path, f"{EVALUATION_CACHE_PREFIX}/{fingerprint}.json"
+        )
+    except Exception as e:
+        logger.warning(f"Could not store evaluation {fingerprint}")
+        logger.exception(e)
 
 
 def get_or_create_sqs_queue(queue_name: str):
@@ -508,25 +1176,98 @@ def get_aws_sqs_client():
     return sqs
 
 
-# function to update visibility timeout, to prevent the error "ReceiptHandle is invalid. Reason: The receipt handle has expired."
-def update_visibility_timeout(
-    queue_url: str,
-    message_receipt_handle: str,
-    timeout: int,
-    event: threading.Event,
-):
-    # Use the Docker endpoint URL for local development
-    sqs = get_aws_sqs_client()
-    while True:
-        # Update visibility timeout
-        sqs.change_message_visibility(
-            QueueUrl=queue_url,
-            ReceiptHandle=message_receipt_handle,
-            VisibilityTimeout=timeout,
-        )
-        time.sleep(60)  # Adjust the sleep duration as needed
-        if event.is_set():
-            break
+class VisibilityHeartbeat:
+    """
+    Keep every in-flight message leased by extending their visibility
+    timeouts from one background thread, to prevent the error "ReceiptHandle
+    is invalid. Reason: The receipt handle has expired."
+    """
+
+    def __init__(
+        self,
+        queue_url: str,
+        timeout: int,
+        interval: int = VISIBILITY_HEARTBEAT_INTERVAL,
+    ):
+        self.queue_url = queue_url
+        self.timeout = timeout
+        self.interval = interval
+        self.receipt_handles: dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="visibility_heartbeat", daemon=True
+        )
+
+    def add(self, message_id: str, receipt_handle: str):
+        with self.lock:
+            self.receipt_handles[message_id] = receipt_handle
+
+    def remove(self, message_id: str):
+        with self.lock:
+            self.receipt_handles.pop(message_id, None)
+
+    def extend_visibility(self, sqs: SQSClient):
+        with self.lock:
+            receipt_handles = list(self.receipt_handles.values())
+
+        # SQS accepts at most 10 entries per batch
+        for start in range(0, len(receipt_handles), 10):
+            entries = [
+                {
+                    "Id": str(index),
+                    "ReceiptHandle": receipt_handle,
+                    "VisibilityTimeout": self.timeout,
+                }
+                for index, receipt_handle in enumerate(
+                    receipt_handles[start : start + 10]
+                )
+            ]
+            response = sqs.change_message_visibility_batch(
+                QueueUrl=self.queue_url, Entries=entries  # type: ignore
+            )
+            for failed in response.get("Failed", []):
+                logger.error(
+                    f"Could not extend message visibility: {failed.get('Message')}"
+                )
+
+    def run(self):
+        sqs = get_aws_sqs_client()
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.extend_visibility(sqs)
+            except Exception as e:
+                logger.error("Error extending message visibility")
+                logger.exception(e)
+
+    def release_all(self, sqs: SQSClient):
+        """Make every in-flight message visible to other workers again."""
+
+        with self.lock:
+            receipt_handles = list(self.receipt_handles.values())
+            self.receipt_handles.clear()
+
+        for start in range(0, len(receipt_handles), 10):
+            sqs.change_message_visibility_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {
+                        "Id": str(index),
+                        "ReceiptHandle": receipt_handle,
+                        "VisibilityTimeout": 0,
+                    }
+                    for index, receipt_handle in enumerate(
+                        receipt_handles[start : start + 10]
+                    )
+                ],
+            )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
 
 
 def post_error_to_api(
@@ -575,170 +1316,317 @@ def handle_error(
     # Send the error message to the submission
 
 
-@timing(verbose=True, logger=logger)
-def main():
-    logger.info(
-        f'Starting submission worker to process messages from "valhub_submission_queue.fifo"'
+def handle_submission_message(message: Any, heartbeat: VisibilityHeartbeat):
+    """
+    Evaluate the submission of one queue message, writing its logs to a
+    directory of their own that is uploaded to S3 once it is done.
+    """
+
+    log_dir = os.path.join(
+        LOG_FILE_DIR, threading.current_thread().name, message.message_id
     )
-    queue = get_or_create_sqs_queue("valhub_submission_queue.fifo")
-    if queue is None:
+    try:
+        with ThreadLogCapture(log_dir) as log_capture:
+            user_id, analysis_id, submission_id = process_message(
+                message, heartbeat, log_capture
+            )
+        upload_logs_to_s3(user_id, analysis_id, submission_id, log_dir)
+    finally:
+        heartbeat.remove(message.message_id)
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+def process_message(
+    message: Any,
+    heartbeat: VisibilityHeartbeat,
+    log_capture: ThreadLogCapture,
+):
+    logger.info(f"Received message: {message.body}")
+
+    json_message: dict[str, Any] = json.loads(message.body)
+
+    analysis_id_str: str | None = json_message.get("analysis_pk", None)
+    submission_id_str: str | None = json_message.get("submission_pk", None)
+    user_id: str | None = json_message.get("user_pk", None)
+    submission_filename: str | None = json_message.get(
+        "submission_filename", None
+    )
+
+    python_version: str | None = json_message.get("python_version", None)
+    # Set for finished submissions that are re-run after their analysis
+    # gained or changed files
+    reevaluate = bool(json_message.get("reevaluate", False))
+
+    if analysis_id_str is None:
+        logger.error("analysis_id is None")
+        raise ValueError("analysis_id is None")
+    if submission_id_str is None:
+        logger.error("submission_id is None")
+        raise ValueError("submission_id is None")
+
+    analysis_id = int(analysis_id_str)
+    submission_id = int(submission_id_str)
+
+    logger.info(f"update submission status to {RUNNING}")
+    update_submission_status(submission_id, RUNNING)
+
+    if (
+        not analysis_id
+        or not submission_id
+        or not user_id
+        or not submission_filename
+        or not python_version
+    ):
         logger.error(
-            f'Could not retrieve or create SQS queue "valhub_submission_queue.fifo"'
+            f"Missing required fields in submission message: analysis_id={analysis_id}, submission_id={submission_id}, user_id={user_id}, submission_filename={submission_filename}"
         )
-        raise WorkerException(
-            *get_error_by_code(1, worker_error_codes, logger)
+        logger.info(f"update submission status to {FAILED}")
+        update_submission_status(submission_id, FAILED)
+        raise ValueError("Missing required fields in submission message")
+
+    try:
+        _, execution_time = process_submission_message(
+            int(analysis_id),
+            int(submission_id),
+            int(user_id),
+            python_version,
+            submission_filename,
+            log_capture,
+            reevaluate,
         )
-    logger.info(f'Retrieved queue "valhub_submission_queue.fifo"')
-    # logger.info(f"SQS queue URL: {queue.url}")
 
-    is_finished = False
+        logger.info(
+            f"Submission Worker took {execution_time:.3f} seconds to process submission_id={submission_id} and analysis_id={analysis_id}"
+        )
+    except (
+        WorkerException,
+        RunnerException,
+        SubmissionException,
+    ) as e:
+        exception_type = type(e).__name__
+        logger.error(
+            f'Error processing message from submission queue with error code {e.code} and message "{e.message}"'
+        )
+        logger.info(f"update submission status to {FAILED}")
+        update_submission_status(submission_id, FAILED)
+        logger.exception(e)
+        handle_error(
+            int(analysis_id),
+            int(submission_id),
+            FAILED,
+            e.code,
+            exception_type,
+            e.error_rate,
+        )
+    except Exception as e:
+        exception_type = type(e).__name__
+        error_rate: float | None = None
+        if e.args:
+            if len(e.args) == 2:
+                error_code: str = f"{WORKER_ERROR_PREFIX}_{e.args[0]}"
+                error_message: str = e.args[1]
+            elif len(e.args) == 3:
+                error_code: str = f"{WORKER_ERROR_PREFIX}_{e.args[0]}"
+                error_message: str = e.args[1]
+                error_rate = e.args[2]
+            else:
+                error_code = f"{WORKER_ERROR_PREFIX}_500"
+                error_message = str(e)
+        else:
+            error_code = f"{WORKER_ERROR_PREFIX}_500"
+            error_message = str(e)
+
+        logger.error(
+            f'Error processing message from submission queue with error code {error_code} and message "{error_message}"'
+        )
+        logger.exception(e)
+
+        handle_error(
+            int(analysis_id),
+            int(submission_id),
+            FAILED,
+            error_code,
+            exception_type,
+            error_rate,
+        )
 
-    logger.info("Listening for messages...")
-    # infinite loop to listen and process messages
-    while not is_finished:
-        messages = queue.receive_messages(
-            MaxNumberOfMessages=1, VisibilityTimeout=43200
+    finally:
+        heartbeat.remove(message.message_id)
+        message.delete()
+        # Let the queue know that the message is processed
+        logger.info(
+            f'Deleted message from "valhub_submission_queue.fifo" with submission_id={submission_id} and analysis_id={analysis_id}'
         )
-        for message in messages:
-            logger.info(f"Received message: {message.body}")
 
-            json_message: dict[str, Any] = json.loads(message.body)
+    return user_id, analysis_id, submission_id
 
-            analysis_id_str: str | None = json_message.get("analysis_pk", None)
-            submission_id_str: str | None = json_message.get(
-                "submission_pk", None
-            )
-            user_id: str | None = json_message.get("user_pk", None)
-            submission_filename: str | None = json_message.get(
-                "submission_filename", None
-            )
 
-            python_version: str | None = json_message.get(
-                "python_version", None
-            )
+def group_messages_in_order(messages: list[Any]) -> list[list[Any]]:
+    """
+    Split a batch of messages by FIFO group, i.e. by user lane, keeping the
+    queue order within each group. SQS can return several messages of one
+    group in a single batch. They are all leased already, and making them
+    visible again would count as another receive towards the dead-letter
+    queue's maxReceiveCount, so each group is run in order instead.
+    """
 
-            if analysis_id_str is None:
-                logger.error("analysis_id is None")
-                raise ValueError("analysis_id is None")
-            if submission_id_str is None:
-                logger.error("submission_id is None")
-                raise ValueError("submission_id is None")
-
-            analysis_id = int(analysis_id_str)
-            submission_id = int(submission_id_str)
-
-            logger.info(f"update submission status to {RUNNING}")
-            update_submission_status(submission_id, RUNNING)
-
-            if (
-                not analysis_id
-                or not submission_id
-                or not user_id
-                or not submission_filename
-                or not python_version
-            ):
-                logger.error(
-                    f"Missing required fields in submission message: analysis_id={analysis_id}, submission_id={submission_id}, user_id={user_id}, submission_filename={submission_filename}"
-                )
-                logger.info(f"update submission status to {FAILED}")
-                update_submission_status(submission_id, FAILED)
-                raise ValueError(
-                    "Missing required fields in submission message"
-                )
+    groups: dict[str, list[Any]] = dict()
+    ungrouped: list[list[Any]] = []
+    for message in messages:
+        group_id: str | None = (message.attributes or {}).get("MessageGroupId")
+        if group_id is None:
+            ungrouped.append([message])
+            continue
+        groups.setdefault(group_id, []).append(message)
 
-            # start a thread to refresh the timeout
-            stop_event = threading.Event()
-            t = threading.Thread(
-                target=update_visibility_timeout,
-                args=(queue.url, message.receipt_handle, 43200, stop_event),
+    return list(groups.values()) + ungrouped
+
+
+def handle_submission_messages(
+    messages: list[Any], heartbeat: VisibilityHeartbeat
+):
+    """Evaluate the submissions of one FIFO group one after the other."""
+
+    for message in messages:
+        try:
+            handle_submission_message(message, heartbeat)
+        except Exception as e:
+            logger.error(
+                f"Error handling submission message {message.message_id}"
             )
-            t.start()
+            logger.exception(e)
 
-            try:
-                _, execution_time = process_submission_message(
-                    int(analysis_id),
-                    int(submission_id),
-                    int(user_id),
-                    python_version,
-                    submission_filename,
-                )
 
-                logger.info(
-                    f"Submission Worker took {execution_time:.3f} seconds to process submission_id={submission_id} and analysis_id={analysis_id}"
-                )
-            except (
-                WorkerException,
-                RunnerException,
-                SubmissionException,
-            ) as e:
-                exception_type = type(e).__name__
-                logger.error(
-                    f'Error processing message from submission queue with error code {e.code} and message "{e.message}"'
-                )
-                logger.info(f"update submission status to {FAILED}")
-                update_submission_status(submission_id, FAILED)
-                logger.exception(e)
-                handle_error(
-                    int(analysis_id),
-                    int(submission_id),
-                    FAILED,
-                    e.code,
-                    exception_type,
-                    e.error_rate,
-                )
-            except Exception as e:
-                exception_type = type(e).__name__
-                error_rate: float | None = None
-                if e.args:
-                    if len(e.args) == 2:
-                        error_code: str = f"{WORKER_ERROR_PREFIX}_{e.args[0]}"
-                        error_message: str = e.args[1]
-                    elif len(e.args) == 3:
-                        error_code: str = f"{WORKER_ERROR_PREFIX}_{e.args[0]}"
-                        error_message: str = e.args[1]
-                        error_rate = e.args[2]
-                    else:
-                        error_code = f"{WORKER_ERROR_PREFIX}_500"
-                        error_message = str(e)
-                else:
-                    error_code = f"{WORKER_ERROR_PREFIX}_500"
-                    error_message = str(e)
+@timing(verbose=True, logger=logger)
+def main():
+    logger.info(
+        f'Starting submission worker to process messages from "{SUBMISSION_QUEUE_NAME}"'
+    )
+    queue = get_or_create_sqs_queue(SUBMISSION_QUEUE_NAME)
+    if queue is None:
+        logger.error(
+            f'Could not retrieve or create SQS queue "{SUBMISSION_QUEUE_NAME}"'
+        )
+        raise WorkerException(
+            *get_error_by_code(1, worker_error_codes, logger)
+        )
+    logger.info(f'Retrieved queue "{SUBMISSION_QUEUE_NAME}"')
 
-                logger.error(
-                    f'Error processing message from submission queue with error code {error_code} and message "{error_message}"'
-                )
-                logger.exception(e)
+    # Build the shared submission base layers before taking any messages
+    try:
+        prebuild_base_docker_images(DOCKER_SRC_DIR, logger)
+    except Exception as e:
+        logger.error("Error prebuilding base docker images")
+        logger.exception(e)
+    # logger.info(f"SQS queue URL: {queue.url}")
 
-                handle_error(
-                    int(analysis_id),
-                    int(submission_id),
-                    FAILED,
-                    error_code,
-                    exception_type,
-                    error_rate,
-                )
+    # Nothing is in flight yet, so leftovers of earlier runs can go
+    create_current_evaluation_dir(CURRENT_EVALUATION_DIR)
+
+    # Importing the runner configures logging, which replaces the root
+    # handlers, so it is done before any submission attaches its log capture
+    get_runner_module()
+
+    global REPORT_QUEUE
+    report_renderer: PrivateReportRenderer | None = None
+    if RENDER_REPORTS_ASYNC:
+        REPORT_QUEUE = get_or_create_sqs_queue(REPORT_QUEUE_NAME)
+        report_renderer = PrivateReportRenderer(REPORT_QUEUE)
+        report_renderer.start()
+
+    heartbeat = VisibilityHeartbeat(queue.url, MESSAGE_VISIBILITY_TIMEOUT)
+    heartbeat.start()
+
+    def release_messages_and_exit(signum: int, _):
+        # A stopped task or reclaimed spot instance hands its submissions
+        # straight back to the queue, where another worker resumes them
+        # from their checkpoints. Exiting without unwinding keeps the
+        # messages from being deleted, so the submissions' containers and
+        # the Dask cluster are stopped here instead.
+        logger.warning(
+            f"Received signal {signum}, releasing in-flight messages"
+        )
+        try:
+            heartbeat.release_all(get_aws_sqs_client())
+        except Exception as e:
+            logger.error("Error releasing in-flight messages")
+            logger.exception(e)
 
-            finally:
-                message.delete()
-                # Let the queue know that the message is processed
-                logger.info(
-                    f'Deleted message from "valhub_submission_queue.fifo" with submission_id={submission_id} and analysis_id={analysis_id}'
+        with IN_FLIGHT_SUBMISSIONS_LOCK:
+            submission_ids = list(IN_FLIGHT_SUBMISSIONS)
+        for submission_id in submission_ids:
+            try:
+                kill_submission_containers(submission_id, logger)
+            except Exception as e:
+                logger.error(
+                    f"Error killing containers of submission {submission_id}"
                 )
-                stop_event.set()
-                t.join()
-
-            upload_logs_to_s3(user_id, analysis_id, submission_id)
+                logger.exception(e)
+        close_dask_client()
 
-            is_finished = True
-            break
+        logging.shutdown()
+        os._exit(128 + signum)
 
-        time.sleep(1)
+    signal.signal(signal.SIGTERM, release_messages_and_exit)
 
+    in_flight: set[Future[None]] = set()
+    number_of_messages = 0
 
-def upload_logs_to_s3(user_id, analysis_id, submission_id):
-    log_file = os.path.join(LOG_FILE_DIR, "submission.log")
-    error_log_file = os.path.join(LOG_FILE_DIR, "submission.error.log")
-    json_log_file = os.path.join(LOG_FILE_DIR, "submission.log.jsonl")
+    logger.info(
+        f"Listening for messages with up to {MAX_CONCURRENT_SUBMISSIONS} concurrent submissions..."
+    )
+    try:
+        with ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_SUBMISSIONS,
+            thread_name_prefix="submission",
+        ) as executor:
+            while True:
+                for future in [f for f in in_flight if f.done()]:
+                    in_flight.remove(future)
+                    if future.exception() is not None:
+                        logger.error("Error handling submission message")
+                        logger.exception(future.exception())
+
+                capacity = MAX_CONCURRENT_SUBMISSIONS - len(in_flight)
+                if MAX_SUBMISSIONS_PER_WORKER > 0:
+                    remaining = MAX_SUBMISSIONS_PER_WORKER - number_of_messages
+                    if remaining <= 0 and not in_flight:
+                        break
+                    capacity = min(capacity, remaining)
+
+                if capacity <= 0:
+                    wait(in_flight, return_when=FIRST_COMPLETED)
+                    continue
+
+                # Long poll for as many messages as there is room for
+                messages = queue.receive_messages(
+                    MaxNumberOfMessages=min(capacity, 10),
+                    VisibilityTimeout=MESSAGE_VISIBILITY_TIMEOUT,
+                    WaitTimeSeconds=SQS_WAIT_TIME_SECONDS,
+                    AttributeNames=["MessageGroupId"],
+                )
+                # Messages of a group wait their turn leased by the heartbeat
+                for message in messages:
+                    heartbeat.add(message.message_id, message.receipt_handle)
+                for group_messages in group_messages_in_order(messages):
+                    in_flight.add(
+                        executor.submit(
+                            handle_submission_messages,
+                            group_messages,
+                            heartbeat,
+                        )
+                    )
+                number_of_messages += len(messages)
+    finally:
+        heartbeat.stop()
+        if report_renderer is not None:
+            report_renderer.stop()
+
+
+def upload_logs_to_s3(user_id, analysis_id, submission_id, log_dir):
+    log_file = os.path.join(log_dir, "submission.log")
+    error_log_file = os.path.join(log_dir, "submission.error.log")
+    json_log_file = os.path.join(log_dir, "submission.log.jsonl")
 
     # push log files to s3
 
@@ -778,6 +1666,9 @@ if __name__ == "__main__":
         FILE_DIR, WORKER_ERROR_PREFIX, logger
     )
 
+    DATA_CACHE = LocalFileCache(DATA_CACHE_DIR, DATA_CACHE_GB, logger)
+    logger.info(f"DATA_CACHE_DIR: {DATA_CACHE_DIR}")
+
     _, execution_time = main()
     logger.info(
         f"Shutting down Submission Worker. Runtime: {execution_time:.3f} seconds."
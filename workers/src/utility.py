@@ -1,21 +1,33 @@
+import atexit
 from dataclasses import dataclass
+import fcntl
 from functools import wraps
+import hashlib
 import json
 import logging
 import shutil
 from types import TracebackType
-from dask.delayed import delayed, Delayed  # type: ignore
-from dask.distributed import Client
+from dask.distributed import (
+    Client,
+    Event,
+    LocalCluster,
+    as_completed,
+    get_task_stream,
+)
 from dask import config
 import docker
 from docker.models.containers import Container
-from docker.errors import ImageNotFound, BuildError
+from docker.errors import APIError, ImageNotFound, BuildError
 from docker.models.images import Image
+from docker.types import Ulimit
+from docker.utils.socket import frames_iter
 
 from concurrent.futures import (
     ThreadPoolExecutor,
+    as_completed as as_completed_futures,
 )
 from time import perf_counter
+import time
 import os
 from typing import (
     Any,
@@ -28,14 +40,23 @@ from typing import (
     cast,
 )
 import boto3
+import botocore.config
 import botocore.exceptions
 from mypy_boto3_s3 import S3Client
 from mypy_boto3_secretsmanager import SecretsManagerClient
 import psutil
 import requests
+import requests.adapters
 import math
+import queue
+import signal
 import subprocess
+import threading
 import pandas as pd
+import re
+import tempfile
+from urllib.parse import urlparse
+from urllib3.util.retry import Retry
 
 from logger import setup_logging
 
@@ -77,6 +98,74 @@ P = ParamSpec("P")
 
 FILE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+POOL_WATCHDOG_GRACE_PERIOD = 60  # seconds
+
+# Per-container memory limits are fitted to the peak usage measured on
+# the first files of a submission, with this much headroom
+SUBMISSION_MEMORY_HEADROOM = 1.5
+MIN_SUBMISSION_MEMORY_GB = 1
+SUBMISSION_OOM_RETRIES = 2
+
+# Submission error codes of files stopped by their wall-clock or CPU time
+# limit, and the exit code of a process stopped by its CPU time limit
+FILE_TIMEOUT_ERROR_CODE = 2
+FILE_CPU_TIME_ERROR_CODE = 3
+CPU_TIME_EXCEEDED_EXIT_CODE = 128 + signal.SIGXCPU
+# Seconds past the CPU time limit before the process is killed outright
+CPU_TIME_HARD_LIMIT_MARGIN = 10
+
+BASE_IMAGE_REPOSITORY = "submission-base"
+SUBMISSION_IMAGE_REPOSITORY = "submission"
+IMAGE_CACHE_LABEL = "org.pv-validation-hub.image"
+# Submission ID of the container, so a stopped evaluation can kill them
+SUBMISSION_CONTAINER_LABEL = "org.pv-validation-hub.submission"
+BASE_IMAGE_FILES = ["Dockerfile.base", "requirements.txt"]
+SUBMISSION_IMAGE_FILES = ["Dockerfile", "submission_wrapper.py"]
+SUBMISSION_IMAGE_CACHE_GB = float(
+    os.environ.get("SUBMISSION_IMAGE_CACHE_GB", "50")
+)
+IMAGE_CACHE_INDEX_FILE = os.environ.get(
+    "SUBMISSION_IMAGE_CACHE_INDEX",
+    os.path.join(FILE_DIR, "..", "image_cache_index.json"),
+)
+IMAGE_CACHE_LOCK = threading.Lock()
+
+COLUMNAR_FILE_EXTENSION = ".parquet"
+
+# Written by the runner into the results directory once an evaluation ends
+EVALUATION_SUMMARY_FILE = "evaluation_summary.json"
+# Per-file results of an evaluation with the hash of each file they were
+# computed on, so a re-evaluation only runs new or changed files
+EVALUATED_FILES_MANIFEST = "evaluated_files.json"
+# Per-file results posted to the API, kept so reused results post them too
+SUBMISSION_FILE_RESULTS_FILE = "submission_file_results.json"
+
+S3_MAX_CONCURRENCY = int(os.environ.get("S3_MAX_CONCURRENCY", "16"))
+S3_TRANSFER_RETRIES = 3
+S3_THROTTLING_ERROR_CODES = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "RequestTimeout",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+    "InternalError",
+}
+S3_CLIENT: S3Client | None = None
+S3_EMULATOR_SESSION: requests.Session | None = None
+S3_CLIENT_LOCK = threading.Lock()
+
+DASK_ADAPTIVE_SCALING = (
+    os.environ.get("DASK_ADAPTIVE_SCALING", "false").lower() == "true"
+)
+DASK_ADAPTIVE_MINIMUM = int(os.environ.get("DASK_ADAPTIVE_MINIMUM", "1"))
+DASK_CLIENT: Client | None = None
+DASK_CLUSTER_SIZING: tuple[int, int] | None = None
+DASK_CLIENT_USERS = 0
+DASK_CLIENT_LOCK = threading.RLock()
+# Stop event names of the evaluations stopped in this process
+STOPPED_SUBMISSION_TASKS: set[str] = set()
+
 
 @dataclass(frozen=True)
 class SubmissionFunctionArgs:
@@ -209,7 +298,10 @@ def timeout(seconds: int, logger: Union[logging.Logger, None] = None):
     def decorator(func: Callable[P, T]):
         # @wraps(func)
         def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-            with ThreadPoolExecutor(max_workers=1) as executor:
+            with ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=threading.current_thread().name,
+            ) as executor:
                 future = executor.submit(func, *args, **kwargs)
                 try:
                     return future.result(timeout=seconds)
@@ -361,71 +453,320 @@ def set_workers_and_threads(
 U = TypeVar("U")
 
 
-def dask_multiprocess(
-    func: Callable[P, T],
-    function_args_list: list[tuple[U, ...]],
+class MemoryBudget:
+    """
+    Memory that the submission containers running on this machine may
+    reserve together, shared by every submission the worker evaluates.
+    A reservation larger than the whole budget is granted once nothing else
+    is reserved, so such a file runs alone rather than never.
+    """
+
+    def __init__(self, total_gb: float):
+        self.total_gb = total_gb
+        self.reserved_gb = 0.0
+        self.condition = threading.Condition()
+
+    def fits(self, memory_gb: float) -> bool:
+        return (
+            self.reserved_gb == 0
+            or self.reserved_gb + memory_gb <= self.total_gb
+        )
+
+    def try_acquire(self, memory_gb: float) -> bool:
+        with self.condition:
+            if not self.fits(memory_gb):
+                return False
+            self.reserved_gb += memory_gb
+            return True
+
+    def acquire(self, memory_gb: float):
+        with self.condition:
+            self.condition.wait_for(lambda: self.fits(memory_gb))
+            self.reserved_gb += memory_gb
+
+    def release(self, memory_gb: float):
+        with self.condition:
+            self.reserved_gb = max(0.0, self.reserved_gb - memory_gb)
+            self.condition.notify_all()
+
+
+SUBMISSION_MEMORY_BUDGET = MemoryBudget(
+    psutil.virtual_memory().total / (1024.0**3)
+)
+
+
+def get_dask_client(
     n_workers: int | None = None,
     threads_per_worker: int | None = None,
-    memory_per_run: float | int | None = None,
     logger: logging.Logger | None = None,
     **kwargs: Any,
-) -> list[T]:
-
-    MEMORY_PER_RUN = 8.0  # in GB
-
-    memory_per_run = memory_per_run or MEMORY_PER_RUN
+) -> Client:
+    """
+    Return the worker's long-lived Dask client, creating its local cluster
+    on first use. The cluster is sized by the machine's CPUs only and is
+    reused by every phase of every submission. It is only recreated if it
+    has died, or if a caller asks for another number of workers or threads
+    while no other submission is using it.
+
+    The memory of the submission containers does not size the cluster. It
+    is enforced by each container's memory limit, and `dask_multiprocess`
+    holds files back until their limit fits in `SUBMISSION_MEMORY_BUDGET`.
+    """
+    global DASK_CLIENT, DASK_CLUSTER_SIZING
 
     cpu_count = os.cpu_count()
 
     sys_memory = psutil.virtual_memory().total / (1024.0**3)  # in GB
 
-    # config.set({"distributed.worker.memory.spill": True})
-    config.set({"distributed.worker.memory.pause": True})
-    config.set({"distributed.worker.memory.target": 0.95})
-    config.set({"distributed.worker.memory.terminate": False})
-
     total_workers, total_threads = set_workers_and_threads(
         cpu_count,
         sys_memory,
-        memory_per_run,
+        MIN_SUBMISSION_MEMORY_GB,
         n_workers,
         threads_per_worker,
         logger,
     )
 
-    memory_per_worker = memory_per_run * total_threads
-
-    logger_if_able(f"cpu count: {cpu_count}", logger, "INFO")
-    logger_if_able(f"memory: {sys_memory}", logger, "INFO")
-    logger_if_able(f"memory per run: {memory_per_run}", logger, "INFO")
-    logger_if_able(f"n_workers: {total_workers}", logger, "INFO")
-    logger_if_able(f"threads_per_worker: {total_threads}", logger, "INFO")
-    logger_if_able(f"memory per worker: {memory_per_worker}", logger, "INFO")
+    # The workers only wait on containers, they share the machine's memory
+    memory_per_worker = sys_memory / total_workers
 
-    results: list[T] = []
+    sizing = (total_workers, total_threads)
 
-    with Client(
-        n_workers=total_workers,
-        threads_per_worker=total_threads,
-        memory_limit=f"{memory_per_worker}GiB",
-        **kwargs,
-    ) as client:
+    with DASK_CLIENT_LOCK:
+        if (
+            DASK_CLIENT is not None
+            and (DASK_CLUSTER_SIZING == sizing or DASK_CLIENT_USERS > 0)
+            and DASK_CLIENT.status == "running"
+        ):
+            return DASK_CLIENT
 
-        logger_if_able(f"client: {client}", logger, "INFO")
+        if DASK_CLIENT is not None:
+            logger_if_able(
+                "Dask cluster size changed or cluster is down, recreating",
+                logger,
+                "INFO",
+            )
+            close_dask_client()
 
-        lazy_results: list[Delayed] = []
-        for args in function_args_list:
-            submission_fn_args = args
-            logger_if_able(f"args: {submission_fn_args}", logger, "INFO")
+        logger_if_able(f"cpu count: {cpu_count}", logger, "INFO")
+        logger_if_able(f"memory: {sys_memory}", logger, "INFO")
+        logger_if_able(f"n_workers: {total_workers}", logger, "INFO")
+        logger_if_able(f"threads_per_worker: {total_threads}", logger, "INFO")
+        logger_if_able(
+            f"memory per worker: {memory_per_worker}", logger, "INFO"
+        )
 
-            lazy_result = cast(
-                Delayed, delayed(func, pure=True)(*submission_fn_args)
+        # config.set({"distributed.worker.memory.spill": True})
+        config.set({"distributed.worker.memory.pause": True})
+        config.set({"distributed.worker.memory.target": 0.95})
+        config.set({"distributed.worker.memory.terminate": False})
+
+        cluster = LocalCluster(
+            n_workers=(
+                min(DASK_ADAPTIVE_MINIMUM, total_workers)
+                if DASK_ADAPTIVE_SCALING
+                else total_workers
+            ),
+            threads_per_worker=total_threads,
+            memory_limit=f"{memory_per_worker:.2f}GiB",
+            **kwargs,
+        )
+        if DASK_ADAPTIVE_SCALING:
+            cluster.adapt(
+                minimum=min(DASK_ADAPTIVE_MINIMUM, total_workers),
+                maximum=total_workers,
             )
-            lazy_results.append(lazy_result)
 
-        futures = client.compute(lazy_results)  # type: ignore
+        DASK_CLIENT = Client(cluster)
+        DASK_CLUSTER_SIZING = sizing
+
+        logger_if_able(f"client: {DASK_CLIENT}", logger, "INFO")
+        logger_if_able(
+            f"dashboard: {DASK_CLIENT.dashboard_link}", logger, "INFO"
+        )
+
+        return DASK_CLIENT
+
+
+def close_dask_client():
+    global DASK_CLIENT, DASK_CLUSTER_SIZING
+
+    if DASK_CLIENT is None:
+        return
+
+    cluster = DASK_CLIENT.cluster
+    try:
+        DASK_CLIENT.close()
+        if cluster is not None:
+            cluster.close()
+    except Exception as e:
+        logger_if_able(f"Error closing Dask cluster: {e}", None, "WARNING")
+    finally:
+        DASK_CLIENT = None
+        DASK_CLUSTER_SIZING = None
+
+
+atexit.register(close_dask_client)
+
+
+def log_task_stream_summary(
+    task_stream: list[dict[str, Any]],
+    logger: logging.Logger | None = None,
+):
+    """
+    Log the figures shown by the dashboard's task stream: how many tasks
+    ran, how long they computed for and how busy the workers were.
+    """
+
+    compute_periods = [
+        (startstop["start"], startstop["stop"])
+        for task in task_stream
+        for startstop in task.get("startstops", [])
+        if startstop["action"] == "compute"
+    ]
+    if not compute_periods:
+        return
+
+    compute_times = [stop - start for start, stop in compute_periods]
+    wall_time = max(stop for _, stop in compute_periods) - min(
+        start for start, _ in compute_periods
+    )
+    workers = {task["worker"] for task in task_stream if "worker" in task}
+    erred = sum(1 for task in task_stream if task.get("status") == "error")
+
+    total_compute_time = sum(compute_times)
+    utilization = (
+        total_compute_time / (wall_time * len(workers))
+        if wall_time > 0 and workers
+        else 1.0
+    )
+
+    logger_if_able(
+        f"Task stream: {len(task_stream)} tasks ({erred} erred) on "
+        f"{len(workers)} workers in {wall_time:.1f}s, "
+        f"compute total {total_compute_time:.1f}s, "
+        f"mean {total_compute_time / len(compute_times):.1f}s, "
+        f"max {max(compute_times):.1f}s, "
+        f"worker utilization {utilization:.0%}",
+        logger,
+        "INFO",
+    )
+
 
-        results = client.gather(futures)  # type: ignore
+def dask_multiprocess(
+    func: Callable[P, T],
+    function_args_list: list[tuple[U, ...]],
+    n_workers: int | None = None,
+    threads_per_worker: int | None = None,
+    memory_per_run: float | int | None = None,
+    logger: logging.Logger | None = None,
+    on_result: Callable[[tuple[U, ...], T], None] | None = None,
+    retry: (
+        Callable[[tuple[U, ...], T, int], tuple[tuple[U, ...], float] | None]
+        | None
+    ) = None,
+    **kwargs: Any,
+) -> list[T]:
+    """
+    Run `func` over every argument tuple on the worker's shared Dask cluster
+    and return the results in the order of `function_args_list`.
+
+    With `memory_per_run` (in GB) every task reserves that much of
+    `SUBMISSION_MEMORY_BUDGET` until it finishes, and is only submitted to
+    the cluster once its reservation fits. The tasks of all submissions on
+    this worker therefore stay within the machine's memory however the
+    cluster is sized.
+
+    If `retry` is given it is called in this process with each finished
+    task's argument tuple, result and number of earlier retries. When it
+    returns new arguments and the memory (in GB) they need, the task is run
+    again with them once that memory fits in the budget, ahead of the tasks
+    not yet submitted, and only the result of its last run is kept.
+
+    If `on_result` is given it is called in this process with each argument
+    tuple and its result as soon as that task finishes, while the remaining
+    tasks keep running. If it raises, the tasks that have not finished are
+    cancelled and the ones not yet submitted are dropped.
+    """
+
+    global DASK_CLIENT_USERS
+
+    memory_gb = float(memory_per_run) if memory_per_run else 0.0
+
+    with DASK_CLIENT_LOCK:
+        client = get_dask_client(
+            n_workers, threads_per_worker, logger, **kwargs
+        )
+        DASK_CLIENT_USERS += 1
+
+    # Index, arguments and memory of the tasks still to submit, last first
+    pending = [
+        (index, args, memory_gb)
+        for index, args in enumerate(function_args_list)
+    ]
+    pending.reverse()
+    results: list[Any] = [None] * len(function_args_list)
+    retries = [0] * len(function_args_list)
+    futures: list[Any] = []
+    future_tasks: dict[str, tuple[int, tuple[U, ...]]] = {}
+    completed = as_completed(with_results=True)
+
+    def submit():
+        index, args, task_memory_gb = pending.pop()
+
+        def release(_: Any):
+            SUBMISSION_MEMORY_BUDGET.release(task_memory_gb)
+
+        logger_if_able(f"args: {args}", logger, "INFO")
+        try:
+            future = client.submit(func, *args, pure=True)
+        except BaseException:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        future_tasks[future.key] = (index, args)
+        futures.append(future)
+        completed.add(future)
+
+    try:
+        with get_task_stream(client=client) as task_stream:
+            try:
+                while pending or completed.count():
+                    while pending and SUBMISSION_MEMORY_BUDGET.try_acquire(
+                        pending[-1][2]
+                    ):
+                        submit()
+
+                    if not completed.count():
+                        # The budget is held by other submissions' files
+                        SUBMISSION_MEMORY_BUDGET.acquire(pending[-1][2])
+                        submit()
+                        continue
+
+                    future, result = next(completed)  # type: ignore
+                    index, args = future_tasks[future.key]
+
+                    retried = (
+                        retry(args, result, retries[index])
+                        if retry is not None
+                        else None
+                    )
+                    if retried is not None:
+                        retries[index] += 1
+                        pending.append((index, *retried))
+                        continue
+
+                    results[index] = result
+                    if on_result is not None:
+                        on_result(args, result)
+            except BaseException:
+                client.cancel(futures)  # type: ignore
+                raise
+    finally:
+        with DASK_CLIENT_LOCK:
+            DASK_CLIENT_USERS -= 1
+
+    log_task_stream_summary(task_stream.data, logger)
 
     return results
 
@@ -457,7 +798,13 @@ class SubmissionException(Exception):
         self.error_rate = error_rate
 
 
-def list_s3_bucket(s3_dir: str):
+class S3Object(TypedDict):
+    Key: str
+    ETag: str | None
+    Size: int | None
+
+
+def list_s3_bucket_objects(s3_dir: str) -> list[S3Object]:
     logger.info(f"list s3 bucket {s3_dir}")
     if s3_dir.startswith("/"):
         s3_dir = s3_dir[1:]
@@ -468,18 +815,24 @@ def list_s3_bucket(s3_dir: str):
     else:
         s3_dir_full_path = "s3://" + s3_dir
 
-    all_files: list[str] = []
+    all_files: list[S3Object] = []
     if IS_LOCAL:
-        r = requests.get(s3_dir_full_path)
+        r = get_s3_emulator_session().get(s3_dir_full_path)
         ret = r.json()
         for entry in ret["Contents"]:
-            all_files.append(os.path.join(s3_dir.split("/")[0], entry["Key"]))
+            all_files.append(
+                {
+                    "Key": os.path.join(s3_dir.split("/")[0], entry["Key"]),
+                    "ETag": entry.get("ETag"),
+                    "Size": entry.get("Size"),
+                }
+            )
     else:
         # if so, remove it
         s3_dir = s3_dir.replace(f"{S3_BUCKET_NAME}/", "")
         logger.info(f"dir after removing {S3_BUCKET_NAME}/ returns {s3_dir}")
 
-        s3: S3Client = boto3.client("s3")  # type: ignore
+        s3 = get_s3_client()
         paginator = s3.get_paginator("list_objects_v2")
         pages = paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=s3_dir)
         for page in pages:
@@ -487,16 +840,28 @@ def list_s3_bucket(s3_dir: str):
                 if "Contents" in page:
                     for entry in page["Contents"]:
                         if "Key" in entry:
-                            all_files.append(entry["Key"])
+                            all_files.append(
+                                {
+                                    "Key": entry["Key"],
+                                    "ETag": entry.get("ETag"),
+                                    "Size": entry.get("Size"),
+                                }
+                            )
 
         # remove the first entry if it is the same as s3_dir
-        if len(all_files) > 0 and all_files[0] == s3_dir:
+        if len(all_files) > 0 and all_files[0]["Key"] == s3_dir:
             all_files.pop(0)
 
-    logger.info(f"listed s3 bucket {s3_dir_full_path} returns {all_files}")
+    logger.info(
+        f"listed s3 bucket {s3_dir_full_path} returns {[file['Key'] for file in all_files]}"
+    )
     return all_files
 
 
+def list_s3_bucket(s3_dir: str):
+    return [s3_object["Key"] for s3_object in list_s3_bucket_objects(s3_dir)]
+
+
 def update_submission_status(submission_id: int, new_status: str):
     # route needs to be a string stored in a variable, cannot parse in deployed environment
     api_route = f"submissions/change_submission_status/{submission_id}"
@@ -515,8 +880,41 @@ def update_submission_status(submission_id: int, new_status: str):
         )
 
 
-def push_to_s3(local_file_path: str, s3_file_path: str, submission_id: int):
-    logger.info(f"push file {local_file_path} to s3")
+def get_s3_client() -> S3Client:
+    """
+    Shared S3 client with a connection pool sized for bulk transfers.
+    boto3 clients are thread safe so one client serves every thread.
+    """
+    global S3_CLIENT
+
+    with S3_CLIENT_LOCK:
+        if S3_CLIENT is None:
+            S3_CLIENT = boto3.client(
+                "s3",
+                config=botocore.config.Config(
+                    max_pool_connections=S3_MAX_CONCURRENCY,
+                    retries={"max_attempts": 5, "mode": "adaptive"},
+                ),
+            )  # type: ignore
+    return cast(S3Client, S3_CLIENT)
+
+
+def get_s3_emulator_session() -> requests.Session:
+    global S3_EMULATOR_SESSION
+
+    with S3_CLIENT_LOCK:
+        if S3_EMULATOR_SESSION is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=S3_MAX_CONCURRENCY,
+                pool_maxsize=S3_MAX_CONCURRENCY,
+            )
+            session.mount("http://", adapter)
+            S3_EMULATOR_SESSION = session
+    return S3_EMULATOR_SESSION
+
+
+def upload_file_to_s3(local_file_path: str, s3_file_path: str):
     if s3_file_path.startswith("/"):
         s3_file_path = s3_file_path[1:]
 
@@ -524,45 +922,55 @@ def push_to_s3(local_file_path: str, s3_file_path: str, submission_id: int):
         s3_file_full_path = (
             f"http://s3:5000/put_object/{S3_BUCKET_NAME}/" + s3_file_path
         )
-    else:
-        s3_file_full_path = "s3://" + s3_file_path
-
-    if IS_LOCAL:
         with open(local_file_path, "rb") as f:
             file_content = f.read()
             logger.info(
                 f"Sending emulator PUT request to {s3_file_full_path} with file content (100 chars): {file_content[:100]}"
             )
-            r = requests.put(s3_file_full_path, data=file_content)
+            r = get_s3_emulator_session().put(
+                s3_file_full_path, data=file_content
+            )
             logger.info(f"Received S3 emulator response: {r.status_code}")
             if not r.ok:
                 logger.error(f"S3 emulator error: {r.content}")
-                error_code = 1
-                raise WorkerException(
-                    *get_error_by_code(error_code, worker_error_codes, logger),
+                raise requests.HTTPError(
+                    1, f"Error uploading file to s3: {r.content}", response=r
                 )
-            return {"status": "success"}
     else:
-        s3: S3Client = boto3.client("s3")  # type: ignore
-        try:
-            extra_args = {}
-            if s3_file_path.endswith(".html"):
-                extra_args = {"ContentType": "text/html"}
-            ExtraArgs = extra_args if extra_args else None
-            s3.upload_file(
-                local_file_path,
-                S3_BUCKET_NAME,
-                s3_file_path,
-                ExtraArgs=ExtraArgs,
-            )
-        except botocore.exceptions.ClientError as e:
-            logger.error(f"Error: {e}")
-            logger.info(f"update submission status to {FAILED}")
-            update_submission_status(submission_id, FAILED)
-            error_code = 1
-            raise WorkerException(
-                *get_error_by_code(error_code, worker_error_codes, logger)
-            )
+        extra_args = {}
+        if s3_file_path.endswith(".html"):
+            extra_args = {"ContentType": "text/html"}
+        ExtraArgs = extra_args if extra_args else None
+        get_s3_client().upload_file(
+            local_file_path,
+            S3_BUCKET_NAME,
+            s3_file_path,
+            ExtraArgs=ExtraArgs,
+        )
+
+
+def push_to_s3(local_file_path: str, s3_file_path: str, submission_id: int):
+    logger.info(f"push file {local_file_path} to s3")
+
+    try:
+        upload_file_to_s3(local_file_path, s3_file_path)
+    except requests.HTTPError as e:
+        logger.error(f"Error: {e}")
+        error_code = 1
+        raise WorkerException(
+            *get_error_by_code(error_code, worker_error_codes, logger),
+        )
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Error: {e}")
+        logger.info(f"update submission status to {FAILED}")
+        update_submission_status(submission_id, FAILED)
+        error_code = 1
+        raise WorkerException(
+            *get_error_by_code(error_code, worker_error_codes, logger)
+        )
+
+    if IS_LOCAL:
+        return {"status": "success"}
 
 
 def pull_from_s3(
@@ -589,17 +997,18 @@ def pull_from_s3(
     )
 
     if IS_LOCAL:
-        r = requests.get(s3_file_full_path, stream=True)
+        r = get_s3_emulator_session().get(s3_file_full_path, stream=True)
         if not r.ok:
             logger.error(f"Error: {r.content}")
 
             raise requests.HTTPError(
-                2, f"Error downloading file from s3: {r.content}"
+                2, f"Error downloading file from s3: {r.content}", response=r
             )
         with open(target_file_path, "wb") as f:
-            f.write(r.content)
+            for chunk in r.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
     else:
-        s3: S3Client = boto3.client("s3")  # type: ignore
+        s3 = get_s3_client()
 
         # if so, remove it
         s3_file_path = s3_file_path.replace(f"{S3_BUCKET_NAME}/", "")
@@ -617,11 +1026,354 @@ def pull_from_s3(
             logger.error(f"Error: {e}")
             raise requests.HTTPError(
                 2, f"File {target_file_path} not found in s3 bucket."
-            )
+            ) from e
 
     return target_file_path
 
 
+def is_retryable_transfer_error(error: BaseException) -> bool:
+    """
+    Whether a failed transfer may succeed when tried again: throttling,
+    server errors and connection errors. Missing objects and denied access
+    are final, as are errors without a known cause.
+    """
+    seen: set[int] = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+
+        if isinstance(current, botocore.exceptions.ClientError):
+            error_code = current.response.get("Error", {}).get("Code", "")
+            status_code = current.response.get("ResponseMetadata", {}).get(
+                "HTTPStatusCode", 0
+            )
+            return (
+                error_code in S3_THROTTLING_ERROR_CODES
+                or status_code == 429
+                or status_code >= 500
+            )
+        if isinstance(current, requests.HTTPError):
+            if current.response is not None:
+                status_code = current.response.status_code
+                return status_code == 429 or status_code >= 500
+        elif isinstance(
+            current,
+            (
+                requests.ConnectionError,
+                requests.Timeout,
+                botocore.exceptions.ConnectionError,
+                botocore.exceptions.HTTPClientError,
+                ConnectionError,
+                TimeoutError,
+            ),
+        ):
+            return True
+
+        current = current.__cause__ or current.__context__
+    return False
+
+
+def retry_with_backoff(
+    func: Callable[[], T],
+    retries: int = S3_TRANSFER_RETRIES,
+    backoff: float = 1.0,
+    logger: logging.Logger | None = None,
+) -> T:
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries or not is_retryable_transfer_error(e):
+                raise e
+            delay = backoff * 2**attempt
+            logger_if_able(
+                f"Attempt {attempt + 1} failed with {e}, retrying in {delay}s",
+                logger,
+                "WARNING",
+            )
+            time.sleep(delay)
+    raise Exception("Unreachable")
+
+
+def run_s3_transfers(
+    transfer: Callable[[str, str], Any],
+    manifest: list[tuple[str, str]],
+    get_file_size: Callable[[str, str], int],
+    description: str,
+    max_workers: int = S3_MAX_CONCURRENCY,
+    logger: logging.Logger | None = None,
+) -> list[Any]:
+    if not manifest:
+        return []
+
+    start_time = perf_counter()
+
+    def run_transfer(source: str, destination: str):
+        result = retry_with_backoff(
+            lambda: transfer(source, destination), logger=logger
+        )
+        return result, get_file_size(source, destination)
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix=threading.current_thread().name,
+    ) as executor:
+        futures = [
+            executor.submit(run_transfer, source, destination)
+            for source, destination in manifest
+        ]
+
+    results: list[Any] = []
+    total_bytes = 0
+    errors: list[Exception] = []
+    for future in futures:
+        try:
+            result, file_size = future.result()
+            results.append(result)
+            total_bytes += file_size
+        except Exception as e:
+            errors.append(e)
+
+    elapsed_time = perf_counter() - start_time
+    throughput = total_bytes / 1024**2 / elapsed_time if elapsed_time else 0
+
+    logger_if_able(
+        f"{description} {len(manifest) - len(errors)}/{len(manifest)} files, "
+        f"{total_bytes / 1024**2:.1f} MB in {elapsed_time:.2f}s "
+        f"({throughput:.1f} MB/s)",
+        logger,
+    )
+
+    if errors:
+        raise errors[0]
+
+    return results
+
+
+def bulk_pull_from_s3(
+    manifest: list[tuple[str, str]],
+    max_workers: int = S3_MAX_CONCURRENCY,
+    logger: logging.Logger | None = None,
+) -> list[str]:
+    """
+    Download every `(s3_file_path, local_dir)` pair in the manifest in
+    parallel and return the local file paths in manifest order.
+    """
+
+    def pull(s3_file_path: str, local_dir: str) -> str:
+        return pull_from_s3(
+            IS_LOCAL, S3_BUCKET_NAME, s3_file_path, local_dir, logger  # type: ignore
+        )
+
+    def downloaded_file_size(s3_file_path: str, local_dir: str) -> int:
+        return os.path.getsize(
+            os.path.join(local_dir, s3_file_path.split("/")[-1])
+        )
+
+    return run_s3_transfers(
+        pull,
+        manifest,
+        downloaded_file_size,
+        "Downloaded",
+        max_workers,
+        logger,
+    )
+
+
+def bulk_push_to_s3(
+    manifest: list[tuple[str, str]],
+    submission_id: int,
+    max_workers: int = S3_MAX_CONCURRENCY,
+    logger: logging.Logger | None = None,
+):
+    """
+    Upload every `(local_file_path, s3_file_path)` pair in the manifest
+    in parallel.
+    """
+
+    try:
+        run_s3_transfers(
+            upload_file_to_s3,
+            manifest,
+            lambda local_file_path, _: os.path.getsize(local_file_path),
+            "Uploaded",
+            max_workers,
+            logger,
+        )
+    except requests.HTTPError as e:
+        logger_if_able(f"Error: {e}", logger, "ERROR")
+        error_code = 1
+        raise WorkerException(
+            *get_error_by_code(error_code, worker_error_codes, logger),
+        )
+    except botocore.exceptions.ClientError as e:
+        logger_if_able(f"Error: {e}", logger, "ERROR")
+        logger_if_able(f"update submission status to {FAILED}", logger)
+        update_submission_status(submission_id, FAILED)
+        error_code = 1
+        raise WorkerException(
+            *get_error_by_code(error_code, worker_error_codes, logger)
+        )
+
+
+def link_or_copy_file(src_path: str, dest_path: str):
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(src_path, dest_path)
+    except OSError:
+        # Hard links cannot cross file systems or bind mounts
+        shutil.copy2(src_path, dest_path)
+
+
+class LocalFileCache:
+    """
+    Content-addressed on-disk cache for analysis files shared by every
+    submission a worker evaluates. Entries are hard-linked into the
+    evaluation directory and evicted least recently used first once the
+    cache grows past `max_size` GB.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size: float,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size * 1024**3
+        self.logger = logger
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_from_cache = 0
+        self.bytes_downloaded = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.size_bytes = sum(
+            os.path.getsize(path) for path in self.cached_file_paths()
+        )
+
+    @staticmethod
+    def make_key(file_hash: str | None, etag: str | None) -> str | None:
+        if not etag:
+            return None
+        key_parts = [file_hash or "", etag.strip('"')]
+        return hashlib.sha256(":".join(key_parts).encode()).hexdigest()
+
+    def cached_file_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def cached_file_paths(self) -> list[str]:
+        return [
+            os.path.join(root, file)
+            for root, _, files in os.walk(self.cache_dir)
+            for file in files
+        ]
+
+    def get(self, key: str | None, dest_path: str) -> bool:
+        """Link the cached file to `dest_path`, returning False on a miss."""
+
+        if key is None:
+            self.misses += 1
+            return False
+
+        cached_file_path = self.cached_file_path(key)
+
+        with self.lock:
+            if not os.path.exists(cached_file_path):
+                self.misses += 1
+                return False
+
+            link_or_copy_file(cached_file_path, dest_path)
+            # Modification time doubles as the last used time for eviction
+            os.utime(cached_file_path)
+
+            self.hits += 1
+            self.bytes_from_cache += os.path.getsize(cached_file_path)
+
+        return True
+
+    def put(self, key: str | None, src_path: str):
+        file_size = os.path.getsize(src_path)
+        self.bytes_downloaded += file_size
+
+        if key is None:
+            return
+
+        cached_file_path = self.cached_file_path(key)
+
+        with self.lock:
+            if os.path.exists(cached_file_path):
+                return
+
+            os.makedirs(os.path.dirname(cached_file_path), exist_ok=True)
+            link_or_copy_file(src_path, cached_file_path)
+            self.size_bytes += file_size
+
+            self.evict()
+
+    def evict(self):
+        if self.size_bytes <= self.max_size_bytes:
+            return
+
+        cached_files = sorted(
+            self.cached_file_paths(), key=lambda path: os.path.getmtime(path)
+        )
+
+        for cached_file_path in cached_files:
+            if self.size_bytes <= self.max_size_bytes:
+                break
+            file_size = os.path.getsize(cached_file_path)
+            os.remove(cached_file_path)
+            self.size_bytes -= file_size
+            logger_if_able(
+                f"Evicted {cached_file_path} from data cache", self.logger
+            )
+
+    def log_metrics(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        logger_if_able(
+            f"Data cache hits: {self.hits}, misses: {self.misses}, "
+            f"hit rate: {hit_rate:.1%}, "
+            f"served from cache: {self.bytes_from_cache / 1024**2:.1f} MB, "
+            f"downloaded: {self.bytes_downloaded / 1024**2:.1f} MB, "
+            f"cache size: {self.size_bytes / 1024**3:.2f} GB",
+            self.logger,
+        )
+
+
+def get_columnar_file_name(file_name: str) -> str:
+    return f"{os.path.splitext(file_name)[0]}{COLUMNAR_FILE_EXTENSION}"
+
+
+def read_time_series_file(file_path: str) -> pd.DataFrame:
+    """
+    Read a time series, preferring the memory-mapped Parquet copy written
+    at ingestion and falling back to the CSV.
+    """
+    columnar_file_path = os.path.join(
+        os.path.dirname(file_path),
+        get_columnar_file_name(os.path.basename(file_path)),
+    )
+
+    if os.path.exists(columnar_file_path):
+        try:
+            return pd.read_parquet(
+                columnar_file_path, engine="pyarrow", memory_map=True
+            )
+        except ImportError:
+            logger.warning("pyarrow not installed, falling back to CSV")
+
+    return pd.read_csv(
+        file_path,
+        index_col=0,
+        parse_dates=True,
+    )
+
+
 def get_error_by_code(
     error_code: int,
     error_codes_dict: dict[str, str],
@@ -698,28 +1450,141 @@ API_BASE_URL = (
 
 S3_BASE_URL = "http://s3:5000/get_object/" if IS_LOCAL else "s3://"
 
+API_MAX_CONNECTIONS = int(os.environ.get("API_MAX_CONNECTIONS", "16"))
+API_MAX_RETRIES = 3
+API_REQUEST_TIMEOUT = (10, 300)  # connect and read timeouts in seconds
+# Auth token shared by all processes of a worker, so only one logs in
+API_TOKEN_CACHE_FILE = os.environ.get(
+    "API_TOKEN_CACHE_FILE",
+    os.path.join(tempfile.gettempdir(), "valhub_api_token.json"),
+)
+API_SESSION: requests.Session | None = None
+API_SESSION_PID: int | None = None
+API_AUTH_TOKEN: str | None = None
+API_CLIENT_LOCK = threading.Lock()
 
-def method_request(
-    method: str,
-    url: str,
-    data: dict[str, Any] | None = None,
-    headers: dict[str, Any] | None = None,
-    logger: logging.Logger | None = None,
-):
-
-    logger_if_able(f"{method} request to {url}", logger)
 
-    base_headers = {
-        "Content-Type": "application/json",
-    }
+class APIAuthenticationError(Exception):
+    pass
 
-    all_headers: dict[str, str] = (
-        {**base_headers, **headers} if headers else base_headers
-    )
 
-    body = json.dumps(data) if data else None
+def get_api_session() -> requests.Session:
+    """
+    Keep-alive session shared by all API requests of this process.
+    Connection errors are retried for every method, error statuses only for
+    idempotent methods, so a POST is never applied twice.
+    """
+    global API_SESSION, API_SESSION_PID
+
+    with API_CLIENT_LOCK:
+        # Pooled connections cannot be shared with a forked process
+        if API_SESSION is None or API_SESSION_PID != os.getpid():
+            session = requests.Session()
+            retry = Retry(
+                total=API_MAX_RETRIES,
+                read=0,
+                status_forcelist=(502, 503, 504),
+                backoff_factor=0.5,
+                raise_on_status=False,
+            )
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=API_MAX_CONNECTIONS,
+                pool_maxsize=API_MAX_CONNECTIONS,
+                max_retries=retry,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            API_SESSION = session
+            API_SESSION_PID = os.getpid()
+    return API_SESSION
+
+
+@dataclass
+class EndpointLatency:
+    count: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+
+API_LATENCY_STATS: dict[str, EndpointLatency] = {}
+API_LATENCY_LOCK = threading.Lock()
+
+
+def get_endpoint_key(method: str, url: str) -> str:
+    # IDs in the path are collapsed so each endpoint gets one counter
+    path = re.sub(r"/\d+(?=/|$)", "/<id>", urlparse(url).path)
+    return f"{method.upper()} {path}"
+
+
+def record_api_latency(
+    method: str, url: str, elapsed_time: float, error: bool
+):
+    key = get_endpoint_key(method, url)
+    with API_LATENCY_LOCK:
+        stats = API_LATENCY_STATS.setdefault(key, EndpointLatency())
+        stats.count += 1
+        stats.errors += int(error)
+        stats.total_time += elapsed_time
+        stats.max_time = max(stats.max_time, elapsed_time)
+
+
+def get_api_latency_stats() -> dict[str, EndpointLatency]:
+    with API_LATENCY_LOCK:
+        return {
+            key: EndpointLatency(**vars(stats))
+            for key, stats in API_LATENCY_STATS.items()
+        }
+
+
+def log_api_latency_stats(logger: logging.Logger | None = None):
+    for key, stats in sorted(get_api_latency_stats().items()):
+        logger_if_able(
+            f"{key}: {stats.count} requests, {stats.errors} errors, "
+            f"avg {stats.avg_time:.3f}s, max {stats.max_time:.3f}s",
+            logger,
+        )
+
+
+def method_request(
+    method: str,
+    url: str,
+    data: dict[str, Any] | None = None,
+    headers: dict[str, Any] | None = None,
+    logger: logging.Logger | None = None,
+):
+
+    logger_if_able(f"{method} request to {url}", logger)
+
+    base_headers = {
+        "Content-Type": "application/json",
+    }
+
+    all_headers: dict[str, str] = (
+        {**base_headers, **headers} if headers else base_headers
+    )
+
+    body = json.dumps(data) if data else None
 
-    response = requests.request(method, url, headers=all_headers, data=body)
+    start_time = perf_counter()
+    try:
+        response = get_api_session().request(
+            method,
+            url,
+            headers=all_headers,
+            data=body,
+            timeout=API_REQUEST_TIMEOUT,
+        )
+    except requests.RequestException:
+        record_api_latency(method, url, perf_counter() - start_time, True)
+        raise
+    record_api_latency(
+        method, url, perf_counter() - start_time, not response.ok
+    )
 
     return response
 
@@ -729,8 +1594,7 @@ def login_to_API(
 ):
 
     login_url = f"{API_BASE_URL}/login"
-    print(login_url)
-    print(username, password)
+    logger_if_able(f"Logging in to {login_url}", logger)
     json_body = request_handler(
         "POST", login_url, {"username": username, "password": password}
     )
@@ -774,8 +1638,7 @@ def get_login_secrets_from_aws() -> tuple[str, str]:
     return username, password
 
 
-def with_credentials(logger: logging.Logger | None = None):
-
+def get_worker_credentials() -> tuple[str, str]:
     if IS_LOCAL:
         username = os.environ.get("valhub_admin_username", None)
         password = os.environ.get("valhub_admin_password", None)
@@ -785,19 +1648,73 @@ def with_credentials(logger: logging.Logger | None = None):
     if not username or not password:
         raise Exception("Missing worker credentials")
 
-    api_auth_token = None
-    headers = {}
+    return username, password
+
+
+def read_cached_api_token() -> str | None:
+    try:
+        with open(API_TOKEN_CACHE_FILE) as f:
+            cached: dict[str, Any] = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("api_base_url") != API_BASE_URL:
+        return None
+    return cached.get("token")
+
+
+def write_cached_api_token(token: str):
+    tmp_file = f"{API_TOKEN_CACHE_FILE}.{os.getpid()}.tmp"
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"api_base_url": API_BASE_URL, "token": token}, f)
+    os.replace(tmp_file, API_TOKEN_CACHE_FILE)
+
+
+def get_api_token(
+    stale_token: str | None = None, logger: logging.Logger | None = None
+) -> str:
+    """
+    Auth token of the worker, from this process, the token cache file or a
+    new login, in that order. Credentials are only looked up when a login
+    is needed. Pass the token the API rejected as `stale_token` to replace
+    it.
+    """
+    global API_AUTH_TOKEN
+
+    if API_AUTH_TOKEN is not None and API_AUTH_TOKEN != stale_token:
+        return API_AUTH_TOKEN
+
+    # The file lock makes the other processes wait for a single login
+    with open(f"{API_TOKEN_CACHE_FILE}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            token = read_cached_api_token()
+            if token is None or token == stale_token:
+                username, password = get_worker_credentials()
+                token = login_to_API(username, password, logger)
+                write_cached_api_token(token)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    API_AUTH_TOKEN = token
+    return token
+
+
+def with_credentials(logger: logging.Logger | None = None):
 
     def decorator(func: Callable[P, T]) -> Callable[P, T]:
         @wraps(func)
         def wrapper(*args: P.args, **kwargs: P.kwargs):
-            nonlocal api_auth_token
-            if not api_auth_token:
-                logger_if_able("Logging in", logger)
-                api_auth_token = login_to_API(username, password, logger)
-                headers["Authorization"] = f"Token {api_auth_token}"
-            kwargs["auth"] = headers
-            return func(*args, **kwargs)
+            token = get_api_token(logger=logger)
+            kwargs["auth"] = {"Authorization": f"Token {token}"}
+            try:
+                return func(*args, **kwargs)
+            except APIAuthenticationError:
+                # The token expired or was revoked, log in again once
+                logger_if_able("API token rejected, logging in", logger)
+                token = get_api_token(stale_token=token, logger=logger)
+                kwargs["auth"] = {"Authorization": f"Token {token}"}
+                return func(*args, **kwargs)
 
         return wrapper
 
@@ -869,6 +1786,9 @@ def request_handler(
 ):
 
     r = method_request(method, endpoint, headers=headers, data=data)
+    if r.status_code == 401:
+        logger_if_able(f"Error: {r.text}", logger, "ERROR")
+        raise APIAuthenticationError("API rejected the auth token")
     if not r.ok:
         logger_if_able(f"Error: {r.text}", logger, "ERROR")
         raise Exception("Failed to get data")
@@ -948,6 +1868,163 @@ def prepare_json_for_marimo_args(json_data: dict[str, Any]):
     return args_list
 
 
+# Templates that load their data with the `load_report_data` cell get the
+# paths of these files as arguments instead of every row of the results
+REPORT_RESULTS_FILE = "report_results.parquet"
+REPORT_RESULTS_JSON_FILE = "report_results.json"
+REPORT_SUMMARY_FILE = "report_summary.json"
+REPORT_RESULTS_FILE_ARG = "results_file"
+REPORT_SUMMARY_FILE_ARG = "summary_file"
+
+
+class ColumnSummary(TypedDict):
+    count: int
+    mean: float | None
+    median: float | None
+    min: float | None
+    max: float | None
+
+
+class ReportSummary(TypedDict):
+    number_of_rows: int
+    columns: dict[str, ColumnSummary]
+
+
+def summarize_report_results(df: pd.DataFrame) -> ReportSummary:
+    """
+    Summary statistics of every numeric column of the private results, so
+    the templates do not recompute them.
+    """
+    numeric_df = df.select_dtypes(include="number")
+    stats = numeric_df.agg(["count", "mean", "median", "min", "max"])
+
+    columns: dict[str, ColumnSummary] = {}
+    for column in stats.columns:
+        column_stats = stats[column]
+        values = {
+            stat: (None if pd.isna(value) else float(value))
+            for stat, value in column_stats.items()
+            if stat != "count"
+        }
+        columns[str(column)] = {
+            "count": int(column_stats["count"]),
+            **values,  # type: ignore
+        }
+
+    return {"number_of_rows": len(df), "columns": columns}
+
+
+def write_private_report_data(
+    df: pd.DataFrame,
+    report_data_dir: str,
+    logger: logging.Logger | None = None,
+) -> tuple[str, str]:
+    """
+    Write the private results and their summary for a template to load.
+    Parquet keeps the column types, results it cannot store fall back to
+    JSON records.
+    """
+    results_file_path = os.path.join(report_data_dir, REPORT_RESULTS_FILE)
+    try:
+        df.to_parquet(results_file_path, index=False)
+    except (ImportError, ValueError, TypeError) as e:
+        logger_if_able(
+            f"Could not write results as parquet, using JSON: {e}",
+            logger,
+            "WARNING",
+        )
+        results_file_path = os.path.join(
+            report_data_dir, REPORT_RESULTS_JSON_FILE
+        )
+        df.to_json(results_file_path, orient="records")
+
+    summary_file_path = os.path.join(report_data_dir, REPORT_SUMMARY_FILE)
+    with open(summary_file_path, "w") as f:
+        json.dump(summarize_report_results(df), f)
+
+    return results_file_path, summary_file_path
+
+
+def template_loads_report_files(template_file_path: str) -> bool:
+    try:
+        with open(template_file_path) as f:
+            return REPORT_RESULTS_FILE_ARG in f.read()
+    except OSError:
+        return False
+
+
+PRIVATE_REPORT_FILE = "private_results.html"
+# Written to the results directory in place of the private report when its
+# rendering is deferred to the report queue, the inputs of the report go
+# to PRIVATE_REPORT_INPUT_DIR of the evaluation directory
+PRIVATE_REPORT_REQUEST_FILE = "private_report_request.json"
+PRIVATE_REPORT_INPUT_DIR = "report"
+PRIVATE_REPORT_TEMPLATE_FILE = "template.py"
+
+
+class PrivateReportRequest(TypedDict):
+    report_key: str
+    results_file: str
+    summary_file: str
+
+
+def write_private_report_request(
+    df: pd.DataFrame,
+    template_file_path: str,
+    results_csv_path: str,
+    report_input_dir: str,
+    results_dir: str,
+    logger: logging.Logger | None = None,
+) -> PrivateReportRequest:
+    """
+    Write everything needed to render the private report later. The report
+    key is a hash of the template and the results CSV, so identical inputs
+    map to the same rendered report.
+    """
+    os.makedirs(report_input_dir, exist_ok=True)
+    results_file_path, summary_file_path = write_private_report_data(
+        df, report_input_dir, logger
+    )
+    shutil.copy(
+        template_file_path,
+        os.path.join(report_input_dir, PRIVATE_REPORT_TEMPLATE_FILE),
+    )
+
+    request: PrivateReportRequest = {
+        "report_key": hash_files([template_file_path, results_csv_path]),
+        "results_file": os.path.basename(results_file_path),
+        "summary_file": os.path.basename(summary_file_path),
+    }
+    with open(
+        os.path.join(results_dir, PRIVATE_REPORT_REQUEST_FILE), "w"
+    ) as f:
+        json.dump(request, f)
+
+    return request
+
+
+def render_private_report_from_files(
+    report_input_dir: str,
+    request: PrivateReportRequest,
+    html_file_path: str,
+    logger: logging.Logger | None = None,
+):
+    run_marimo_template(
+        [
+            f"--{REPORT_RESULTS_FILE_ARG}={os.path.join(report_input_dir, request['results_file'])}",
+            f"--{REPORT_SUMMARY_FILE_ARG}={os.path.join(report_input_dir, request['summary_file'])}",
+        ],
+        "export",
+        os.path.join(report_input_dir, PRIVATE_REPORT_TEMPLATE_FILE),
+        html_file_path,
+        logger,
+    )
+
+    # A failed export is only logged by run_marimo_template
+    if not os.path.exists(html_file_path):
+        raise Exception(f"marimo did not render {html_file_path}")
+
+
 def generate_private_report_for_submission(
     df: pd.DataFrame,
     action: str,
@@ -955,15 +2032,44 @@ def generate_private_report_for_submission(
     html_file_path: str,
     logger: logging.Logger | None = None,
 ):
-    json_data: dict[str, Any] = {}
-    json_data["results_df"] = df.to_dict(orient="records")  # type: ignore
+    with tempfile.TemporaryDirectory() as report_data_dir:
+        if template_loads_report_files(template_file_path):
+            results_file_path, summary_file_path = write_private_report_data(
+                df, report_data_dir, logger
+            )
+            data_args_list = [
+                f"--{REPORT_RESULTS_FILE_ARG}={results_file_path}",
+                f"--{REPORT_SUMMARY_FILE_ARG}={summary_file_path}",
+            ]
+        else:
+            # Templates written before the file hand-off read every row of
+            # the results from the command line
+            logger_if_able(
+                "Template reads results_df from the command line",
+                logger,
+                "WARNING",
+            )
+            json_data: dict[str, Any] = {}
+            json_data["results_df"] = df.to_dict(orient="records")  # type: ignore
+
+            data_args_list = prepare_json_for_marimo_args(json_data)
+
+        run_marimo_template(
+            data_args_list, action, template_file_path, html_file_path, logger
+        )
 
-    data_args_list = prepare_json_for_marimo_args(json_data)
 
+def run_marimo_template(
+    data_args_list: list[str],
+    action: str,
+    template_file_path: str,
+    html_file_path: str,
+    logger: logging.Logger | None = None,
+):
     if not data_args_list or len(data_args_list) == 0:
         raise ValueError("No data to pass to marimo")
 
-    logger_if_able(f"Data as args: {data_args_list}", logger, "INFO")
+    logger_if_able(f"Data as args: {data_args_list}", logger, "DEBUG")
     logger_if_able(f"Template file path: {template_file_path}", logger, "INFO")
     logger_if_able(f"HTML file path: {html_file_path}", logger, "INFO")
 
@@ -1026,6 +2132,8 @@ class DockerContainerContextManager:
         command: str | list[str],
         volumes: list[str],
         mem_limit: str | None = None,
+        labels: dict[str, str] | None = None,
+        cpu_time_limit: int | None = None,
     ) -> None:
         self.client = client
         self.container: Container | None = None
@@ -1034,6 +2142,8 @@ class DockerContainerContextManager:
         self.command = command
         self.volumes = volumes
         self.mem_limit = f"{mem_limit}g" if mem_limit else None
+        self.labels = labels
+        self.ulimits = get_cpu_time_ulimits(cpu_time_limit)
 
     def __enter__(self):
         container = self.client.containers.run(
@@ -1044,6 +2154,8 @@ class DockerContainerContextManager:
             stdout=True,
             stderr=True,
             mem_limit=self.mem_limit,
+            labels=self.labels,
+            ulimits=self.ulimits,
         )  # type: ignore
 
         self.container = container
@@ -1064,6 +2176,202 @@ class DockerContainerContextManager:
             self.container.remove()
 
 
+def get_cpu_time_ulimits(
+    cpu_time_limit: int | None,
+) -> list[Ulimit] | None:
+    """
+    Limit the CPU time of every process in a container. A process is sent
+    SIGXCPU once it reaches `cpu_time_limit` seconds.
+    """
+
+    if cpu_time_limit is None:
+        return None
+    return [
+        Ulimit(
+            name="cpu",
+            soft=cpu_time_limit,
+            hard=cpu_time_limit + CPU_TIME_HARD_LIMIT_MARGIN,
+        )
+    ]
+
+
+class ContainerDeadline:
+    """Kill a container that is still running after `seconds`."""
+
+    def __init__(
+        self,
+        container: Container,
+        seconds: float | None,
+        logger: logging.Logger | None = None,
+    ):
+        self.container = container
+        self.seconds = seconds
+        self.logger = logger
+        self.expired = False
+        self.timer: threading.Timer | None = None
+
+    def kill(self):
+        self.expired = True
+        logger_if_able(
+            f"Container {self.container.id} exceeded its time limit of {self.seconds} seconds, killing it",
+            self.logger,
+            "ERROR",
+        )
+        try:
+            self.container.kill()
+        except APIError as e:
+            logger_if_able(f"Error: {e}", self.logger, "ERROR")
+
+    def __enter__(self):
+        if self.seconds is not None:
+            self.timer = threading.Timer(self.seconds, self.kill)
+            self.timer.daemon = True
+            self.timer.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: TracebackType | None,
+    ):
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+class SubmissionTaskResult(TypedDict):
+    error: bool
+    error_code: int | None
+    memory_limit: str
+    peak_memory_gb: float | None
+    oom_killed: bool
+    execution_time: float | None
+
+
+class ContainerMemorySampler:
+    """
+    Track the peak memory usage of a running container from its Docker
+    stats stream in a background thread.
+    """
+
+    def __init__(
+        self, container: Container, logger: logging.Logger | None = None
+    ):
+        self.container = container
+        self.logger = logger
+        self.peak_bytes = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        try:
+            for stats in self.container.stats(stream=True, decode=True):
+                if self.stop_event.is_set():
+                    break
+                memory_stats: dict[str, Any] = stats.get("memory_stats") or {}
+                usage = memory_stats.get(
+                    "max_usage", memory_stats.get("usage", 0)
+                )
+                self.peak_bytes = max(self.peak_bytes, usage or 0)
+        except Exception as e:
+            logger_if_able(
+                f"Stopped sampling container memory: {e}",
+                self.logger,
+                "DEBUG",
+            )
+
+    @property
+    def peak_memory_gb(self) -> float | None:
+        if self.peak_bytes == 0:
+            return None
+        return self.peak_bytes / (1024.0**3)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: TracebackType | None,
+    ):
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+
+
+def is_container_oom_killed(container: Container) -> bool:
+    # Exit code 137 is any SIGKILL, including the kills of a stopped
+    # evaluation, so only Docker's own OOM flag is trusted
+    try:
+        container.reload()
+        return bool(container.attrs.get("State", {}).get("OOMKilled"))
+    except Exception:
+        return False
+
+
+def get_max_submission_memory_gb() -> float:
+    return psutil.virtual_memory().total / (1024.0**3)
+
+
+def format_memory_limit(memory_gb: float) -> str:
+    # Docker limits are passed in whole gigabytes
+    return str(max(MIN_SUBMISSION_MEMORY_GB, math.ceil(memory_gb)))
+
+
+def increase_memory_limit(memory_limit: str) -> str | None:
+    """Double a container memory limit, or return None if the machine has
+    no room for a larger one."""
+
+    max_memory_gb = math.floor(get_max_submission_memory_gb())
+    next_memory_gb = min(float(memory_limit) * 2, max_memory_gb)
+    if next_memory_gb <= float(memory_limit):
+        return None
+    return format_memory_limit(next_memory_gb)
+
+
+def estimate_submission_memory_limit(
+    task_results: list[SubmissionTaskResult],
+    memory_limit: str,
+    logger: logging.Logger | None = None,
+) -> str:
+    """
+    Fit the per-container memory limit to the peak usage measured on the
+    given files. Files that were OOM killed keep at least the limit they
+    finally ran with. Falls back to `memory_limit` without measurements.
+    """
+
+    required_memory_gb: list[float] = []
+    for task_result in task_results:
+        if task_result["peak_memory_gb"] is not None:
+            required_memory_gb.append(
+                task_result["peak_memory_gb"] * SUBMISSION_MEMORY_HEADROOM
+            )
+        if float(task_result["memory_limit"]) > float(memory_limit):
+            required_memory_gb.append(float(task_result["memory_limit"]))
+
+    if not required_memory_gb:
+        logger_if_able(
+            f"No container memory measurements, keeping {memory_limit}GB",
+            logger,
+            "WARNING",
+        )
+        return memory_limit
+
+    estimated_memory_gb = min(
+        max(required_memory_gb), math.floor(get_max_submission_memory_gb())
+    )
+    estimated_limit = format_memory_limit(estimated_memory_gb)
+
+    logger_if_able(
+        f"Measured container memory requires {max(required_memory_gb):.2f}GB, "
+        f"memory limit changed from {memory_limit}GB to {estimated_limit}GB",
+        logger,
+        "INFO",
+    )
+    return estimated_limit
+
+
 def docker_task(
     client: docker.DockerClient,
     image: str,
@@ -1074,12 +2382,21 @@ def docker_task(
     data_dir: str,
     results_dir: str,
     logger: logging.Logger | None = None,
-) -> tuple[bool, int | None]:
-
-    error_raised = False
-    error_code: int | None = None
+    labels: dict[str, str] | None = None,
+    timeout: float | None = None,
+    cpu_time_limit: int | None = None,
+) -> SubmissionTaskResult:
+
+    task_result: SubmissionTaskResult = {
+        "error": False,
+        "error_code": None,
+        "memory_limit": memory_limit,
+        "peak_memory_gb": None,
+        "oom_killed": False,
+        "execution_time": None,
+    }
 
-    volumes = [f"{results_dir}:/app/results", f"{data_dir}:/app/data"]
+    volumes = [f"{results_dir}:/app/results", f"{data_dir}:/app/data:ro"]
 
     logger_if_able(f"volumes: {volumes}", logger)
 
@@ -1092,8 +2409,12 @@ def docker_task(
     ]
 
     with DockerContainerContextManager(
-        client, image, command, volumes, memory_limit
-    ) as container:
+        client, image, command, volumes, memory_limit, labels, cpu_time_limit
+    ) as container, ContainerMemorySampler(
+        container, logger
+    ) as sampler, ContainerDeadline(
+        container, timeout, logger
+    ) as deadline:
         logger_if_able("Docker container starting...", logger)
         logger_if_able(f"Image: {image}", logger)
         logger_if_able(f"Submission file name: {submission_file_name}", logger)
@@ -1110,10 +2431,10 @@ def docker_task(
         try:
             container_dict = container.wait()
         except Exception as e:
-            error_raised = True
-            error_code = 500
+            task_result["error"] = True
+            task_result["error_code"] = 500
             logger_if_able(f"Error: {e}", logger, "ERROR")
-            return error_raised, error_code
+            return task_result
 
         if "StatusCode" not in container_dict:
             raise Exception(
@@ -1122,26 +2443,26 @@ def docker_task(
 
         exit_code = container_dict["StatusCode"]
 
-        if exit_code != 0:
-            error_raised = True
-            error_code = exit_code
+        if deadline.expired:
+            task_result["error"] = True
+            task_result["error_code"] = FILE_TIMEOUT_ERROR_CODE
+        elif exit_code == CPU_TIME_EXCEEDED_EXIT_CODE:
+            task_result["error"] = True
+            task_result["error_code"] = FILE_CPU_TIME_ERROR_CODE
+            logger_if_able(
+                f"Error: Submission exceeded its CPU time limit of {cpu_time_limit} seconds",
+                logger,
+                "ERROR",
+            )
+        elif exit_code != 0:
+            task_result["error"] = True
+            task_result["error_code"] = exit_code
+            task_result["oom_killed"] = is_container_oom_killed(container)
             logger_if_able("Error: Docker container exited with error", logger)
 
-    return error_raised, error_code
-
+    task_result["peak_memory_gb"] = sampler.peak_memory_gb
 
-def update_submission_progress(
-    submission_id: str,
-    data: dict[str, Any],
-    logger: logging.Logger | None = None,
-):
-    result = request_to_API_w_credentials(
-        "POST",
-        f"submissions/submission/{submission_id}/progress_increment",
-        data=data,
-        logger=logger,
-    )
-    return result
+    return task_result
 
 
 class NonBreakingErrorReport(TypedDict):
@@ -1151,15 +2472,22 @@ class NonBreakingErrorReport(TypedDict):
     file_name: str
 
 
-def update_error_report_non_breaking(
-    submission_id: str,
-    data: NonBreakingErrorReport,
+class SubmissionFileResultRow(TypedDict):
+    file_id: int | None
+    file_name: str
+    runtime: float | None
+    metrics: dict[str, float | None]
+
+
+def upload_submission_file_results(
+    submission_id: int,
+    results: list[SubmissionFileResultRow],
     logger: logging.Logger | None = None,
 ):
     result = request_to_API_w_credentials(
         "POST",
-        f"error/error_report/{submission_id}/update_non_breaking",
-        data=data,  # type: ignore
+        f"submissions/submission/{submission_id}/file_results",
+        data={"results": results},
         logger=logger,
     )
     return result
@@ -1194,87 +2522,758 @@ def create_blank_error_report(
     return error_report
 
 
-def submission_task(
-    submission_id: str,
-    image_tag: str,
-    memory_limit: str,
-    submission_file_name: str,
-    submission_function_name: str,
-    submission_args: tuple[Any, ...],
-    data_dir: str,
-    results_dir: str,
-    logger: logging.Logger | None = None,
-) -> tuple[bool, int | None]:
+PROGRESS_FLUSH_INTERVAL = 5  # seconds
 
-    error = False
-    error_code: int | None = None
-    execution_time: float | None = None
 
-    with DockerClientContextManager() as client:
-        try:
-            [error_raised, error_code_raised], execution_time = timing()(
-                docker_task
-            )(
-                client=client,
-                image=image_tag,
-                memory_limit=memory_limit,
-                submission_file_name=submission_file_name,
-                submission_function_name=submission_function_name,
-                submission_args=submission_args,
-                data_dir=data_dir,
-                results_dir=results_dir,
-                logger=logger,
-            )
-            if error_raised:
-                error = True
-                error_code = error_code_raised
-                logger_if_able("Error: Docker task failed", logger, "ERROR")
+class SubmissionProgressBatch(TypedDict):
+    file_count: int
+    total_exec_time: float
+    errors: list[NonBreakingErrorReport]
+
+
+def update_submission_progress_bulk(
+    submission_id: str,
+    data: SubmissionProgressBatch,
+    logger: logging.Logger | None = None,
+):
+    result = request_to_API_w_credentials(
+        "POST",
+        f"submissions/submission/{submission_id}/progress_bulk",
+        data=data,  # type: ignore
+        logger=logger,
+    )
+    return result
+
+
+def get_file_error_report(
+    submission_args: tuple[Any, ...],
+    error_code: int,
+    logger: logging.Logger | None = None,
+) -> NonBreakingErrorReport:
+    _, error_message = get_error_by_code(
+        error_code, submission_error_codes, logger
+    )
+
+    return {
+        "error_code": error_code,
+        "error_type": SubmissionException.__name__,
+        "error_message": error_message,
+        "file_name": submission_args[0],
+    }
+
+
+class SubmissionProgressReporter:
+    """
+    Buffer the progress and non-breaking errors of finished files and send
+    them to the API in batches from a background thread, instead of one
+    request per file from inside the file tasks.
+    """
+
+    def __init__(
+        self,
+        submission_id: str,
+        flush_interval: float = PROGRESS_FLUSH_INTERVAL,
+        logger: logging.Logger | None = None,
+    ):
+        self.submission_id = submission_id
+        self.flush_interval = flush_interval
+        self.logger = logger
+
+        self.lock = threading.Lock()
+        self.file_count = 0
+        self.total_exec_time = 0.0
+        self.errors: list[NonBreakingErrorReport] = []
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run,
+            name=f"{threading.current_thread().name}_progress",
+            daemon=True,
+        )
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: TracebackType | None,
+    ):
+        self.stop_event.set()
+        self.thread.join()
+        self.flush()
+
+    def on_file_completed(
+        self,
+        function_args: tuple[Any, ...],
+        result: SubmissionTaskResult,
+    ):
+        file_error_report: NonBreakingErrorReport | None = None
+        if result["error"] and result["error_code"]:
+            try:
+                file_error_report = get_file_error_report(
+                    function_args[5], result["error_code"], self.logger
+                )
+                logger_if_able(f"Error: {file_error_report}", self.logger)
+            except Exception as e:
+                logger_if_able(f"Error: {e}", self.logger, "ERROR")
+
+        with self.lock:
+            # Files that never got a container do not count towards progress
+            if result["execution_time"] is not None:
+                self.file_count += 1
+                self.total_exec_time += result["execution_time"]
+            if file_error_report is not None:
+                self.errors.append(file_error_report)
+
+    def take_batch(self) -> SubmissionProgressBatch | None:
+        with self.lock:
+            if self.file_count == 0 and not self.errors:
+                return None
+            batch: SubmissionProgressBatch = {
+                "file_count": self.file_count,
+                "total_exec_time": self.total_exec_time,
+                "errors": self.errors,
+            }
+            self.file_count = 0
+            self.total_exec_time = 0.0
+            self.errors = []
+        return batch
+
+    def flush(self):
+        batch = self.take_batch()
+        if batch is None:
+            return
+
+        try:
+            result = update_submission_progress_bulk(
+                self.submission_id, batch, self.logger
+            )
+            logger_if_able(f"Progress update: {result}", self.logger)
         except Exception as e:
-            error = True
-            error_code = 500
-            logger_if_able(f"Error: {e}", None, "ERROR")
+            logger_if_able(f"Error: {e}", self.logger, "ERROR")
+            # Put the batch back so the next flush sends it again
+            with self.lock:
+                self.file_count += batch["file_count"]
+                self.total_exec_time += batch["total_exec_time"]
+                self.errors = batch["errors"] + self.errors
 
-    try:
-        result = update_submission_progress(
-            submission_id, {"file_exec_time": execution_time}, logger
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+
+def submission_task(
+    submission_id: str,
+    image_tag: str,
+    memory_limit: str,
+    submission_file_name: str,
+    submission_function_name: str,
+    submission_args: tuple[Any, ...],
+    data_dir: str,
+    results_dir: str,
+    logger: logging.Logger | None = None,
+    file_timeout: float | None = None,
+    file_cpu_time_limit: int | None = None,
+    stop_event_name: str | None = None,
+) -> SubmissionTaskResult:
+
+    task_result: SubmissionTaskResult = {
+        "error": False,
+        "error_code": None,
+        "memory_limit": memory_limit,
+        "peak_memory_gb": None,
+        "oom_killed": False,
+        "execution_time": None,
+    }
+    execution_time: float | None = None
+
+    with DockerClientContextManager() as client:
+        # The evaluation may have been stopped while the file was queued
+        if is_submission_stopped(stop_event_name):
+            logger_if_able(
+                f"Evaluation of submission {submission_id} was stopped, not running the container",
+                logger,
+                "WARNING",
+            )
+            task_result["error"] = True
+        else:
+            try:
+                task_result, execution_time = timing()(docker_task)(
+                    client=client,
+                    image=image_tag,
+                    memory_limit=memory_limit,
+                    submission_file_name=submission_file_name,
+                    submission_function_name=submission_function_name,
+                    submission_args=submission_args,
+                    data_dir=data_dir,
+                    results_dir=results_dir,
+                    logger=logger,
+                    labels={SUBMISSION_CONTAINER_LABEL: str(submission_id)},
+                    timeout=file_timeout,
+                    cpu_time_limit=file_cpu_time_limit,
+                )
+            except Exception as e:
+                task_result["error"] = True
+                task_result["error_code"] = 500
+                logger_if_able(f"Error: {e}", None, "ERROR")
+
+        if task_result["error"]:
+            logger_if_able("Error: Docker task failed", logger, "ERROR")
+
+    task_result["execution_time"] = execution_time
+
+    return task_result
+
+
+def retry_oom_killed_submission_task(
+    function_args: tuple[Any, ...],
+    task_result: SubmissionTaskResult,
+    retries: int,
+) -> tuple[tuple[Any, ...], float] | None:
+    """
+    `dask_multiprocess` retry for `submission_task`. A file whose container
+    was OOM killed is run again with double the memory limit, at most
+    `SUBMISSION_OOM_RETRIES` times. The larger limit is reserved from
+    `SUBMISSION_MEMORY_BUDGET` like any other file before it runs, so
+    retries never take more memory than the machine has room for.
+    """
+
+    if not task_result["oom_killed"] or retries >= SUBMISSION_OOM_RETRIES:
+        return None
+
+    memory_limit: str = function_args[2]
+    logger: logging.Logger | None = function_args[8]
+    stop_event_name: str | None = function_args[11]
+
+    # A kill by a stopped evaluation is reported as OOM killed too
+    if is_submission_stopped(stop_event_name):
+        return None
+
+    next_memory_limit = increase_memory_limit(memory_limit)
+    if next_memory_limit is None:
+        logger_if_able(
+            f"Container was OOM killed at {memory_limit}GB and no larger limit fits",
+            logger,
+            "ERROR",
         )
-        logger_if_able(f"Progress update: {result}", logger)
-    except Exception as e:
-        # error = True
-        # error_code = 500
-        logger_if_able(f"Error: {e}", logger, "ERROR")
+        return None
 
-    # TODO: Send to API
-    # Create an error report for all non breaking errors and send to API
+    logger_if_able(
+        f"Container was OOM killed at {memory_limit}GB, retrying with {next_memory_limit}GB",
+        logger,
+        "WARNING",
+    )
+    return (
+        (*function_args[:2], next_memory_limit, *function_args[3:]),
+        float(next_memory_limit),
+    )
+
+
+POOL_MESSAGE_MARKER = "__valhub_pool__"
+
+
+class WarmSubmissionContainer:
+    """
+    Long-lived submission container running the resident
+    `submission_wrapper.py --serve` loop. File jobs are written to the
+    container's stdin and the wrapper reports each job's exit code back
+    on stdout.
+
+    A running container holds its memory limit in `SUBMISSION_MEMORY_BUDGET`
+    until it is stopped, as the single file containers of
+    `dask_multiprocess` do.
+    """
+
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        image: str,
+        submission_file_name: str,
+        submission_function_name: str,
+        volumes: list[str],
+        memory_limit: str,
+        logger: logging.Logger | None = None,
+        labels: dict[str, str] | None = None,
+        cpu_time_limit: int | None = None,
+    ) -> None:
+        self.client = client
+        self.image = image
+        self.submission_file_name = submission_file_name
+        self.submission_function_name = submission_function_name
+        self.volumes = volumes
+        self.labels = labels
+        # Every file runs in a process of its own, so the limit is per file
+        self.ulimits = get_cpu_time_ulimits(cpu_time_limit)
+        self.memory_limit = memory_limit
+        self.logger = logger
+
+        self.container: Container | None = None
+        self.socket: Any = None
+        self.frames: Any = None
+        self.sampler: ContainerMemorySampler | None = None
+        self.reserved_gb = 0.0
+        self.buffer = ""
+        self.jobs_run = 0
+        self.job_counter = 0
+
+    @property
+    def mem_limit_bytes(self) -> float:
+        return float(self.memory_limit) * 1024**3
+
+    def set_memory_limit(self, memory_limit: str):
+        """Stop the container, so that it restarts with `memory_limit`."""
+
+        self.stop()
+        self.memory_limit = memory_limit
+
+    def start(self):
+        command: list[str] = [
+            "python",
+            "submission_wrapper.py",
+            "--serve",
+            self.submission_file_name,
+            self.submission_function_name,
+        ]
+
+        SUBMISSION_MEMORY_BUDGET.acquire(float(self.memory_limit))
+        self.reserved_gb = float(self.memory_limit)
+
+        self.container = self.client.containers.create(
+            image=self.image,
+            command=command,
+            volumes=self.volumes,
+            stdin_open=True,
+            mem_limit=f"{self.memory_limit}g",
+            labels=self.labels,
+            ulimits=self.ulimits,
+        )  # type: ignore
+
+        # Attach before starting so that no output is missed
+        self.socket = self.container.attach_socket(
+            params={"stdin": 1, "stdout": 1, "stderr": 1, "stream": 1}
+        )
+        self.frames = frames_iter(self.socket, tty=False)
+        self.container.start()
+        self.sampler = ContainerMemorySampler(
+            self.container, self.logger
+        ).__enter__()
+        self.buffer = ""
+        self.jobs_run = 0
+
+        logger_if_able(
+            f"Started warm submission container {self.container.id}",
+            self.logger,
+        )
+
+        message = self.read_message()
+        if message is None or message.get("status") != "ready":
+            raise Exception("Warm submission container failed to start")
+
+    def read_message(self) -> dict[str, Any] | None:
+        while True:
+            if "\n" in self.buffer:
+                line, self.buffer = self.buffer.split("\n", 1)
+                marker_index = line.find(POOL_MESSAGE_MARKER)
+                if marker_index == -1:
+                    if line.strip():
+                        logger_if_able(line.rstrip(), self.logger)
+                    continue
+                return json.loads(
+                    line[marker_index + len(POOL_MESSAGE_MARKER) :]
+                )
+
+            try:
+                _, data = next(self.frames)
+            except StopIteration:
+                return None
+
+            self.buffer += data.decode("utf-8", errors="replace")
+
+    def run_file(
+        self, submission_args: tuple[Any, ...], timeout: float | None = None
+    ) -> SubmissionTaskResult:
+        if self.container is None:
+            self.start()
+        assert self.sampler is not None
+
+        task_result: SubmissionTaskResult = {
+            "error": True,
+            "error_code": None,
+            "memory_limit": self.memory_limit,
+            "peak_memory_gb": None,
+            "oom_killed": False,
+            "execution_time": None,
+        }
+
+        self.job_counter += 1
+        job = {
+            "job_id": self.job_counter,
+            "args": list(submission_args),
+            "timeout": timeout,
+        }
+
+        # The container's peak while this file runs
+        self.sampler.peak_bytes = 0
+        raw_socket = getattr(self.socket, "_sock", self.socket)
+        raw_socket.sendall((json.dumps(job) + "\n").encode("utf-8"))
+
+        # The wrapper enforces the timeout on the job itself; the watchdog
+        # only fires if the whole container stops responding.
+        watchdog: threading.Timer | None = None
+        if timeout is not None:
+            watchdog = threading.Timer(
+                timeout + POOL_WATCHDOG_GRACE_PERIOD, self.kill
+            )
+            watchdog.daemon = True
+            watchdog.start()
 
-    if error and error_code:
         try:
-            _, error_message = get_error_by_code(
-                error_code, submission_error_codes, logger
+            message = self.read_message()
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+
+        self.jobs_run += 1
+        task_result["peak_memory_gb"] = self.sampler.peak_memory_gb
+
+        if message is None or message.get("job_id") != job["job_id"]:
+            logger_if_able(
+                "Error: Warm submission container exited unexpectedly",
+                self.logger,
+                "ERROR",
             )
+            # The wrapper itself may have been OOM killed
+            task_result["error_code"] = 500
+            task_result["oom_killed"] = (
+                self.container is not None
+                and is_container_oom_killed(self.container)
+            )
+            self.stop()
+            return task_result
 
-            file_error_report: NonBreakingErrorReport = {
-                "error_code": error_code,
-                "error_type": SubmissionException.__name__,
-                "error_message": error_message,
-                "file_name": submission_args[0],
-            }
-            logger.info(file_error_report)
-
-            logger_if_able(f"Error: {file_error_report}", logger, "ERROR")
-            # error, error_code = create_error_report(
-            #     submission_file_name, error_code, logger
-            # )
-            update_error_report_non_breaking(
-                submission_id, file_error_report, logger
+        if message["timed_out"]:
+            logger_if_able(
+                f"Error: Submission timed out after {timeout} seconds",
+                self.logger,
+                "ERROR",
+            )
+            task_result["error_code"] = FILE_TIMEOUT_ERROR_CODE
+            return task_result
+
+        exit_code: int = message["exit_code"]
+        if exit_code == CPU_TIME_EXCEEDED_EXIT_CODE:
+            logger_if_able(
+                "Error: Submission exceeded its CPU time limit",
+                self.logger,
+                "ERROR",
+            )
+            task_result["error_code"] = FILE_CPU_TIME_ERROR_CODE
+            return task_result
+        if exit_code != 0:
+            logger_if_able(
+                "Error: Submission exited with error", self.logger, "ERROR"
+            )
+            task_result["error_code"] = exit_code
+            task_result["oom_killed"] = bool(message.get("oom_killed"))
+            return task_result
+
+        task_result["error"] = False
+        return task_result
+
+    def memory_usage(self) -> float | None:
+        if self.container is None:
+            return None
+        try:
+            stats = self.container.stats(stream=False)
+            memory_stats = stats["memory_stats"]
+            cache = memory_stats.get("stats", {}).get(
+                "inactive_file", memory_stats.get("stats", {}).get("cache", 0)
             )
+            return memory_stats["usage"] - cache
         except Exception as e:
-            logger_if_able(f"Error: {e}", logger, "ERROR")
+            logger_if_able(f"Error: {e}", self.logger, "WARNING")
+            return None
+
+    def kill(self):
+        if self.container is not None:
+            try:
+                self.container.kill()
+            except Exception as e:
+                logger_if_able(f"Error: {e}", self.logger, "WARNING")
+
+    def stop(self):
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except Exception:
+                pass
+            self.socket = None
+            self.frames = None
+
+        if self.container is not None:
+            try:
+                self.container.reload()
+                if self.container.status == "running":
+                    self.container.stop()
+                self.container.remove()
+            except Exception as e:
+                logger_if_able(f"Error: {e}", self.logger, "WARNING")
+            self.container = None
 
-    # # Send error report to API
-    # send_error_report_to_API(json_errors, error_rate)
+        if self.sampler is not None:
+            self.sampler.__exit__(None, None, None)
+            self.sampler = None
 
-    return error, error_code
+        SUBMISSION_MEMORY_BUDGET.release(self.reserved_gb)
+        self.reserved_gb = 0.0
+
+
+def get_submission_pool_size(logger: logging.Logger | None = None) -> int:
+    """
+    Number of warm containers a submission may run at once. Like the Dask
+    cluster the pool is sized by the machine's CPUs only, the memory of its
+    containers is held back by `SUBMISSION_MEMORY_BUDGET`.
+    """
+
+    cpu_count = os.cpu_count()
+
+    sys_memory = psutil.virtual_memory().total / (1024.0**3)  # in GB
+
+    total_workers, total_threads = set_workers_and_threads(
+        cpu_count,
+        sys_memory,
+        MIN_SUBMISSION_MEMORY_GB,
+        threads_per_worker=1,
+        logger=logger,
+    )
+
+    return total_workers * total_threads
+
+
+class SubmissionContainerPool:
+    """
+    Pool of warm submission containers for a single submission image.
+
+    Containers are recycled when they crash, after `max_files_per_container`
+    files, or when their resident memory grows past
+    `max_memory_fraction` of the container memory limit. A file whose
+    process was OOM killed is run again in its container restarted with
+    double the memory limit, at most `SUBMISSION_OOM_RETRIES` times.
+    """
+
+    def __init__(
+        self,
+        image_tag: str,
+        submission_file_name: str,
+        submission_function_name: str,
+        data_dir: str,
+        results_dir: str,
+        memory_limit: str,
+        pool_size: int,
+        file_timeout: float | None = None,
+        max_files_per_container: int = 100,
+        max_memory_fraction: float = 0.8,
+        logger: logging.Logger | None = None,
+        labels: dict[str, str] | None = None,
+        file_cpu_time_limit: int | None = None,
+    ) -> None:
+        self.image_tag = image_tag
+        self.submission_file_name = submission_file_name
+        self.submission_function_name = submission_function_name
+        self.volumes = [
+            f"{results_dir}:/app/results",
+            f"{data_dir}:/app/data:ro",
+        ]
+        self.memory_limit = memory_limit
+        self.pool_size = pool_size
+        self.file_timeout = file_timeout
+        self.max_files_per_container = max_files_per_container
+        self.max_memory_fraction = max_memory_fraction
+        self.logger = logger
+        self.labels = labels
+        self.file_cpu_time_limit = file_cpu_time_limit
+
+        self.client: docker.DockerClient | None = None
+        self.containers: list[WarmSubmissionContainer] = []
+        self.idle_containers: queue.Queue[WarmSubmissionContainer] = (
+            queue.Queue()
+        )
+
+    def __enter__(self):
+        self.client = initialize_docker_client()
+        for _ in range(self.pool_size):
+            container = WarmSubmissionContainer(
+                self.client,
+                self.image_tag,
+                self.submission_file_name,
+                self.submission_function_name,
+                self.volumes,
+                self.memory_limit,
+                self.logger,
+                self.labels,
+                self.file_cpu_time_limit,
+            )
+            self.containers.append(container)
+            self.idle_containers.put(container)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: TracebackType | None,
+    ):
+        for container in self.containers:
+            container.stop()
+        if self.client:
+            self.client.close()  # type: ignore
+
+    def set_memory_limit(self, memory_limit: str):
+        """Restart the containers with `memory_limit`. Only call this
+        between `map` calls, while every container is idle."""
+
+        self.memory_limit = memory_limit
+        for container in self.containers:
+            if container.memory_limit != memory_limit:
+                container.set_memory_limit(memory_limit)
+
+    def should_recycle(self, container: WarmSubmissionContainer) -> bool:
+        if container.container is None:
+            return False
+        if container.jobs_run >= self.max_files_per_container:
+            return True
+        memory_usage = container.memory_usage()
+        return (
+            memory_usage is not None
+            and memory_usage
+            > container.mem_limit_bytes * self.max_memory_fraction
+        )
+
+    def run_in_container(
+        self,
+        container: WarmSubmissionContainer,
+        submission_id: str,
+        submission_args: tuple[Any, ...],
+        stop_event_name: str | None = None,
+    ) -> SubmissionTaskResult:
+
+        task_result: SubmissionTaskResult = {
+            "error": True,
+            "error_code": None,
+            "memory_limit": container.memory_limit,
+            "peak_memory_gb": None,
+            "oom_killed": False,
+            "execution_time": None,
+        }
+
+        for retries in range(SUBMISSION_OOM_RETRIES + 1):
+            if is_submission_stopped(stop_event_name):
+                logger_if_able(
+                    f"Evaluation of submission {submission_id} was stopped, not running the file",
+                    self.logger,
+                    "WARNING",
+                )
+                task_result["error"] = True
+                break
+
+            try:
+                task_result, execution_time = timing(verbose=False)(
+                    container.run_file
+                )(submission_args, self.file_timeout)
+                task_result["execution_time"] = execution_time
+            except Exception as e:
+                task_result["error"] = True
+                task_result["error_code"] = 500
+                logger_if_able(f"Error: {e}", self.logger, "ERROR")
+                container.stop()
+                break
+
+            if (
+                not task_result["oom_killed"]
+                or retries == SUBMISSION_OOM_RETRIES
+                or is_submission_stopped(stop_event_name)
+            ):
+                break
+
+            next_memory_limit = increase_memory_limit(container.memory_limit)
+            if next_memory_limit is None:
+                logger_if_able(
+                    f"File was OOM killed at {container.memory_limit}GB and no larger limit fits",
+                    self.logger,
+                    "ERROR",
+                )
+                break
+
+            logger_if_able(
+                f"File was OOM killed at {container.memory_limit}GB, restarting its container with {next_memory_limit}GB",
+                self.logger,
+                "WARNING",
+            )
+            # The container reserves the larger limit when it restarts
+            container.set_memory_limit(next_memory_limit)
+
+        return task_result
+
+    def run_task(
+        self,
+        submission_id: str,
+        submission_args: tuple[Any, ...],
+        stop_event_name: str | None = None,
+    ) -> SubmissionTaskResult:
+
+        container = self.idle_containers.get()
+        try:
+            return self.run_in_container(
+                container, submission_id, submission_args, stop_event_name
+            )
+        finally:
+            if self.should_recycle(container):
+                logger_if_able(
+                    "Recycling warm submission container", self.logger
+                )
+                container.stop()
+            if container.memory_limit != self.memory_limit:
+                # Back to the pool's limit once the larger file is done
+                container.set_memory_limit(self.memory_limit)
+            self.idle_containers.put(container)
+
+    def map(
+        self,
+        function_args_list: list[tuple[Any, ...]],
+        on_result: (
+            Callable[[tuple[Any, ...], SubmissionTaskResult], None] | None
+        ) = None,
+    ) -> list[SubmissionTaskResult]:
+        """
+        Run `submission_task` style argument tuples through the pool and
+        return the results in the same order. `on_result` is called with
+        each argument tuple and its result as soon as the file finishes. If
+        it raises, the files that have not started are cancelled.
+        """
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.pool_size,
+            thread_name_prefix=threading.current_thread().name,
+        )
+        futures = [
+            executor.submit(self.run_task, args[0], args[5], args[11])
+            for args in function_args_list
+        ]
+        try:
+            if on_result is not None:
+                future_args = dict(zip(futures, function_args_list))
+                for future in as_completed_futures(futures):
+                    on_result(future_args[future], future.result())
+            results = [future.result() for future in futures]
+        except BaseException:
+            # Files still running stop with the pool's containers on exit
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return results
 
 
 def is_valid_python_version(python_version: str) -> bool:
@@ -1285,6 +3284,234 @@ def is_valid_python_version(python_version: str) -> bool:
     return python_version in supported_python_versions
 
 
+def hash_files(file_paths: list[str], *extra: str) -> str:
+    file_hash = hashlib.sha256()
+    for file_path in file_paths:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(chunk)
+    for value in extra:
+        file_hash.update(value.encode("utf-8"))
+    return file_hash.hexdigest()
+
+
+def get_base_image_tag(dir_path: str, python_version: str) -> str:
+    base_hash = hash_files(
+        [os.path.join(dir_path, file) for file in BASE_IMAGE_FILES],
+        python_version,
+    )
+    return f"{BASE_IMAGE_REPOSITORY}:{python_version}-{base_hash[:12]}"
+
+
+def get_submission_image_tag(
+    dir_path: str, submission_file_name: str, python_version: str
+) -> str:
+    """
+    Content-addressed tag for a submission image so that re-evaluations of
+    the same archive on the same Python version and Dockerfiles reuse it.
+    """
+    image_hash = hash_files(
+        [
+            os.path.join(dir_path, submission_file_name),
+            *[
+                os.path.join(dir_path, file)
+                for file in [*BASE_IMAGE_FILES, *SUBMISSION_IMAGE_FILES]
+            ],
+        ],
+        python_version,
+    )
+    return f"{SUBMISSION_IMAGE_REPOSITORY}:{image_hash[:16]}"
+
+
+def get_docker_image(
+    client: docker.DockerClient,
+    tag: str,
+    logger: logging.Logger | None = None,
+) -> Image | None:
+    try:
+        return client.images.get(tag)
+    except ImageNotFound:
+        logger_if_able(f"Docker image {tag} not found", logger)
+        return None
+
+
+def build_docker_image(
+    client: docker.DockerClient,
+    dir_path: str,
+    tag: str,
+    dockerfile: str,
+    buildargs: dict[str, str],
+    labels: dict[str, str],
+    logger: logging.Logger | None = None,
+):
+    try:
+        live_log_generator = client.api.build(
+            path=dir_path,
+            tag=tag,
+            rm=True,
+            dockerfile=dockerfile,
+            buildargs=buildargs,
+            labels=labels,
+        )
+        for line in live_log_generator:
+            try:
+                line_dict = json.loads(line)
+                if line_dict.get("stream"):
+                    logger_if_able(
+                        line_dict["stream"].rstrip(), logger, "INFO"
+                    )
+                if line_dict.get("error"):
+                    raise BuildError(line_dict["error"], live_log_generator)
+            except json.JSONDecodeError:
+                logger_if_able(line, logger, "INFO")
+
+        logger_if_able(f"Docker image {tag} created", logger)
+    except BuildError as e:
+        logger_if_able(f"Error: {e}", logger, "ERROR")
+        raise e
+    except Exception as e:
+        logger_if_able(f"Error: {e}", logger, "ERROR")
+        raise e
+
+    return get_docker_image(client, tag, logger)
+
+
+def create_base_docker_image(
+    dir_path: str,
+    python_version: str,
+    client: docker.DockerClient,
+    logger: logging.Logger | None = None,
+) -> str:
+    tag = get_base_image_tag(dir_path, python_version)
+
+    if get_docker_image(client, tag, logger) is not None:
+        logger_if_able(f"Base docker image {tag} already exists", logger)
+        return tag
+
+    logger_if_able(f"Creating base docker image {tag}", logger)
+    build_docker_image(
+        client,
+        dir_path,
+        tag,
+        "Dockerfile.base",
+        {"python_version": python_version},
+        {IMAGE_CACHE_LABEL: BASE_IMAGE_REPOSITORY},
+        logger,
+    )
+    return tag
+
+
+def prebuild_base_docker_images(
+    dir_path: str, logger: logging.Logger | None = None
+):
+    """
+    Build the shared wrapper dependency layer for every supported
+    Python version so submission builds only add the user's layers.
+    """
+
+    python_versions = cast(
+        list[str],
+        request_to_API_w_credentials("GET", "versions/python", logger=logger),
+    )
+
+    with DockerClientContextManager() as client:
+        for python_version in python_versions:
+            try:
+                create_base_docker_image(
+                    dir_path, python_version, client, logger
+                )
+            except Exception as e:
+                logger_if_able(
+                    f"Error building base image for Python {python_version}",
+                    logger,
+                    "ERROR",
+                )
+                logger_if_able(f"Error: {e}", logger, "ERROR")
+
+
+def load_image_cache_index() -> dict[str, float]:
+    try:
+        with open(IMAGE_CACHE_INDEX_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def touch_image_cache_index(tag: str):
+    with IMAGE_CACHE_LOCK:
+        index = load_image_cache_index()
+        index[tag] = time.time()
+        with open(IMAGE_CACHE_INDEX_FILE, "w") as f:
+            json.dump(index, f)
+
+
+def evict_docker_images(
+    client: docker.DockerClient,
+    keep_tags: list[str],
+    max_cache_size: float = SUBMISSION_IMAGE_CACHE_GB,
+    logger: logging.Logger | None = None,
+):
+    """
+    Remove least recently used submission images until the cached
+    submission images fit within `max_cache_size` GB.
+    """
+
+    images = client.images.list(
+        filters={"label": f"{IMAGE_CACHE_LABEL}={SUBMISSION_IMAGE_REPOSITORY}"}
+    )
+
+    # Images of submissions being evaluated in parallel must not be removed
+    images_in_use = {
+        container.attrs.get("ImageID")
+        for container in client.containers.list()
+    }
+
+    with IMAGE_CACHE_LOCK:
+        index = load_image_cache_index()
+
+        cached_images: list[tuple[float, str, Image]] = []
+        for image in images:
+            tags = [
+                tag
+                for tag in image.tags
+                if tag.startswith(f"{SUBMISSION_IMAGE_REPOSITORY}:")
+            ]
+            if not tags:
+                continue
+            tag = tags[0]
+            # Images built before the index existed fall back to their age
+            last_used = index.get(tag)
+            if last_used is None:
+                created = pd.Timestamp(image.attrs["Created"])
+                last_used = created.timestamp()
+            cached_images.append((last_used, tag, image))
+
+        cache_size = sum(
+            image.attrs.get("Size", 0) for _, _, image in cached_images
+        ) / (1024.0**3)
+
+        cached_images.sort(key=lambda item: item[0])
+
+        for _, tag, image in cached_images:
+            if cache_size <= max_cache_size:
+                break
+            if tag in keep_tags or image.id in images_in_use:
+                continue
+
+            logger_if_able(f"Evicting docker image {tag}", logger)
+            try:
+                client.images.remove(image.id, force=True)
+            except Exception as e:
+                logger_if_able(f"Error: {e}", logger, "WARNING")
+                continue
+
+            cache_size -= image.attrs.get("Size", 0) / (1024.0**3)
+            index.pop(tag, None)
+
+        with open(IMAGE_CACHE_INDEX_FILE, "w") as f:
+            json.dump(index, f)
+
+
 def create_docker_image(
     dir_path: str,
     tag: str,
@@ -1313,60 +3540,104 @@ def create_docker_image(
     image = None
 
     if not overwrite:
-        try:
-            image = client.images.get(tag)
-        except ImageNotFound:
-            logger_if_able("Docker image not found", logger)
-        except Exception as e:
-            raise e
+        image = get_docker_image(client, tag, logger)
 
     if image:
         logger_if_able("Docker image already exists", logger)
         logger_if_able(image, logger)
-        return image
     else:
         logger_if_able("Docker image does not exist", logger)
         logger_if_able("Creating Docker image", logger)
 
-        try:
-            # Create docker image from Dockerfile
-            live_log_generator = client.api.build(
-                path=dir_path,
-                tag=tag,
-                rm=True,
-                nocache=True,
-                dockerfile="Dockerfile",
-                buildargs={
-                    "zip_file": f"{submission_file_name}",
-                    "python_version": python_version,
-                },
-            )
-            for line in live_log_generator:
-                try:
-                    line_dict = json.loads(line)
-                    if line_dict.get("stream"):
-                        logger_if_able(
-                            line_dict["stream"].rstrip(), logger, "INFO"
-                        )
-                except json.JSONDecodeError:
-                    logger_if_able(line, logger, "INFO")
+        base_image_tag = create_base_docker_image(
+            dir_path, python_version, client, logger
+        )
 
-            logger_if_able("Docker image created")
+        image = build_docker_image(
+            client,
+            dir_path,
+            tag,
+            "Dockerfile",
+            {
+                "zip_file": f"{submission_file_name}",
+                "base_image": base_image_tag,
+            },
+            {IMAGE_CACHE_LABEL: SUBMISSION_IMAGE_REPOSITORY},
+            logger,
+        )
 
-            try:
-                image = client.images.get(tag)
-            except ImageNotFound:
-                logger_if_able("Docker image not found", logger)
-            except Exception as e:
-                raise e
+    touch_image_cache_index(tag)
 
-            return image
-        except BuildError as e:
-            logger_if_able(f"Error: {e}", logger, "ERROR")
-            raise e
-        except Exception as e:
-            logger_if_able(f"Error: {e}", logger, "ERROR")
-            raise e
+    try:
+        evict_docker_images(client, [tag], logger=logger)
+    except Exception as e:
+        logger_if_able(f"Error: {e}", logger, "WARNING")
+
+    return image
+
+
+def is_submission_stopped(stop_event_name: str | None) -> bool:
+    """
+    Whether the evaluation a submission task belongs to was stopped with
+    `stop_submission_tasks`. Cancelling a future does not stop a task that
+    is already running, so tasks check this before starting a container.
+    """
+
+    if stop_event_name is None:
+        return False
+    if stop_event_name in STOPPED_SUBMISSION_TASKS:
+        return True
+    try:
+        return Event(stop_event_name).is_set()
+    except Exception:
+        # Neither on a Dask worker nor next to the worker's cluster
+        return False
+
+
+def stop_submission_tasks(
+    stop_event_name: str, logger: logging.Logger | None = None
+):
+    """Tell the running tasks of an evaluation not to start any more
+    containers, including OOM retries."""
+
+    # The container pool runs its files in this process, without Dask
+    STOPPED_SUBMISSION_TASKS.add(stop_event_name)
+
+    if DASK_CLIENT is None:
+        return
+    try:
+        Event(stop_event_name, client=DASK_CLIENT).set()
+    except Exception as e:
+        logger_if_able(
+            f"Error stopping submission tasks: {e}", logger, "ERROR"
+        )
+
+
+def kill_submission_containers(
+    submission_id: int | str,
+    logger: logging.Logger | None = None,
+    stop_event_name: str | None = None,
+):
+    """Kill the running containers of a submission's files. Their tasks are
+    stopped first with `stop_event_name`, so that none is retried."""
+
+    if stop_event_name is not None:
+        stop_submission_tasks(stop_event_name, logger)
+
+    with DockerClientContextManager() as client:
+        containers: list[Container] = client.containers.list(
+            filters={"label": f"{SUBMISSION_CONTAINER_LABEL}={submission_id}"}
+        )
+        for container in containers:
+            logger_if_able(
+                f"Killing container {container.id} of submission {submission_id}",
+                logger,
+                "WARNING",
+            )
+            try:
+                container.kill()
+            except APIError as e:
+                logger_if_able(f"Error: {e}", logger, "ERROR")
 
 
 class DockerClientContextManager:
@@ -0,0 +1,55 @@
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+import pytest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+RUNNER_MODULE_NAME = "pvinsight-validation-runner"
+
+sys.path.insert(0, SRC_DIR)
+
+# Read by the worker modules when they are imported
+os.environ.setdefault("valhub_admin_username", "worker")
+os.environ.setdefault("valhub_admin_password", "worker")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def log_dir(tmp_path_factory: pytest.TempPathFactory):
+    # The logging config writes to logs/ relative to the working directory
+    work_dir = tmp_path_factory.mktemp("worker")
+    os.makedirs(work_dir / "logs")
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    yield work_dir / "logs"
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def utility(log_dir) -> ModuleType:
+    import utility
+
+    return utility
+
+
+@pytest.fixture(scope="session")
+def worker(utility: ModuleType) -> ModuleType:
+    import submission_worker
+
+    return submission_worker
+
+
+@pytest.fixture(scope="session")
+def runner(utility: ModuleType) -> ModuleType:
+    # The runner's file name is not a valid module name
+    if RUNNER_MODULE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            RUNNER_MODULE_NAME,
+            os.path.join(SRC_DIR, f"{RUNNER_MODULE_NAME}.py"),
+        )
+        assert spec is not None and spec.loader is not None
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[RUNNER_MODULE_NAME] = module
+        spec.loader.exec_module(module)
+    return sys.modules[RUNNER_MODULE_NAME]
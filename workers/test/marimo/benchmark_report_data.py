@@ -0,0 +1,138 @@
+"""
+Compare passing the private results to a marimo template as command line
+arguments with writing them to files for the template's
+`load_report_data` cell.
+
+Usage: python benchmark_report_data.py [number_of_rows ...]
+
+Each way is timed on the worker side (building the arguments or writing the
+files), on the template side (rebuilding the dataframe) and for starting a
+process with the resulting command line.
+"""
+
+import contextlib
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from marimo_wrapper import (
+    prepare_json_for_marimo_args,
+    write_private_report_data,
+)
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_results_df(number_of_rows: int) -> pd.DataFrame:
+    df = pd.read_csv(
+        os.path.join(DIR, "time_shifts_full_results.csv"), index_col=0
+    )
+    repeats = -(-number_of_rows // len(df))
+    df = pd.concat([df] * repeats, ignore_index=True).head(number_of_rows)
+    df["file_name"] = [f"{i}_{name}" for i, name in enumerate(df.file_name)]
+    return df
+
+
+def time_call(func, *args):
+    start_time = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start_time
+
+
+def benchmark_args(df: pd.DataFrame) -> dict[str, float]:
+    # format_tuple prints every value it formats when it has no logger
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        data_args_list, write_time = time_call(
+            prepare_json_for_marimo_args,
+            {"results_df": df.to_dict(orient="records")},
+        )
+
+    # What the template did with the arguments
+    def load():
+        rows = [json.loads(arg.split("=", 1)[1]) for arg in data_args_list]
+        return pd.DataFrame.from_records(rows)
+
+    _, read_time = time_call(load)
+    return {
+        "write_s": write_time,
+        "read_s": read_time,
+        "spawn_s": time_spawn(data_args_list),
+        "bytes": sum(len(arg.encode()) + 1 for arg in data_args_list),
+    }
+
+
+def benchmark_files(
+    df: pd.DataFrame, report_data_dir: str
+) -> dict[str, float]:
+    (results_file_path, summary_file_path), write_time = time_call(
+        write_private_report_data, df, report_data_dir
+    )
+
+    def load():
+        if results_file_path.endswith(".parquet"):
+            results_df = pd.read_parquet(results_file_path)
+        else:
+            results_df = pd.read_json(results_file_path, orient="records")
+        with open(summary_file_path) as f:
+            summary = json.load(f)
+        return results_df, summary
+
+    _, read_time = time_call(load)
+    data_args_list = [
+        f"--results_file={results_file_path}",
+        f"--summary_file={summary_file_path}",
+    ]
+    return {
+        "write_s": write_time,
+        "read_s": read_time,
+        "spawn_s": time_spawn(data_args_list),
+        "bytes": os.path.getsize(results_file_path)
+        + os.path.getsize(summary_file_path),
+    }
+
+
+def time_spawn(data_args_list: list[str]) -> float:
+    try:
+        _, spawn_time = time_call(
+            subprocess.run,
+            [sys.executable, "-c", "pass", *data_args_list],
+        )
+    except OSError:
+        # Argument list too long
+        return float("nan")
+    return spawn_time
+
+
+def main(argv: list[str]):
+    row_counts = [int(arg) for arg in argv] or [100, 1000, 10000, 50000]
+
+    print(f"ARG_MAX: {os.sysconf('SC_ARG_MAX')} bytes")
+
+    for number_of_rows in row_counts:
+        df = make_results_df(number_of_rows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(f"\n{number_of_rows} rows")
+            for name, stats in [
+                ("args", benchmark_args(df)),
+                ("files", benchmark_files(df, tmp_dir)),
+            ]:
+                spawn = (
+                    "failed (argument list too long)"
+                    if math.isnan(stats["spawn_s"])
+                    else f"{stats['spawn_s']:.3f}s"
+                )
+                print(
+                    f"  {name:>5}: write {stats['write_s']:.3f}s, "
+                    f"read {stats['read_s']:.3f}s, "
+                    f"spawn {spawn}, {stats['bytes']} bytes"
+                )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,11 +2,11 @@ import os
 from typing import Any, TypeVar
 import subprocess
 import json
+import tempfile
 import pandas as pd
 import logging
 from logging import Logger
 
-
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
@@ -103,6 +103,46 @@ def prepare_json_for_marimo_args(json_data: dict[str, Any]):
     return args_list
 
 
+def summarize_report_results(df: pd.DataFrame) -> dict[str, Any]:
+    numeric_df = df.select_dtypes(include="number")
+    stats = numeric_df.agg(["count", "mean", "median", "min", "max"])
+
+    columns: dict[str, Any] = {}
+    for column in stats.columns:
+        column_stats = stats[column]
+        columns[str(column)] = {
+            stat: (None if pd.isna(value) else float(value))
+            for stat, value in column_stats.items()
+        }
+        columns[str(column)]["count"] = int(column_stats["count"])
+
+    return {"number_of_rows": len(df), "columns": columns}
+
+
+def write_private_report_data(
+    df: pd.DataFrame, report_data_dir: str, logger: Logger | None = None
+) -> tuple[str, str]:
+    results_file_path = os.path.join(report_data_dir, "report_results.parquet")
+    try:
+        df.to_parquet(results_file_path, index=False)
+    except (ImportError, ValueError, TypeError) as e:
+        logger_if_able(
+            f"Could not write results as parquet, using JSON: {e}",
+            logger,
+            "WARNING",
+        )
+        results_file_path = os.path.join(
+            report_data_dir, "report_results.json"
+        )
+        df.to_json(results_file_path, orient="records")
+
+    summary_file_path = os.path.join(report_data_dir, "report_summary.json")
+    with open(summary_file_path, "w") as f:
+        json.dump(summarize_report_results(df), f)
+
+    return results_file_path, summary_file_path
+
+
 def generate_private_report_for_submission(
     df: pd.DataFrame,
     action: str,
@@ -110,14 +150,27 @@ def generate_private_report_for_submission(
     html_file_path: str,
     logger: Logger | None = None,
 ):
-    json_data: dict[str, Any] = {}
-    json_data["results_df"] = df.to_dict(orient="records")
+    with tempfile.TemporaryDirectory() as report_data_dir:
+        results_file_path, summary_file_path = write_private_report_data(
+            df, report_data_dir, logger
+        )
+        data_args_list = [
+            f"--results_file={results_file_path}",
+            f"--summary_file={summary_file_path}",
+        ]
 
-    data_args_list = prepare_json_for_marimo_args(json_data)
+        run_marimo_template(
+            data_args_list, action, template_file_path, html_file_path, logger
+        )
 
-    if not data_args_list or len(data_args_list) == 0:
-        raise ValueError("No data to pass to marimo")
 
+def run_marimo_template(
+    data_args_list: list[str],
+    action: str,
+    template_file_path: str,
+    html_file_path: str,
+    logger: Logger | None = None,
+):
     logger_if_able(f"Data as args: {data_args_list}", logger, "DEBUG")
 
     cli_commands = {
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from metric_operations import (
+    performance_metrics_map,
+    vectorized_performance_metrics_map,
+)
+
+
+@pytest.fixture
+def files():
+    """Outputs and references of three files of different lengths."""
+
+    rng = np.random.default_rng(0)
+    return {
+        f"{number}.csv": (
+            pd.Series(rng.normal(size=length)),
+            pd.Series(rng.normal(size=length)),
+        )
+        for number, length in enumerate([5, 1, 12])
+    }
+
+
+def stack(files, position: int) -> pd.Series:
+    """Long-format series of the outputs (0) or references (1)."""
+
+    return pd.concat(
+        [
+            pd.Series(
+                values[position].to_numpy(),
+                index=[name] * len(values[position]),
+            )
+            for name, values in files.items()
+        ]
+    )
+
+
+def test_vectorized_mean_absolute_error_matches_per_file(files):
+    mean_absolute_error = vectorized_performance_metrics_map["time_series"][
+        "mean_absolute_error"
+    ](stack(files, 0), stack(files, 1))
+
+    for file_name, (output, references) in files.items():
+        assert mean_absolute_error[file_name] == pytest.approx(
+            performance_metrics_map["mean_absolute_error"](
+                output.copy(), references
+            )
+        )
+
+
+@pytest.mark.parametrize("metric", ["absolute_error", "error"])
+def test_vectorized_scalar_metrics_match_per_file(metric: str):
+    outputs = pd.Series([1.5, -2.0, 30.0], index=["a", "b", "c"])
+    references = pd.Series([1.0, 2.0, 31.5], index=["a", "b", "c"])
+
+    values = vectorized_performance_metrics_map["scalar"][metric](
+        outputs, references
+    )
+
+    for file_name in outputs.index:
+        assert values[file_name] == pytest.approx(
+            performance_metrics_map[metric](
+                outputs[file_name], references[file_name]
+            )
+        )
@@ -0,0 +1,589 @@
+import json
+import os
+from types import ModuleType
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metric_operations import performance_metrics_map
+
+CHECKPOINT_S3_DIR = (
+    "submission_files/submission_user_1/submission_1/checkpoint/abc"
+)
+
+
+def write_time_series(path, values: np.ndarray):
+    pd.Series(
+        values,
+        index=pd.date_range("2024-01-01", periods=len(values), freq="15min"),
+        name="value",
+    ).to_csv(path)
+
+
+@pytest.fixture
+def time_series_evaluation(tmp_path):
+    """Submission outputs and references of three files on disk."""
+
+    data_dir = tmp_path / "data"
+    results_dir = tmp_path / "results"
+    os.makedirs(data_dir / "validation_data")
+    os.makedirs(results_dir)
+
+    rng = np.random.default_rng(1)
+    files: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+    for number, length in enumerate([96, 10, 300]):
+        file_name = f"{number}.csv"
+        output, references = rng.normal(size=(2, length))
+        write_time_series(results_dir / file_name, output)
+        write_time_series(data_dir / "validation_data" / file_name, references)
+        files[file_name] = (output, references)
+
+    metrics_inputs_df = pd.DataFrame(
+        {"file_name": list(files), "runtime": [1.0, 2.0, 3.0]}
+    )
+    return str(data_dir), str(results_dir), metrics_inputs_df, files
+
+
+TIME_SERIES_CONFIG = {
+    "comparison_type": "time_series",
+    "performance_metrics": ["runtime", "mean_absolute_error"],
+    "references_compare": ["time_series"],
+    "allowable_kwargs": [],
+}
+
+
+def test_metrics_for_files_equal_per_file_metrics(
+    runner: ModuleType, time_series_evaluation
+):
+    data_dir, results_dir, metrics_inputs_df, files = time_series_evaluation
+
+    results, number_of_errors = runner.generate_performance_metrics_for_files(
+        metrics_inputs_df, TIME_SERIES_CONFIG, results_dir, data_dir
+    )
+
+    assert number_of_errors == 0
+    assert [result["file_name"] for result in results] == list(files)
+    for result in results:
+        output, references = files[result["file_name"]]
+        assert result["mean_absolute_error_time_series"] == pytest.approx(
+            performance_metrics_map["mean_absolute_error"](
+                pd.Series(output), pd.Series(references)
+            )
+        )
+    assert [result["runtime"] for result in results] == [1.0, 2.0, 3.0]
+
+
+def test_file_with_wrong_output_length_is_an_error(
+    runner: ModuleType, time_series_evaluation
+):
+    data_dir, results_dir, metrics_inputs_df, files = time_series_evaluation
+    write_time_series(os.path.join(results_dir, "1.csv"), np.zeros(3))
+
+    results, number_of_errors = runner.generate_performance_metrics_for_files(
+        metrics_inputs_df, TIME_SERIES_CONFIG, results_dir, data_dir
+    )
+
+    assert number_of_errors == 1
+    assert [result["file_name"] for result in results] == ["0.csv", "2.csv"]
+
+
+def test_scalar_metrics_for_files_equal_per_file_metrics(
+    runner: ModuleType, tmp_path
+):
+    outputs = {"0.csv": (10.0, 25.0), "1.csv": (-4.0, 180.0)}
+    for file_name, (azimuth, tilt) in outputs.items():
+        pd.DataFrame({"azimuth": [azimuth], "tilt": [tilt]}).to_csv(
+            tmp_path / file_name
+        )
+    metrics_inputs_df = pd.DataFrame(
+        {
+            "file_name": list(outputs),
+            "runtime": [1.0, 1.0],
+            "azimuth": [12.5, 0.0],
+            "tilt": [20.0, 175.0],
+        }
+    )
+    config_data = {
+        "comparison_type": "scalar",
+        "performance_metrics": ["absolute_error", "error"],
+        "references_compare": ["azimuth", "tilt"],
+        "allowable_kwargs": [],
+    }
+
+    results, number_of_errors = runner.generate_performance_metrics_for_files(
+        metrics_inputs_df, config_data, str(tmp_path), str(tmp_path)
+    )
+
+    assert number_of_errors == 0
+    for result, row in zip(results, metrics_inputs_df.to_dict("records")):
+        for metric in ["absolute_error", "error"]:
+            for index, val in enumerate(["azimuth", "tilt"]):
+                assert result[f"{metric}_{val}"] == pytest.approx(
+                    performance_metrics_map[metric](
+                        outputs[row["file_name"]][index], row[val]
+                    )
+                )
+
+
+@pytest.fixture
+def finished_evaluation(tmp_path):
+    """Evaluation directories of a scalar analysis of four files, the last
+    of which has an output that is not numeric."""
+
+    data_dir = tmp_path / "data"
+    results_dir = tmp_path / "results"
+    evaluation_dir = tmp_path / "evaluation"
+    for directory in [data_dir / "metadata", results_dir / "files"]:
+        os.makedirs(directory)
+    os.makedirs(evaluation_dir)
+
+    file_names = [f"{number}.csv" for number in range(4)]
+    pd.DataFrame({"file_name": file_names, "system_id": [1, 2, 1, 2]}).to_csv(
+        data_dir / "metadata" / "file_metadata.csv", index=False
+    )
+    pd.DataFrame({"system_id": [1, 2], "azimuth": [180.0, 90.0]}).to_csv(
+        data_dir / "metadata" / "system_metadata.csv", index=False
+    )
+    for number, file_name in enumerate(file_names):
+        output = "north" if number == 3 else 170.0 + number
+        pd.DataFrame({"azimuth": [output]}).to_csv(
+            results_dir / "files" / file_name
+        )
+    pd.DataFrame(
+        {"file_name": file_names, "execution_time": [0.5, 1.5, 2.5, 3.5]}
+    ).to_csv(results_dir / "execution_time.csv", index=False)
+
+    with open(evaluation_dir / "config.json", "w") as f:
+        json.dump(
+            {
+                "comparison_type": "scalar",
+                "performance_metrics": ["runtime", "absolute_error"],
+                "references_compare": ["azimuth"],
+                "allowable_kwargs": [],
+            },
+            f,
+        )
+
+    return str(data_dir), str(results_dir), str(evaluation_dir)
+
+
+def submission_task_result(error: bool):
+    return {
+        "error": error,
+        "error_code": 1 if error else None,
+        "memory_limit": "8",
+        "peak_memory_gb": 0.5,
+        "oom_killed": False,
+        "execution_time": 1.0,
+    }
+
+
+def test_runtimes_are_read_as_they_are_appended(runner: ModuleType, tmp_path):
+    execution_file = tmp_path / "execution_time.csv"
+    execution_file.write_text("file_name,execution_time\n1.csv,1.5\n2.cs")
+    runtimes = runner.SubmissionRuntimeReader(str(tmp_path))
+
+    assert runtimes.get("1.csv") == 1.5
+    # The wrapper is still writing the row of 2.csv
+    assert runtimes.get("2.csv") is None
+
+    with open(execution_file, "a") as f:
+        f.write("v,2.5\n1.csv,9.0\n")
+
+    assert runtimes.get("2.csv") == 2.5
+    assert runtimes.get("1.csv") == 1.5
+
+
+def test_runtimes_before_the_first_file_finishes(runner: ModuleType, tmp_path):
+    assert runner.SubmissionRuntimeReader(str(tmp_path)).get("1.csv") is None
+
+
+def test_streamed_metrics_fold_into_the_same_results(
+    runner: ModuleType, finished_evaluation
+):
+    expected = runner.loop_over_results_and_generate_metrics(
+        *finished_evaluation
+    )
+    collector = runner.StreamingMetricsCollector(
+        *finished_evaluation,
+        runner.SubmissionRuntimeReader(finished_evaluation[1]),
+    )
+
+    # Finished out of order, with one file left to the final pass
+    for file_name in ["2.csv", "3.csv", "0.csv"]:
+        collector.on_file_completed(
+            (*[None] * 5, (file_name,)), submission_task_result(error=False)
+        )
+
+    assert set(collector.results) == {"0.csv", "2.csv"}
+    assert collector.failed_files == {"3.csv"}
+    assert (
+        runner.loop_over_results_and_generate_metrics(
+            *finished_evaluation, metrics_collector=collector
+        )
+        == expected
+    )
+    assert expected[1] == 1
+    assert [result["file_name"] for result in expected[0]] == [
+        "0.csv",
+        "1.csv",
+        "2.csv",
+    ]
+
+
+def test_failed_submission_files_are_not_streamed(
+    runner: ModuleType, finished_evaluation
+):
+    collector = runner.StreamingMetricsCollector(
+        *finished_evaluation,
+        runner.SubmissionRuntimeReader(finished_evaluation[1]),
+    )
+
+    collector.on_file_completed(
+        (*[None] * 5, ("0.csv",)), submission_task_result(error=True)
+    )
+
+    assert collector.results == {}
+    assert collector.failed_files == set()
+
+
+@pytest.fixture
+def s3_objects(
+    monkeypatch: pytest.MonkeyPatch, runner: ModuleType
+) -> dict[str, str]:
+    """Contents of the S3 bucket, by path."""
+
+    objects: dict[str, str] = {}
+
+    def upload_file_to_s3(local_file_path: str, s3_file_path: str):
+        with open(local_file_path) as f:
+            objects[f"{runner.S3_BUCKET_NAME}/{s3_file_path}"] = f.read()
+
+    def pull_from_s3(is_local, bucket_name, s3_file_path, local_dir, logger):
+        return bulk_pull_from_s3([(s3_file_path, local_dir)])[0]
+
+    def list_s3_bucket(s3_dir: str):
+        return [path for path in objects if path.startswith(s3_dir)]
+
+    def bulk_pull_from_s3(manifest: list[tuple[str, str]], **kwargs):
+        local_paths: list[str] = []
+        for s3_file_path, local_dir in manifest:
+            os.makedirs(local_dir, exist_ok=True)
+            local_path = os.path.join(
+                local_dir, os.path.basename(s3_file_path)
+            )
+            with open(local_path, "w") as f:
+                f.write(objects[s3_file_path])
+            local_paths.append(local_path)
+        return local_paths
+
+    monkeypatch.setattr(runner, "upload_file_to_s3", upload_file_to_s3)
+    monkeypatch.setattr(runner, "pull_from_s3", pull_from_s3)
+    monkeypatch.setattr(runner, "list_s3_bucket", list_s3_bucket)
+    monkeypatch.setattr(runner, "bulk_pull_from_s3", bulk_pull_from_s3)
+    return objects
+
+
+@pytest.fixture
+def checkpointed_results(
+    runner: ModuleType, s3_objects: dict[str, str], tmp_path
+):
+    """Checkpoint 1.csv and 2.csv of an interrupted evaluation."""
+
+    results_dir = tmp_path / "interrupted"
+    (results_dir / "files").mkdir(parents=True)
+    (results_dir / "submission_function_info.json").write_text("{}")
+    pd.DataFrame(
+        {"file_name": ["1.csv", "2.csv"], "execution_time": [1.5, 2.5]}
+    ).to_csv(results_dir / "execution_time.csv", index=False)
+
+    writer = runner.CheckpointWriter(
+        CHECKPOINT_S3_DIR,
+        str(results_dir),
+        pd.DataFrame(
+            {"file_name": ["1.csv", "2.csv"], "file_hash": ["hash-1", "old"]}
+        ),
+        runner.SubmissionRuntimeReader(str(results_dir)),
+    )
+    for file_name in ["1.csv", "2.csv"]:
+        (results_dir / "files" / file_name).write_text(f"output {file_name}")
+        writer.on_file_completed(
+            (*[None] * 5, (file_name,)), submission_task_result(error=False)
+        )
+    writer.close()
+
+    return s3_objects
+
+
+def restore(runner: ModuleType, tmp_path, file_hashes: dict[str, str]):
+    return runner.restore_checkpoint(
+        CHECKPOINT_S3_DIR,
+        str(tmp_path / "results"),
+        pd.DataFrame(
+            {
+                "file_name": list(file_hashes),
+                "file_hash": list(file_hashes.values()),
+            }
+        ),
+        str(tmp_path / "tmp"),
+    )
+
+
+def test_restore_checkpoint_drops_files_whose_hash_changed(
+    runner: ModuleType, checkpointed_results: dict[str, str], tmp_path
+):
+    restored_files = restore(
+        runner,
+        tmp_path,
+        {"1.csv": "hash-1", "2.csv": "hash-2", "3.csv": "hash-3"},
+    )
+
+    results_dir = tmp_path / "results"
+    assert restored_files == {"1.csv"}
+    assert (results_dir / "files" / "1.csv").read_text() == "output 1.csv"
+    assert not (results_dir / "files" / "2.csv").exists()
+    assert (results_dir / "submission_function_info.json").exists()
+    assert pd.read_csv(results_dir / "execution_time.csv").to_dict(
+        orient="records"
+    ) == [{"file_name": "1.csv", "execution_time": 1.5}]
+
+
+def test_restore_checkpoint_without_checkpoint(
+    runner: ModuleType, s3_objects: dict[str, str], tmp_path
+):
+    assert restore(runner, tmp_path, {"1.csv": "hash-1"}) == set()
+
+
+def test_restore_checkpoint_evaluates_all_files_on_errors(
+    runner: ModuleType, checkpointed_results: dict[str, str], tmp_path
+):
+    del checkpointed_results[
+        f"{runner.S3_BUCKET_NAME}/{CHECKPOINT_S3_DIR}/files/1.csv"
+    ]
+
+    assert restore(runner, tmp_path, {"1.csv": "hash-1"}) == set()
+    assert not (tmp_path / "results" / "execution_time.csv").exists()
+
+
+def function_args_for(file_names: list[str]):
+    return [
+        (1, "image", "1", "submission.py", "detect", (file_name,))
+        for file_name in file_names
+    ]
+
+
+def test_test_files_are_the_cheapest(runner: ModuleType):
+    file_costs = {
+        "a.csv": 5.0,
+        "b.csv": 1.0,
+        "c.csv": 9.0,
+        "d.csv": 3.0,
+        "e.csv": 2.0,
+        "f.csv": 7.0,
+    }
+    file_rows = {name: 100 for name in file_costs} | {"a.csv": 500}
+
+    ordered = runner.order_function_args_by_cost(
+        function_args_for(list(file_costs)), file_costs, file_rows
+    )
+
+    # The largest file runs first of the rest, then the others from the
+    # most to the least expensive
+    assert [function_args[5][0] for function_args in ordered] == [
+        "b.csv",
+        "e.csv",
+        "d.csv",
+        "a.csv",
+        "c.csv",
+        "f.csv",
+    ]
+
+
+def test_without_rows_the_rest_run_by_cost(runner: ModuleType):
+    file_costs = {"a.csv": 5.0, "b.csv": 1.0, "c.csv": 9.0, "d.csv": 3.0}
+
+    ordered = runner.order_function_args_by_cost(
+        function_args_for(list(file_costs)), file_costs
+    )
+
+    assert [function_args[5][0] for function_args in ordered] == [
+        "b.csv",
+        "d.csv",
+        "a.csv",
+        "c.csv",
+    ]
+
+
+def write_data_files(data_dir, rows: dict[str, int]):
+    (data_dir / "file_data").mkdir(parents=True)
+    for file_name, number_of_rows in rows.items():
+        time_series = pd.DataFrame(
+            {"power": np.arange(number_of_rows, dtype=float)},
+            index=pd.date_range(
+                "2024-01-01", periods=number_of_rows, freq="5min"
+            ),
+        )
+        time_series.to_csv(data_dir / "file_data" / file_name)
+    return str(data_dir)
+
+
+def test_file_rows_are_counted_without_parsing(runner: ModuleType, tmp_path):
+    data_dir = write_data_files(tmp_path, {"1.csv": 100, "2.csv": 300})
+    pd.DataFrame({"power": np.zeros(50)}).to_parquet(
+        tmp_path / "file_data" / "2.parquet"
+    )
+
+    # The columnar copy is preferred, as it is when the file is read
+    assert runner.get_data_file_rows(
+        ["1.csv", "2.csv", "3.csv"], data_dir
+    ) == {"1.csv": 100, "2.csv": 50, "3.csv": 0}
+
+
+def test_file_costs_without_history_follow_file_rows(runner: ModuleType):
+    file_rows = {"1.csv": 100, "2.csv": 300, "3.csv": 0}
+
+    assert runner.estimate_file_costs(
+        ["1.csv", "2.csv", "3.csv"], file_rows, {}, {}
+    ) == {
+        "1.csv": 100.0,
+        "2.csv": 300.0,
+        "3.csv": 0.0,
+    }
+
+
+def test_file_costs_of_new_files_are_scaled_by_known_runtimes(
+    runner: ModuleType,
+):
+    file_rows = {"1.csv": 100, "2.csv": 200, "3.csv": 400}
+    runtime_history = {
+        "1.csv": {"runtime": 2.0, "count": 3},
+        "2.csv": {"runtime": 4.0, "count": 3},
+    }
+
+    file_costs = runner.estimate_file_costs(
+        ["1.csv", "2.csv", "3.csv"], file_rows, {}, runtime_history
+    )
+
+    assert file_costs == pytest.approx(
+        {"1.csv": 2.0, "2.csv": 4.0, "3.csv": 8.0}
+    )
+
+
+def test_file_costs_are_scaled_by_files_of_the_same_frequency(
+    runner: ModuleType,
+):
+    file_rows = {"1.csv": 100, "2.csv": 100, "3.csv": 400, "4.csv": 400}
+    sampling_frequencies = {"1.csv": 1, "2.csv": 15, "3.csv": 1, "4.csv": 5}
+    runtime_history = {
+        "1.csv": {"runtime": 1.0, "count": 3},
+        "2.csv": {"runtime": 3.0, "count": 3},
+    }
+
+    file_costs = runner.estimate_file_costs(
+        list(file_rows), file_rows, sampling_frequencies, runtime_history
+    )
+
+    # Without a file of its frequency the median of all files is used
+    assert file_costs == pytest.approx(
+        {"1.csv": 1.0, "2.csv": 3.0, "3.csv": 4.0, "4.csv": 8.0}
+    )
+
+
+def write_runtimes(results_dir, runtimes: dict[str, float]):
+    results_dir.mkdir(exist_ok=True)
+    pd.DataFrame(
+        {
+            "file_name": list(runtimes),
+            "execution_time": list(runtimes.values()),
+        }
+    ).to_csv(results_dir / "execution_time.csv", index=False)
+    return str(results_dir)
+
+
+def test_runtime_history_is_a_moving_average(
+    monkeypatch: pytest.MonkeyPatch,
+    runner: ModuleType,
+    s3_objects: dict[str, str],
+    tmp_path,
+):
+    monkeypatch.setattr(runner, "RUNTIME_HISTORY_WINDOW", 2)
+    results_dir = tmp_path / "results"
+
+    for runtime in [4.0, 8.0, 16.0]:
+        runner.update_runtime_history(
+            7,
+            write_runtimes(results_dir, {"1.csv": runtime}),
+            str(tmp_path),
+        )
+
+    # (4 + 8) / 2 = 6, then the window of two averages in 16 by half
+    assert runner.load_runtime_history(7, str(tmp_path)) == {
+        "1.csv": {"runtime": 11.0, "count": 2}
+    }
+    assert runner.load_runtime_history(8, str(tmp_path)) == {}
+
+
+def test_wilson_lower_bound(runner: ModuleType):
+    assert runner.wilson_lower_bound(0, 0, 0.95) == 0.0
+    assert runner.wilson_lower_bound(0, 10, 0.95) == pytest.approx(0.0)
+    assert runner.wilson_lower_bound(5, 10, 0.95) == pytest.approx(
+        0.2693, abs=1e-4
+    )
+    # More evidence for the same proportion tightens the bound
+    assert runner.wilson_lower_bound(
+        50, 100, 0.95
+    ) > runner.wilson_lower_bound(5, 10, 0.95)
+    assert runner.wilson_lower_bound(5, 10, 0.99) < runner.wilson_lower_bound(
+        5, 10, 0.95
+    )
+
+
+def complete_files(policy, errors: list[bool]):
+    for error in errors:
+        policy.on_file_completed((), submission_task_result(error=error))
+
+
+def test_early_termination_waits_for_min_files(runner: ModuleType):
+    policy = runner.EarlyTerminationPolicy(max_error_rate=0.1, min_files=10)
+
+    complete_files(policy, [True] * 9)
+
+
+def test_early_termination_stops_failing_submission(
+    runner: ModuleType, utility: ModuleType
+):
+    policy = runner.EarlyTerminationPolicy(max_error_rate=0.1, min_files=10)
+    complete_files(policy, [True] * 9)
+
+    with pytest.raises(utility.RunnerException) as exc_info:
+        complete_files(policy, [True])
+
+    assert exc_info.value.error_rate == 1.0
+
+
+def test_early_termination_lets_working_submission_finish(
+    runner: ModuleType,
+):
+    policy = runner.EarlyTerminationPolicy(max_error_rate=0.5, min_files=10)
+
+    complete_files(policy, [number % 4 == 0 for number in range(100)])
+
+
+def test_early_termination_keeps_the_test_files(runner: ModuleType):
+    policy = runner.EarlyTerminationPolicy(max_error_rate=0.1, min_files=1)
+
+    assert policy.min_files == runner.NUM_FILES_TO_TEST + 1
+
+
+def test_early_termination_is_configured_per_analysis(runner: ModuleType):
+    assert runner.EarlyTerminationPolicy.from_config({}) is None
+
+    policy = runner.EarlyTerminationPolicy.from_config(
+        {"early_termination": {"max_error_rate": 0.2, "min_files": 20}}
+    )
+
+    assert policy is not None
+    assert policy.max_error_rate == 0.2
+    assert policy.confidence == 0.95
+    assert policy.min_files == 20
@@ -0,0 +1,447 @@
+import json
+import os
+import sys
+from types import ModuleType
+from typing import Any
+
+import pytest
+import requests
+
+
+class RecordingSQSClient:
+    def __init__(self, failed_ids: set[str] | None = None):
+        self.batches: list[list[dict[str, Any]]] = []
+        self.failed_ids = failed_ids or set()
+
+    def change_message_visibility_batch(
+        self, QueueUrl: str, Entries: list[dict[str, Any]]
+    ):
+        self.batches.append(Entries)
+        return {
+            "Failed": [
+                {"Id": entry["Id"], "Message": "expired"}
+                for entry in Entries
+                if entry["Id"] in self.failed_ids
+            ]
+        }
+
+
+def test_heartbeat_extends_messages_in_batches_of_ten(worker: ModuleType):
+    heartbeat = worker.VisibilityHeartbeat("queue", timeout=300)
+    for index in range(23):
+        heartbeat.add(f"message-{index}", f"receipt-{index}")
+    heartbeat.remove("message-5")
+    sqs = RecordingSQSClient()
+
+    heartbeat.extend_visibility(sqs)
+
+    assert [len(entries) for entries in sqs.batches] == [10, 10, 2]
+    receipt_handles = [
+        entry["ReceiptHandle"] for entries in sqs.batches for entry in entries
+    ]
+    assert sorted(receipt_handles) == sorted(
+        f"receipt-{index}" for index in range(23) if index != 5
+    )
+    for entries in sqs.batches:
+        assert len({entry["Id"] for entry in entries}) == len(entries)
+        assert {entry["VisibilityTimeout"] for entry in entries} == {300}
+
+
+def test_heartbeat_keeps_going_after_failed_entries(worker: ModuleType):
+    heartbeat = worker.VisibilityHeartbeat("queue", timeout=300)
+    for index in range(12):
+        heartbeat.add(f"message-{index}", f"receipt-{index}")
+    sqs = RecordingSQSClient(failed_ids={"0"})
+
+    heartbeat.extend_visibility(sqs)
+
+    assert [len(entries) for entries in sqs.batches] == [10, 2]
+
+
+def test_heartbeat_without_messages_sends_nothing(worker: ModuleType):
+    heartbeat = worker.VisibilityHeartbeat("queue", timeout=300)
+    sqs = RecordingSQSClient()
+
+    heartbeat.extend_visibility(sqs)
+
+    assert sqs.batches == []
+
+
+class FakeBucket:
+    """S3 stand-in for the worker's pull and upload helpers."""
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.objects: dict[str, bytes] = {}
+
+    def key(self, s3_file_path: str) -> str:
+        return s3_file_path.removeprefix(f"{self.bucket_name}/")
+
+    def pull(self, is_local, bucket_name, s3_file_path, local_dir, logger):
+        key = self.key(s3_file_path)
+        if key not in self.objects:
+            raise requests.HTTPError(f"404 {key}")
+        local_path = os.path.join(local_dir, os.path.basename(key))
+        with open(local_path, "wb") as f:
+            f.write(self.objects[key])
+        return local_path
+
+    def bulk_pull(self, manifest: list[tuple[str, str]], logger=None):
+        return [self.pull(True, None, *pair, logger) for pair in manifest]
+
+    def upload(self, local_file_path: str, s3_file_path: str):
+        with open(local_file_path, "rb") as f:
+            self.objects[s3_file_path] = f.read()
+
+
+@pytest.fixture
+def bucket(monkeypatch: pytest.MonkeyPatch, worker: ModuleType):
+    bucket = FakeBucket(worker.S3_BUCKET_NAME)
+    monkeypatch.setattr(worker, "pull_from_s3", bucket.pull)
+    monkeypatch.setattr(worker, "bulk_pull_from_s3", bucket.bulk_pull)
+    monkeypatch.setattr(worker, "upload_file_to_s3", bucket.upload)
+    return bucket
+
+
+@pytest.fixture
+def published(monkeypatch: pytest.MonkeyPatch, worker: ModuleType):
+    published: list[tuple[int, int, dict[str, Any], list[str]]] = []
+
+    def publish_evaluation_results(
+        submission_id, user_id, result, current_evaluation_dir
+    ):
+        results_dir = os.path.join(current_evaluation_dir, "results")
+        published.append(
+            (
+                submission_id,
+                user_id,
+                result,
+                sorted(
+                    os.path.relpath(os.path.join(dir_path, name), results_dir)
+                    for dir_path, _, names in os.walk(results_dir)
+                    for name in names
+                ),
+            )
+        )
+
+    monkeypatch.setattr(
+        worker, "publish_evaluation_results", publish_evaluation_results
+    )
+    monkeypatch.setattr(
+        worker, "create_blank_error_report", lambda *args, **kwargs: None
+    )
+    return published
+
+
+FILE_RESULTS = [{"file_name": "1.csv", "runtime": 1.0, "metrics": {}}]
+
+
+def write_results(
+    evaluation_dir,
+    number_of_errors: int,
+    file_names: list[str],
+    file_results: list[dict[str, Any]] | None = FILE_RESULTS,
+):
+    results_dir = evaluation_dir / "results"
+    for file_name in file_names:
+        (results_dir / file_name).parent.mkdir(parents=True, exist_ok=True)
+        (results_dir / file_name).write_text(file_name)
+    (results_dir / "evaluation_summary.json").write_text(
+        json.dumps({"number_of_errors": number_of_errors})
+    )
+    if file_results is not None:
+        (results_dir / "submission_file_results.json").write_text(
+            json.dumps(file_results)
+        )
+
+
+@pytest.fixture
+def posted_file_results(
+    monkeypatch: pytest.MonkeyPatch, worker: ModuleType
+) -> list[tuple[int, list]]:
+    posted: list[tuple[int, list]] = []
+    monkeypatch.setattr(
+        worker,
+        "upload_submission_file_results",
+        lambda submission_id, rows, logger=None: posted.append(
+            (submission_id, rows)
+        ),
+    )
+    return posted
+
+
+def test_evaluation_without_stored_results_is_not_reused(
+    worker: ModuleType, bucket: FakeBucket, published: list, tmp_path
+):
+    assert not worker.reuse_memoized_evaluation(
+        "fingerprint", 2, 20, str(tmp_path)
+    )
+    assert published == []
+
+
+def test_stored_evaluation_is_reused(
+    worker: ModuleType,
+    bucket: FakeBucket,
+    published: list,
+    posted_file_results: list,
+    tmp_path,
+):
+    first_dir = tmp_path / "first"
+    write_results(first_dir, 0, ["1.csv", "figures/1.png"])
+    worker.memoize_evaluation(
+        "fingerprint", 1, 10, {"mean_mae": 0.5}, str(first_dir), tmp_path
+    )
+    # The stored memo points at the first submission's uploaded results
+    results_path = "submission_files/submission_user_10/submission_1/results"
+    for file_name in [
+        "1.csv",
+        "figures/1.png",
+        "evaluation_summary.json",
+        "submission_file_results.json",
+    ]:
+        bucket.objects[f"{results_path}/{file_name}"] = file_name.encode()
+
+    assert worker.reuse_memoized_evaluation(
+        "fingerprint", 2, 20, str(tmp_path / "second")
+    )
+    assert published == [
+        (
+            2,
+            20,
+            {"mean_mae": 0.5},
+            [
+                "1.csv",
+                "evaluation_summary.json",
+                "figures/1.png",
+                "submission_file_results.json",
+            ],
+        )
+    ]
+    assert posted_file_results == [(2, FILE_RESULTS)]
+
+
+def test_evaluation_without_file_results_is_not_stored(
+    worker: ModuleType, bucket: FakeBucket, tmp_path
+):
+    write_results(tmp_path, 0, ["1.csv"], file_results=None)
+
+    worker.memoize_evaluation(
+        "fingerprint", 1, 10, {"mean_mae": 0.5}, str(tmp_path), tmp_path
+    )
+
+    assert bucket.objects == {}
+
+
+def test_evaluation_stored_without_file_results_is_not_reused(
+    worker: ModuleType, bucket: FakeBucket, published: list, tmp_path
+):
+    bucket.objects["evaluation_cache/fingerprint.json"] = json.dumps(
+        {"submission_id": 1, "user_id": 10, "result": {}, "result_files": []}
+    ).encode()
+
+    assert not worker.reuse_memoized_evaluation(
+        "fingerprint", 2, 20, str(tmp_path)
+    )
+    assert published == []
+
+
+def test_evaluation_with_file_errors_is_not_stored(
+    worker: ModuleType, bucket: FakeBucket, tmp_path
+):
+    write_results(tmp_path, 1, ["1.csv"])
+
+    worker.memoize_evaluation(
+        "fingerprint", 1, 10, {"mean_mae": 0.5}, str(tmp_path), tmp_path
+    )
+
+    assert bucket.objects == {}
+
+
+@pytest.fixture
+def renders(
+    monkeypatch: pytest.MonkeyPatch, worker: ModuleType, tmp_path
+) -> list[str]:
+    """Report keys rendered by marimo, which is stubbed out."""
+
+    renders: list[str] = []
+
+    def render_private_report_from_files(
+        report_input_dir, request, html_file_path, logger=None
+    ):
+        with open(
+            os.path.join(report_input_dir, request["results_file"])
+        ) as f:
+            results = f.read()
+        with open(html_file_path, "w") as f:
+            f.write(f"<html>{results}</html>")
+        renders.append(request["report_key"])
+
+    monkeypatch.setattr(
+        worker,
+        "render_private_report_from_files",
+        render_private_report_from_files,
+    )
+    # Set by the worker's entry point
+    monkeypatch.setattr(worker, "BASE_TEMP_DIR", str(tmp_path), raising=False)
+    return renders
+
+
+def report_message(submission_id: int, report_key: str):
+    return {
+        "submission_id": submission_id,
+        "user_id": 10,
+        "report_key": report_key,
+        "results_file": "results.csv",
+        "summary_file": "summary.json",
+    }
+
+
+def published_report(bucket: FakeBucket, submission_id: int) -> bytes:
+    return bucket.objects[
+        f"submission_files/submission_user_10/submission_{submission_id}"
+        "/results/private_results.html"
+    ]
+
+
+def test_private_report_is_rendered_once_per_key(
+    worker: ModuleType, bucket: FakeBucket, renders: list[str]
+):
+    for file_name, content in [
+        ("template.py", b"import marimo"),
+        ("results.csv", b"mae,0.5"),
+        ("summary.json", b"{}"),
+    ]:
+        bucket.objects[f"private_report_cache/key/{file_name}"] = content
+
+    worker.render_private_report(report_message(1, "key"))
+    worker.render_private_report(report_message(2, "key"))
+
+    assert renders == ["key"]
+    assert bucket.objects["private_report_cache/key/private_results.html"] == (
+        b"<html>mae,0.5</html>"
+    )
+    assert published_report(bucket, 1) == b"<html>mae,0.5</html>"
+    assert published_report(bucket, 2) == b"<html>mae,0.5</html>"
+
+
+def test_private_report_without_inputs_fails(
+    worker: ModuleType, bucket: FakeBucket, renders: list[str]
+):
+    with pytest.raises(requests.HTTPError):
+        worker.render_private_report(report_message(1, "missing"))
+
+    assert renders == []
+    assert bucket.objects == {}
+
+
+def test_runner_module_is_loaded_once_without_changing_sys_path(
+    monkeypatch: pytest.MonkeyPatch, worker: ModuleType
+):
+    monkeypatch.setattr(worker, "RUNNER_MODULE", None)
+    # Restored afterwards, other tests keep their own runner module
+    monkeypatch.setitem(sys.modules, worker.RUNNER_MODULE_NAME, None)
+    sys_path = list(sys.path)
+
+    runner = worker.get_runner_module()
+
+    assert worker.get_runner_module() is runner
+    assert callable(runner.run)
+    assert sys.modules[worker.RUNNER_MODULE_NAME] is runner
+    assert sys.path == sys_path
+
+
+@pytest.fixture
+def worker_source(
+    monkeypatch: pytest.MonkeyPatch, worker: ModuleType, tmp_path
+):
+    """A copy of the worker's source files for fingerprinting, with the
+    submission archive and the analysis served by stubs."""
+
+    source_dir = tmp_path / "src"
+    for file_name in worker.EVALUATION_FINGERPRINT_FILES:
+        (source_dir / file_name).parent.mkdir(parents=True, exist_ok=True)
+        (source_dir / file_name).write_text(f"# {file_name}")
+    monkeypatch.setattr(worker, "FILE_DIR", str(source_dir))
+
+    def pull_from_s3(is_local, bucket_name, s3_file_path, local_dir, logger):
+        archive_path = os.path.join(local_dir, "submission.zip")
+        with open(archive_path, "wb") as f:
+            f.write(b"archive")
+        return archive_path
+
+    monkeypatch.setattr(worker, "pull_from_s3", pull_from_s3)
+    monkeypatch.setattr(
+        worker,
+        "request_to_API_w_credentials",
+        lambda *args, **kwargs: {"hash": "abc", "version": 1},
+    )
+    return source_dir
+
+
+def fingerprint(worker: ModuleType, tmp_path) -> str:
+    return worker.get_evaluation_fingerprint(
+        1, 10, 100, "3.11", "submission.zip", str(tmp_path)
+    )
+
+
+def test_fingerprint_changes_with_the_worker_utilities(
+    worker: ModuleType, worker_source, tmp_path
+):
+    before = fingerprint(worker, tmp_path)
+    assert fingerprint(worker, tmp_path) == before
+
+    (worker_source / "utility.py").write_text("# changed")
+
+    assert fingerprint(worker, tmp_path) != before
+
+
+class QueuedMessage:
+    def __init__(self, message_id: str, group_id: str | None):
+        self.message_id = message_id
+        self.receipt_handle = f"receipt-{message_id}"
+        self.attributes = (
+            {"MessageGroupId": group_id} if group_id is not None else {}
+        )
+
+    def change_visibility(self, VisibilityTimeout: int):
+        raise AssertionError("a received message was released")
+
+
+def test_messages_are_grouped_in_queue_order(worker: ModuleType):
+    messages = [
+        QueuedMessage("1", "user_1_lane_0"),
+        QueuedMessage("2", "user_2_lane_0"),
+        QueuedMessage("3", "user_1_lane_0"),
+        QueuedMessage("4", None),
+        QueuedMessage("5", "user_1_lane_0"),
+    ]
+
+    groups = worker.group_messages_in_order(messages)
+
+    assert [[m.message_id for m in group] for group in groups] == [
+        ["1", "3", "5"],
+        ["2"],
+        ["4"],
+    ]
+
+
+def test_a_groups_messages_are_all_drained_in_order(
+    monkeypatch: pytest.MonkeyPatch, worker: ModuleType
+):
+    handled: list[str] = []
+
+    def handle_submission_message(message: QueuedMessage, heartbeat):
+        handled.append(message.message_id)
+        if message.message_id == "2":
+            raise ValueError("analysis_id is None")
+
+    monkeypatch.setattr(
+        worker, "handle_submission_message", handle_submission_message
+    )
+    messages = [QueuedMessage(str(n), "user_1_lane_0") for n in range(1, 5)]
+
+    (group,) = worker.group_messages_in_order(messages)
+    worker.handle_submission_messages(group, heartbeat=None)
+
+    # A bad message does not hold back the rest of its group
+    assert handled == ["1", "2", "3", "4"]
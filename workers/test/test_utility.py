@@ -0,0 +1,1115 @@
+import json
+import logging
+import os
+import threading
+import time
+from types import ModuleType
+
+import botocore.exceptions
+import pytest
+import requests
+
+
+def write_file(path, size: int) -> str:
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return str(path)
+
+
+@pytest.fixture
+def file_cache(utility: ModuleType, tmp_path):
+    # 250 bytes, room for two of the 100 byte test files
+    return utility.LocalFileCache(
+        str(tmp_path / "cache"), max_size=250 / 1024**3
+    )
+
+
+def test_cache_key_needs_an_etag(utility: ModuleType):
+    assert utility.LocalFileCache.make_key("hash", None) is None
+    assert utility.LocalFileCache.make_key(
+        "hash", '"etag"'
+    ) == utility.LocalFileCache.make_key("hash", "etag")
+    assert utility.LocalFileCache.make_key(
+        "hash", "etag"
+    ) != utility.LocalFileCache.make_key("other-hash", "etag")
+
+
+def test_cached_file_is_hard_linked(file_cache, tmp_path):
+    downloaded = write_file(tmp_path / "downloaded.csv", 100)
+    file_cache.put("a" * 64, downloaded)
+
+    dest_path = str(tmp_path / "evaluation.csv")
+    assert file_cache.get("a" * 64, dest_path)
+
+    assert os.path.samefile(dest_path, file_cache.cached_file_path("a" * 64))
+    assert file_cache.hits == 1
+    assert file_cache.bytes_from_cache == 100
+    assert file_cache.bytes_downloaded == 100
+
+
+def test_cache_miss(file_cache, tmp_path):
+    dest_path = str(tmp_path / "evaluation.csv")
+
+    assert not file_cache.get("b" * 64, dest_path)
+    assert not file_cache.get(None, dest_path)
+
+    assert not os.path.exists(dest_path)
+    assert file_cache.misses == 2
+
+
+def test_least_recently_used_file_is_evicted(file_cache, tmp_path):
+    keys = ["a" * 64, "b" * 64, "c" * 64]
+    file_cache.put(keys[0], write_file(tmp_path / "0.csv", 100))
+    file_cache.put(keys[1], write_file(tmp_path / "1.csv", 100))
+    os.utime(file_cache.cached_file_path(keys[0]), (1, 1))
+    os.utime(file_cache.cached_file_path(keys[1]), (2, 2))
+    # Using the oldest entry makes the other one the least recently used
+    assert file_cache.get(keys[0], str(tmp_path / "used.csv"))
+
+    file_cache.put(keys[2], write_file(tmp_path / "2.csv", 100))
+
+    assert os.path.exists(file_cache.cached_file_path(keys[0]))
+    assert not os.path.exists(file_cache.cached_file_path(keys[1]))
+    assert os.path.exists(file_cache.cached_file_path(keys[2]))
+    assert file_cache.size_bytes == 200
+
+
+def test_cache_size_survives_restart(
+    utility: ModuleType, file_cache, tmp_path
+):
+    file_cache.put("a" * 64, write_file(tmp_path / "0.csv", 100))
+
+    restarted = utility.LocalFileCache(file_cache.cache_dir, max_size=1)
+
+    assert restarted.size_bytes == 100
+
+
+@pytest.fixture
+def sleeps(monkeypatch: pytest.MonkeyPatch, utility: ModuleType):
+    """Backoff delays, recorded instead of slept."""
+
+    delays: list[float] = []
+    monkeypatch.setattr(utility.time, "sleep", delays.append)
+    return delays
+
+
+def flaky(failures: list[Exception], result: str = "done"):
+    """A transfer that raises each of `failures` once before succeeding."""
+
+    calls: list[int] = []
+
+    def transfer() -> str:
+        calls.append(1)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return result
+
+    transfer.calls = calls
+    return transfer
+
+
+def test_retry_succeeds_after_transient_failures(
+    utility: ModuleType, sleeps: list[float]
+):
+    transfer = flaky([ConnectionError("reset"), ConnectionError("reset")])
+
+    assert utility.retry_with_backoff(transfer, retries=3) == "done"
+    assert len(transfer.calls) == 3
+    assert sleeps == [1.0, 2.0]
+
+
+def test_retry_gives_up_after_retries(
+    utility: ModuleType, sleeps: list[float]
+):
+    transfer = flaky([ConnectionError(str(attempt)) for attempt in range(5)])
+
+    with pytest.raises(ConnectionError, match="2"):
+        utility.retry_with_backoff(transfer, retries=2, backoff=0.5)
+    assert len(transfer.calls) == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def http_response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def client_error(code: str, status_code: int):
+    return botocore.exceptions.ClientError(
+        {
+            "Error": {"Code": code},
+            "ResponseMetadata": {"HTTPStatusCode": status_code},
+        },
+        "GetObject",
+    )
+
+
+def missing_object_error():
+    # As pull_from_s3 raises it
+    try:
+        raise client_error("404", 404)
+    except botocore.exceptions.ClientError as e:
+        raise requests.HTTPError(2, "not found in s3 bucket") from e
+
+
+def test_missing_object_is_not_retried(
+    utility: ModuleType, sleeps: list[float]
+):
+    with pytest.raises(requests.HTTPError) as exc_info:
+        utility.retry_with_backoff(missing_object_error)
+
+    assert not utility.is_retryable_transfer_error(exc_info.value)
+    assert sleeps == []
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (client_error("SlowDown", 503), True),
+        (client_error("Throttling", 400), True),
+        (client_error("AccessDenied", 403), False),
+        (requests.HTTPError(response=http_response(500)), True),
+        (requests.HTTPError(response=http_response(429)), True),
+        (requests.HTTPError(response=http_response(404)), False),
+        (requests.ConnectionError("reset"), True),
+        (TimeoutError(), True),
+        (ValueError("bad manifest"), False),
+    ],
+)
+def test_transient_transfer_errors_are_retryable(
+    utility: ModuleType, error: Exception, retryable: bool
+):
+    assert utility.is_retryable_transfer_error(error) == retryable
+
+
+def test_s3_transfers_keep_manifest_order(utility: ModuleType):
+    manifest = [(f"s3/{number}.csv", "local") for number in range(20)]
+
+    results = utility.run_s3_transfers(
+        lambda source, destination: f"{destination}/{source[3:]}",
+        manifest,
+        lambda source, destination: 10,
+        "Downloaded",
+        max_workers=4,
+    )
+
+    assert results == [f"local/{number}.csv" for number in range(20)]
+
+
+def test_s3_transfers_raise_the_first_error(
+    utility: ModuleType, sleeps: list[float]
+):
+    def transfer(source: str, destination: str):
+        if source == "s3/bad.csv":
+            raise FileNotFoundError(source)
+        return source
+
+    with pytest.raises(FileNotFoundError, match="bad"):
+        utility.run_s3_transfers(
+            transfer,
+            [("s3/good.csv", "local"), ("s3/bad.csv", "local")],
+            lambda source, destination: 10,
+            "Downloaded",
+        )
+
+
+@pytest.fixture
+def dask_cluster(utility: ModuleType):
+    """Closes the worker's shared cluster, which the tests run in-process."""
+
+    yield {"processes": False, "dashboard_address": None}
+    utility.close_dask_client()
+
+
+def test_dask_client_is_reused(utility: ModuleType, dask_cluster):
+    client = utility.get_dask_client(**dask_cluster)
+
+    assert utility.get_dask_client(**dask_cluster) is client
+    assert client.status == "running"
+
+
+def test_dask_client_is_recreated_once_closed(
+    utility: ModuleType, dask_cluster
+):
+    client = utility.get_dask_client(**dask_cluster)
+    client.close()
+
+    recreated = utility.get_dask_client(**dask_cluster)
+
+    assert recreated is not client
+    assert recreated.status == "running"
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+def test_dask_multiprocess_reports_results_as_they_finish(
+    utility: ModuleType, dask_cluster
+):
+    finished: list[tuple[tuple[int, int], int]] = []
+    function_args_list = [(number, 10) for number in range(8)]
+
+    results = utility.dask_multiprocess(
+        add,
+        function_args_list,
+        memory_per_run=1,
+        on_result=lambda args, result: finished.append((args, result)),
+        **dask_cluster,
+    )
+    client = utility.DASK_CLIENT
+    utility.dask_multiprocess(add, [(1, 1)], memory_per_run=1, **dask_cluster)
+
+    assert results == [number + 10 for number in range(8)]
+    assert sorted(finished) == list(zip(function_args_list, results))
+    assert utility.DASK_CLIENT is client
+
+
+def test_task_stream_summary(utility: ModuleType, caplog):
+    task_stream = [
+        {
+            "worker": worker,
+            "status": status,
+            "startstops": [
+                {"action": "transfer", "start": 0.0, "stop": 1.0},
+                {"action": "compute", "start": start, "stop": start + 5.0},
+            ],
+        }
+        for worker, status, start in [
+            ("tcp://a", "OK", 0.0),
+            ("tcp://a", "OK", 5.0),
+            ("tcp://b", "error", 0.0),
+        ]
+    ]
+
+    with caplog.at_level("INFO"):
+        utility.log_task_stream_summary(task_stream, logging.getLogger("test"))
+
+    assert (
+        "3 tasks (1 erred) on 2 workers in 10.0s, compute total 15.0s, "
+        "mean 5.0s, max 5.0s, worker utilization 75%" in caplog.text
+    )
+
+
+class FakeContainer:
+    def __init__(self, oom_killed: bool = False):
+        self.attrs = {"State": {"OOMKilled": oom_killed}}
+
+    def reload(self):
+        pass
+
+
+class FakeDockerClient:
+    def close(self):
+        pass
+
+
+def task_result(
+    memory_limit: str, peak_memory_gb: float | None, oom_killed=False
+):
+    return {
+        "error": oom_killed,
+        "error_code": 137 if oom_killed else None,
+        "memory_limit": memory_limit,
+        "peak_memory_gb": peak_memory_gb,
+        "oom_killed": oom_killed,
+        "execution_time": None,
+    }
+
+
+@pytest.fixture
+def machine_memory_gb(monkeypatch: pytest.MonkeyPatch, utility: ModuleType):
+    monkeypatch.setattr(utility, "get_max_submission_memory_gb", lambda: 16)
+    return 16
+
+
+def test_memory_limit_fits_peak_usage_with_headroom(
+    utility: ModuleType, machine_memory_gb: int
+):
+    memory_limit = utility.estimate_submission_memory_limit(
+        [task_result("8", 1.2), task_result("8", 2.5)], "8"
+    )
+
+    assert memory_limit == "4"
+
+
+def test_memory_limit_keeps_limit_of_oom_retries(
+    utility: ModuleType, machine_memory_gb: int
+):
+    memory_limit = utility.estimate_submission_memory_limit(
+        [task_result("2", 0.5), task_result("8", 0.5)], "2"
+    )
+
+    assert memory_limit == "8"
+
+
+def test_memory_limit_is_capped_by_machine_memory(
+    utility: ModuleType, machine_memory_gb: int
+):
+    memory_limit = utility.estimate_submission_memory_limit(
+        [task_result("8", 14.0)], "8"
+    )
+
+    assert memory_limit == "16"
+
+
+def test_memory_limit_without_measurements_is_kept(
+    utility: ModuleType, machine_memory_gb: int
+):
+    memory_limit = utility.estimate_submission_memory_limit(
+        [task_result("8", None)], "8"
+    )
+
+    assert memory_limit == "8"
+
+
+def test_memory_limit_is_at_least_minimum(
+    utility: ModuleType, machine_memory_gb: int
+):
+    memory_limit = utility.estimate_submission_memory_limit(
+        [task_result("8", 0.01)], "8"
+    )
+
+    assert memory_limit == str(utility.MIN_SUBMISSION_MEMORY_GB)
+
+
+def test_container_is_oom_killed_only_when_docker_says_so(
+    utility: ModuleType,
+):
+    assert utility.is_container_oom_killed(FakeContainer(oom_killed=True))
+    assert not utility.is_container_oom_killed(FakeContainer())
+
+
+def test_container_that_cannot_be_inspected_is_not_oom_killed(
+    utility: ModuleType,
+):
+    class RemovedContainer(FakeContainer):
+        def reload(self):
+            raise RuntimeError("No such container")
+
+    assert not utility.is_container_oom_killed(
+        RemovedContainer(oom_killed=True)
+    )
+
+
+@pytest.fixture
+def container_memory_limits(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, machine_memory_gb
+) -> list[str]:
+    """Memory limit of each container started, with Docker stubbed out."""
+
+    monkeypatch.setattr(
+        utility, "initialize_docker_client", lambda: FakeDockerClient()
+    )
+    return []
+
+
+def submission_function_args(
+    memory_limit: str, stop_event_name: str | None = None
+) -> tuple:
+    return (
+        "1",
+        "submission:1",
+        memory_limit,
+        "submission.py",
+        "detect",
+        ("file.csv",),
+        "/data",
+        "/results",
+        None,
+        None,
+        None,
+        stop_event_name,
+    )
+
+
+def run_submission_task(
+    utility: ModuleType, memory_limit: str, stop_event_name: str | None = None
+):
+    return utility.submission_task(
+        *submission_function_args(memory_limit, stop_event_name)
+    )
+
+
+def test_oom_killed_container_is_retried_with_more_memory(
+    monkeypatch: pytest.MonkeyPatch,
+    utility: ModuleType,
+    container_memory_limits,
+    dask_cluster,
+):
+    budget = utility.MemoryBudget(16)
+    monkeypatch.setattr(utility, "SUBMISSION_MEMORY_BUDGET", budget)
+    reserved_gb: list[float] = []
+
+    def docker_task(memory_limit: str, **kwargs):
+        container_memory_limits.append(memory_limit)
+        reserved_gb.append(budget.reserved_gb)
+        return task_result(memory_limit, 1.5, oom_killed=memory_limit == "2")
+
+    monkeypatch.setattr(utility, "docker_task", docker_task)
+    finished: list[tuple] = []
+
+    [result] = utility.dask_multiprocess(
+        utility.submission_task,
+        [submission_function_args("2")],
+        memory_per_run=2,
+        on_result=lambda args, result: finished.append(args),
+        retry=utility.retry_oom_killed_submission_task,
+        **dask_cluster,
+    )
+
+    assert container_memory_limits == ["2", "4"]
+    # The retry reserves its larger limit, and releases it when done
+    assert reserved_gb == [2, 4]
+    assert budget.reserved_gb == 0
+    assert not result["error"]
+    assert result["memory_limit"] == "4"
+    assert result["execution_time"] is not None
+    assert finished == [submission_function_args("4")]
+
+
+def test_oom_retry_waits_for_its_larger_limit_to_fit(
+    monkeypatch: pytest.MonkeyPatch,
+    utility: ModuleType,
+    container_memory_limits,
+    dask_cluster,
+):
+    budget = utility.MemoryBudget(4)
+    monkeypatch.setattr(utility, "SUBMISSION_MEMORY_BUDGET", budget)
+    # Held by another submission's file
+    budget.acquire(2)
+    reserved_gb: list[float] = []
+
+    def docker_task(memory_limit: str, **kwargs):
+        container_memory_limits.append(memory_limit)
+        reserved_gb.append(budget.reserved_gb)
+        if memory_limit == "2":
+            threading.Timer(0.1, budget.release, (2,)).start()
+        return task_result(memory_limit, 1.5, oom_killed=memory_limit == "2")
+
+    monkeypatch.setattr(utility, "docker_task", docker_task)
+
+    [result] = utility.dask_multiprocess(
+        utility.submission_task,
+        [submission_function_args("2")],
+        memory_per_run=2,
+        retry=utility.retry_oom_killed_submission_task,
+        **dask_cluster,
+    )
+
+    assert container_memory_limits == ["2", "4"]
+    assert reserved_gb == [4, 4]
+    assert not result["error"]
+    assert budget.reserved_gb == 0
+
+
+def test_oom_retries_stop_at_machine_memory(
+    utility: ModuleType, machine_memory_gb
+):
+    retried = utility.retry_oom_killed_submission_task(
+        submission_function_args("8"), task_result("8", None, True), 0
+    )
+    assert retried == (submission_function_args("16"), 16.0)
+
+    assert (
+        utility.retry_oom_killed_submission_task(
+            submission_function_args("16"), task_result("16", None, True), 1
+        )
+        is None
+    )
+
+
+def test_oom_retries_are_limited(utility: ModuleType, machine_memory_gb):
+    assert (
+        utility.retry_oom_killed_submission_task(
+            submission_function_args("2"),
+            task_result("2", None, True),
+            utility.SUBMISSION_OOM_RETRIES,
+        )
+        is None
+    )
+    assert (
+        utility.retry_oom_killed_submission_task(
+            submission_function_args("2"), task_result("2", 1.0), 0
+        )
+        is None
+    )
+
+
+class FakeEvent:
+    """Stands in for `distributed.Event`, which is shared by name."""
+
+    set_names: set[str] = set()
+
+    def __init__(self, name: str, client=None):
+        self.name = name
+
+    def set(self):
+        FakeEvent.set_names.add(self.name)
+
+    def is_set(self) -> bool:
+        return self.name in FakeEvent.set_names
+
+
+@pytest.fixture
+def dask_events(monkeypatch: pytest.MonkeyPatch, utility: ModuleType):
+    FakeEvent.set_names = set()
+    monkeypatch.setattr(utility, "Event", FakeEvent)
+    monkeypatch.setattr(utility, "STOPPED_SUBMISSION_TASKS", set())
+    monkeypatch.setattr(utility, "DASK_CLIENT", object())
+    return FakeEvent
+
+
+def test_stopped_task_starts_no_container(
+    monkeypatch: pytest.MonkeyPatch,
+    utility: ModuleType,
+    container_memory_limits: list[str],
+    dask_events: type[FakeEvent],
+):
+    def docker_task(**kwargs):
+        raise AssertionError("container started after the stop")
+
+    monkeypatch.setattr(utility, "docker_task", docker_task)
+    utility.stop_submission_tasks("stop-1")
+
+    result = run_submission_task(utility, "1", "stop-1")
+
+    assert result["error"]
+    assert result["error_code"] is None
+
+
+def test_task_stopped_while_running_is_not_retried(
+    monkeypatch: pytest.MonkeyPatch,
+    utility: ModuleType,
+    container_memory_limits: list[str],
+    dask_events: type[FakeEvent],
+):
+    def docker_task(memory_limit: str, **kwargs):
+        container_memory_limits.append(memory_limit)
+        # A kill racing a real OOM is reported as OOM killed
+        utility.stop_submission_tasks("stop-1")
+        return task_result(memory_limit, None, oom_killed=True)
+
+    monkeypatch.setattr(utility, "docker_task", docker_task)
+
+    result = run_submission_task(utility, "1", "stop-1")
+
+    assert container_memory_limits == ["1"]
+    assert result["error"]
+    assert (
+        utility.retry_oom_killed_submission_task(
+            submission_function_args("1", "stop-1"), result, 0
+        )
+        is None
+    )
+
+
+def test_task_outside_a_dask_worker_is_never_stopped(utility: ModuleType):
+    assert not utility.is_submission_stopped("stop-1")
+    assert not utility.is_submission_stopped(None)
+
+
+class LabelledContainer:
+    def __init__(self, submission_id: str):
+        self.id = f"container-{submission_id}"
+        self.labels = {"org.pv-validation-hub.submission": submission_id}
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+
+class LabelFilteringDockerClient:
+    def __init__(self, containers: list[LabelledContainer]):
+        self.containers = self
+        self.items = containers
+
+    def list(self, filters: dict[str, str]):
+        key, value = filters["label"].split("=")
+        return [item for item in self.items if item.labels.get(key) == value]
+
+    def close(self):
+        pass
+
+
+def test_only_the_submissions_containers_are_killed(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType
+):
+    containers = [LabelledContainer("1"), LabelledContainer("2")]
+    monkeypatch.setattr(
+        utility,
+        "initialize_docker_client",
+        lambda: LabelFilteringDockerClient(containers),
+    )
+
+    utility.kill_submission_containers(1)
+
+    assert [container.killed for container in containers] == [True, False]
+
+
+@pytest.fixture
+def progress_requests(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType
+) -> list[dict]:
+    """Bodies of the bulk progress requests. The API is down while the list
+    contains None."""
+
+    requests: list = []
+
+    def update_submission_progress_bulk(submission_id, data, logger=None):
+        if None in requests:
+            raise ConnectionError("API is down")
+        requests.append(data)
+        return {"status": "ok"}
+
+    monkeypatch.setattr(
+        utility,
+        "update_submission_progress_bulk",
+        update_submission_progress_bulk,
+    )
+    return requests
+
+
+def finished_file(error_code: int | None, execution_time: float | None):
+    return {
+        "error": error_code is not None,
+        "error_code": error_code,
+        "memory_limit": "1",
+        "peak_memory_gb": None,
+        "oom_killed": False,
+        "execution_time": execution_time,
+    }
+
+
+def test_progress_is_sent_in_one_batch(
+    utility: ModuleType, progress_requests: list
+):
+    with utility.SubmissionProgressReporter("1", flush_interval=3600) as p:
+        p.on_file_completed((*[None] * 5, ("1.csv",)), finished_file(None, 1))
+        p.on_file_completed((*[None] * 5, ("2.csv",)), finished_file(2, 3))
+        # Never got a container, so only its error is reported
+        p.on_file_completed((*[None] * 5, ("3.csv",)), finished_file(1, None))
+
+    assert len(progress_requests) == 1
+    batch = progress_requests[0]
+    assert batch["file_count"] == 2
+    assert batch["total_exec_time"] == 4
+    assert [(e["file_name"], e["error_code"]) for e in batch["errors"]] == [
+        ("2.csv", 2),
+        ("3.csv", 1),
+    ]
+
+
+def test_failed_progress_batch_is_sent_again(
+    utility: ModuleType, progress_requests: list
+):
+    reporter = utility.SubmissionProgressReporter("1", flush_interval=3600)
+    reporter.on_file_completed(
+        (*[None] * 5, ("1.csv",)), finished_file(None, 1)
+    )
+    progress_requests.append(None)
+    reporter.flush()
+    progress_requests.clear()
+
+    reporter.on_file_completed(
+        (*[None] * 5, ("2.csv",)), finished_file(None, 2)
+    )
+    reporter.flush()
+
+    assert progress_requests == [
+        {"file_count": 2, "total_exec_time": 3, "errors": []}
+    ]
+    assert reporter.take_batch() is None
+
+
+@pytest.fixture
+def logins(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, tmp_path
+) -> list[str]:
+    """Tokens handed out by the API, one per login. The token cache file
+    starts out empty and this process holds no token."""
+
+    logins: list[str] = []
+
+    def login_to_API(username: str, password: str, logger=None) -> str:
+        logins.append(f"token-{len(logins) + 1}")
+        return logins[-1]
+
+    monkeypatch.setattr(utility, "login_to_API", login_to_API)
+    monkeypatch.setattr(
+        utility, "get_worker_credentials", lambda: ("worker", "secret")
+    )
+    monkeypatch.setattr(
+        utility, "API_TOKEN_CACHE_FILE", str(tmp_path / "token.json")
+    )
+    monkeypatch.setattr(utility, "API_AUTH_TOKEN", None)
+    return logins
+
+
+def test_api_token_is_shared_through_the_cache_file(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, logins: list[str]
+):
+    assert utility.get_api_token() == "token-1"
+    # Another process of the worker, without a token of its own
+    monkeypatch.setattr(utility, "API_AUTH_TOKEN", None)
+
+    assert utility.get_api_token() == "token-1"
+    assert logins == ["token-1"]
+
+
+def test_cached_api_token_of_another_api_is_not_used(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, logins: list[str]
+):
+    utility.get_api_token()
+    monkeypatch.setattr(utility, "API_AUTH_TOKEN", None)
+    monkeypatch.setattr(utility, "API_BASE_URL", "http://other-api")
+
+    assert utility.get_api_token() == "token-2"
+
+
+def test_rejected_api_token_is_replaced_once(
+    utility: ModuleType, logins: list[str]
+):
+    tokens_sent: list[str] = []
+
+    @utility.with_credentials()
+    def get_analysis(auth: dict[str, str]):
+        tokens_sent.append(auth["Authorization"])
+        if auth["Authorization"] == "Token token-1":
+            raise utility.APIAuthenticationError("expired")
+        return {"analysis_id": 1}
+
+    assert get_analysis() == {"analysis_id": 1}
+    assert get_analysis() == {"analysis_id": 1}
+    assert tokens_sent == [
+        "Token token-1",
+        "Token token-2",
+        "Token token-2",
+    ]
+    assert logins == ["token-1", "token-2"]
+
+
+def test_api_latency_is_counted_per_endpoint(utility: ModuleType):
+    assert (
+        utility.get_endpoint_key(
+            "put", "http://api:8005/submissions/change_submission_status/12"
+        )
+        == "PUT /submissions/change_submission_status/<id>"
+    )
+    assert (
+        utility.get_endpoint_key("get", "http://api:8005/analysis/3/files")
+        == "GET /analysis/<id>/files"
+    )
+
+
+def test_memory_budget_reservations(utility: ModuleType):
+    budget = utility.MemoryBudget(4)
+
+    assert budget.try_acquire(3)
+    assert not budget.try_acquire(2)
+    assert budget.try_acquire(1)
+    budget.release(3)
+    budget.release(1)
+    # Larger than the whole budget, so it has to run alone
+    assert budget.try_acquire(6)
+    assert not budget.try_acquire(0.5)
+
+
+def test_memory_budget_waits_for_a_release(utility: ModuleType):
+    budget = utility.MemoryBudget(4)
+    budget.acquire(3)
+    acquired = threading.Event()
+
+    def acquire():
+        budget.acquire(2)
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.1)
+
+    budget.release(3)
+
+    assert acquired.wait(5)
+    thread.join()
+    assert budget.reserved_gb == 2
+
+
+RUNNING_TASKS: list[int] = []
+RUNNING_TASKS_LOCK = threading.Lock()
+
+
+def run_file(number: int) -> int:
+    with RUNNING_TASKS_LOCK:
+        RUNNING_TASKS.append(number)
+        concurrency = len(RUNNING_TASKS)
+    time.sleep(0.05)
+    with RUNNING_TASKS_LOCK:
+        RUNNING_TASKS.remove(number)
+    return concurrency
+
+
+def test_dask_multiprocess_runs_files_within_the_memory_budget(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, dask_cluster
+):
+    budget = utility.MemoryBudget(2)
+    monkeypatch.setattr(utility, "SUBMISSION_MEMORY_BUDGET", budget)
+    # Enough threads that only the budget limits the concurrency
+    monkeypatch.setattr(utility.os, "cpu_count", lambda: 4)
+
+    concurrency = utility.dask_multiprocess(
+        run_file,
+        [(number,) for number in range(8)],
+        n_workers=1,
+        threads_per_worker=4,
+        memory_per_run=1,
+        **dask_cluster,
+    )
+
+    assert max(concurrency) == 2
+    assert budget.reserved_gb == 0
+
+
+def test_container_killed_by_the_deadline_is_not_retried(
+    monkeypatch: pytest.MonkeyPatch,
+    utility: ModuleType,
+    runner: ModuleType,
+    container_memory_limits: list[str],
+    dask_events: type[FakeEvent],
+):
+    containers: list[LabelledContainer] = []
+    monkeypatch.setattr(
+        utility,
+        "initialize_docker_client",
+        lambda: LabelFilteringDockerClient(containers),
+    )
+
+    def docker_task(memory_limit: str, **kwargs):
+        container_memory_limits.append(memory_limit)
+        containers.append(LabelledContainer("1"))
+        runner.SubmissionDeadline(1, 60, "stop-1").expire()
+        assert containers[-1].killed
+        # Reported as OOM killed, as a kill racing a real OOM would be
+        return task_result(memory_limit, None, oom_killed=True)
+
+    monkeypatch.setattr(utility, "docker_task", docker_task)
+
+    result = run_submission_task(utility, "1", "stop-1")
+
+    assert container_memory_limits == ["1"]
+    assert result["error"]
+    assert (
+        utility.retry_oom_killed_submission_task(
+            submission_function_args("1", "stop-1"), result, 0
+        )
+        is None
+    )
+
+
+class PoolContainer:
+    """
+    Stands in for a warm container and its attached socket. Each job is
+    answered with `respond(job, memory_limit)`, or the container exits if
+    that returns None.
+    """
+
+    def __init__(self, mem_limit: str, respond, oom_killed=False):
+        self.id = "pool"
+        self.status = "running"
+        self.attrs = {"State": {"OOMKilled": oom_killed}}
+        self.memory_limit = mem_limit.removesuffix("g")
+        self.respond = respond
+        self.output = [{"status": "ready"}]
+
+    def attach_socket(self, params):
+        return self
+
+    def sendall(self, data: bytes):
+        job = json.loads(data)
+        # Long enough for the memory sampler to see the file run
+        time.sleep(0.05)
+        message = self.respond(job, self.memory_limit)
+        if message is not None:
+            self.output.append({"job_id": job["job_id"], **message})
+
+    def frames(self):
+        while self.output:
+            message = json.dumps(self.output.pop(0))
+            yield 1, f"\n__valhub_pool__{message}\n".encode()
+
+    def stats(self, stream=True, decode=False):
+        stats = {"memory_stats": {"usage": 1024**3}}
+        if not stream:
+            return stats
+        return self.stream_stats(stats)
+
+    def stream_stats(self, stats):
+        while True:
+            yield stats
+            time.sleep(0.01)
+
+    def start(self):
+        pass
+
+    def reload(self):
+        pass
+
+    def stop(self):
+        self.status = "exited"
+
+    def remove(self):
+        pass
+
+    def kill(self):
+        pass
+
+
+class PoolContainers:
+    def __init__(self, respond, oom_killed_limits: list[str]):
+        self.respond = respond
+        self.oom_killed_limits = oom_killed_limits
+        self.mem_limits: list[str] = []
+
+    def create(self, mem_limit: str, **kwargs):
+        self.mem_limits.append(mem_limit)
+        return PoolContainer(
+            mem_limit, self.respond, mem_limit in self.oom_killed_limits
+        )
+
+
+class PoolDockerClient:
+    def __init__(self, respond, oom_killed_limits: list[str] | None = None):
+        self.containers = PoolContainers(respond, oom_killed_limits or [])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool_budget(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, machine_memory_gb
+):
+    budget = utility.MemoryBudget(16)
+    monkeypatch.setattr(utility, "SUBMISSION_MEMORY_BUDGET", budget)
+    monkeypatch.setattr(
+        utility, "frames_iter", lambda socket, tty: socket.frames()
+    )
+    return budget
+
+
+def run_pool(
+    monkeypatch: pytest.MonkeyPatch,
+    utility: ModuleType,
+    client: PoolDockerClient,
+    function_args_list: list[tuple],
+) -> list:
+    monkeypatch.setattr(utility, "initialize_docker_client", lambda: client)
+    pool = utility.SubmissionContainerPool(
+        "submission:1", "submission.py", "detect", "/data", "/results", "2", 1
+    )
+    with pool:
+        results = pool.map(function_args_list)
+    return results
+
+
+def test_pool_containers_reserve_their_memory_while_running(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, pool_budget
+):
+    reserved_gb: list[float] = []
+
+    def respond(job, memory_limit: str):
+        reserved_gb.append(pool_budget.reserved_gb)
+        return {"exit_code": 0, "timed_out": False}
+
+    client = PoolDockerClient(respond)
+    results = run_pool(
+        monkeypatch,
+        utility,
+        client,
+        [submission_function_args("2"), submission_function_args("2")],
+    )
+
+    assert client.containers.mem_limits == ["2g"]
+    assert reserved_gb == [2, 2]
+    assert pool_budget.reserved_gb == 0
+    assert [result["error"] for result in results] == [False, False]
+    assert results[0]["peak_memory_gb"] == 1
+    assert results[0]["execution_time"] is not None
+
+
+def test_pool_restarts_an_oom_killed_file_with_more_memory(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, pool_budget
+):
+    reserved_gb: list[float] = []
+
+    def respond(job, memory_limit: str):
+        reserved_gb.append(pool_budget.reserved_gb)
+        oom_killed = memory_limit == "2"
+        return {
+            "exit_code": 137 if oom_killed else 0,
+            "timed_out": False,
+            "oom_killed": oom_killed,
+        }
+
+    client = PoolDockerClient(respond)
+    [result] = run_pool(
+        monkeypatch, utility, client, [submission_function_args("2")]
+    )
+
+    assert client.containers.mem_limits == ["2g", "4g"]
+    # The smaller container is released before the larger one reserves
+    assert reserved_gb == [2, 4]
+    assert pool_budget.reserved_gb == 0
+    assert not result["error"]
+    assert result["memory_limit"] == "4"
+
+
+def test_pool_detects_an_oom_killed_container(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType, pool_budget
+):
+    def respond(job, memory_limit: str):
+        if memory_limit == "2":
+            # The kernel killed the wrapper, so the container exited
+            return None
+        return {"exit_code": 0, "timed_out": False}
+
+    client = PoolDockerClient(respond, oom_killed_limits=["2g"])
+    [result] = run_pool(
+        monkeypatch, utility, client, [submission_function_args("2")]
+    )
+
+    assert client.containers.mem_limits == ["2g", "4g"]
+    assert not result["error"]
+
+
+def test_pool_runs_no_file_once_stopped(
+    monkeypatch: pytest.MonkeyPatch,
+    utility: ModuleType,
+    pool_budget,
+    dask_events: type[FakeEvent],
+):
+    def respond(job, memory_limit: str):
+        raise AssertionError("file run after the stop")
+
+    utility.stop_submission_tasks("stop-1")
+
+    client = PoolDockerClient(respond)
+    [result] = run_pool(
+        monkeypatch,
+        utility,
+        client,
+        [submission_function_args("2", "stop-1")],
+    )
+
+    assert client.containers.mem_limits == []
+    assert result["error"]
+    assert pool_budget.reserved_gb == 0
+
+
+def test_pool_is_sized_by_cpus_only(
+    monkeypatch: pytest.MonkeyPatch, utility: ModuleType
+):
+    monkeypatch.setattr(utility.os, "cpu_count", lambda: 4)
+
+    assert utility.get_submission_pool_size() == 4